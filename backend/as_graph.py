@@ -0,0 +1,154 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+GRAPH_TOP_K = 300          # edges returned when the caller does not ask for a number
+MAX_GRAPH_EDGES = 5000
+MAX_LAYOUT_NODES = int(os.environ.get("MAX_LAYOUT_NODES", "1000"))
+LAYOUT_ITERATIONS = 60
+GRAPH_CACHE_SIZE = int(os.environ.get("GRAPH_CACHE_SIZE", "64"))
+
+# --- Weighted AS Adjacency ---
+
+class AsGraph:
+    # Built once from a PathTable: directed edges weighted by the number of
+    # paths that use them, nodes weighted by the number of paths through them.
+    # Pruning and layout work on these arrays and never revisit the paths.
+
+    def __init__(self, nodes, node_weight, src, dst, weight, origins):
+        self.nodes = nodes              # sorted ASNs
+        self.node_weight = node_weight
+        self.src = src                  # edge endpoints as indexes into nodes
+        self.dst = dst
+        self.weight = weight
+        self.origins = origins          # mask over nodes: seen as a path origin
+
+    @classmethod
+    def from_table(cls, table):
+        left, right, weight = table.edge_counts()
+        index = table.path_index()
+        # One count per (path, ASN), so prepending does not inflate node weights
+        pairs = np.unique((index.astype(np.uint64) << np.uint64(32)) | table.asns)
+        asns, node_weight = np.unique((pairs & np.uint64(0xFFFFFFFF)).astype(np.uint32), return_counts=True)
+        keep = asns != 0
+        nodes, node_weight = asns[keep], node_weight[keep]
+        origins = np.isin(nodes, table.origins())
+        return cls(nodes, node_weight, np.searchsorted(nodes, left), np.searchsorted(nodes, right), weight, origins)
+
+    def __len__(self):
+        return len(self.weight)
+
+    def k_core(self, k, edges):
+        # Node mask of the k-core of the undirected graph over `edges` (edge mask)
+        alive = np.ones(len(self.nodes), bool)
+        if k <= 1:
+            return alive
+        u = np.minimum(self.src[edges], self.dst[edges])
+        v = np.maximum(self.src[edges], self.dst[edges])
+        pairs = np.unique((u.astype(np.uint64) << np.uint64(32)) | v.astype(np.uint64))
+        u = (pairs >> np.uint64(32)).astype(np.int64)
+        v = (pairs & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        while True:
+            live = alive[u] & alive[v]
+            degree = np.bincount(u[live], minlength=len(alive)) + np.bincount(v[live], minlength=len(alive))
+            peel = alive & (degree < k)
+            if not peel.any():
+                return alive
+            alive &= ~peel
+
+    def prune(self, top_k=GRAPH_TOP_K, k_core=0, min_weight=1):
+        # Edge indexes kept: weight >= min_weight, both ends in the k-core, heaviest top_k
+        edges = self.weight >= min_weight
+        if k_core > 1:
+            alive = self.k_core(k_core, edges)
+            edges &= alive[self.src] & alive[self.dst]
+        kept = np.flatnonzero(edges)
+        top_k = min(top_k or MAX_GRAPH_EDGES, MAX_GRAPH_EDGES)
+        if len(kept) > top_k:
+            kept = kept[np.argsort(-self.weight[kept], kind="stable")[:top_k]]
+        return kept
+
+# --- Layout ---
+
+def spring_layout(count, src, dst, weight, iterations=LAYOUT_ITERATIONS, seed=42):
+    # Fruchterman-Reingold with all pairwise repulsions as one (n, n) array
+    # operation per iteration; coordinates come back scaled to [-1, 1]
+    rng = np.random.default_rng(seed)
+    pos = rng.random((count, 2))
+    if count < 2:
+        return pos * 0
+    k = 1 / np.sqrt(count)
+    strength = weight / weight.max() if len(weight) else weight
+    step = 0.1
+    disp = np.empty_like(pos)
+    for _ in range(iterations):
+        dx = pos[:, 0, None] - pos[None, :, 0]
+        dy = pos[:, 1, None] - pos[None, :, 1]
+        force = k * k / np.maximum(dx * dx + dy * dy, 1e-4)
+        disp[:, 0] = (dx * force).sum(axis=1)
+        disp[:, 1] = (dy * force).sum(axis=1)
+        d = pos[src] - pos[dst]
+        pull = d * (np.maximum(np.hypot(d[:, 0], d[:, 1]), 0.01) / k * (0.5 + strength))[:, None]
+        np.add.at(disp, src, -pull)
+        np.add.at(disp, dst, pull)
+        length = np.maximum(np.hypot(disp[:, 0], disp[:, 1]), 0.01)
+        pos += disp * (np.minimum(length, step) / length)[:, None]
+        step *= 0.95
+    pos -= pos.mean(axis=0)
+    return pos / max(float(np.abs(pos).max()), 1e-9)
+
+def render(graph, top_k=GRAPH_TOP_K, k_core=0, min_weight=1, layout=False):
+    # Compact node/edge list; edges are [from ASN, to ASN, paths]
+    kept = graph.prune(top_k, k_core, min_weight)
+    used = np.unique(np.concatenate((graph.src[kept], graph.dst[kept])))
+    local = np.searchsorted(used, graph.src[kept]), np.searchsorted(used, graph.dst[kept])
+    result = {
+        "total_nodes": int(len(graph.nodes)),
+        "total_edges": int(len(graph)),
+        "nodes": [
+            {"asn": int(asn), "weight": int(w), "origin": bool(origin)}
+            for asn, w, origin in zip(graph.nodes[used], graph.node_weight[used], graph.origins[used])
+        ],
+        "edges": [[int(a), int(b), int(w)] for a, b, w in
+                  zip(graph.nodes[graph.src[kept]], graph.nodes[graph.dst[kept]], graph.weight[kept])]
+    }
+    if layout:
+        if len(used) > MAX_LAYOUT_NODES:
+            result["layout_skipped"] = f"more than {MAX_LAYOUT_NODES} nodes; prune further for a layout"
+        else:
+            pos = spring_layout(len(used), local[0], local[1], graph.weight[kept].astype(np.float64))
+            for node, (x, y) in zip(result["nodes"], pos.round(4).tolist()):
+                node["x"], node["y"] = x, y
+    return result
+
+# --- Cache ---
+
+class GraphCache:
+    # Small LRU for built graphs and rendered views; keys identify the
+    # source data (e.g. job id + completed chunks) and the view parameters
+
+    def __init__(self, size=GRAPH_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+        value = build()
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return value
+
+    def stats(self):
+        return {"entries": len(self._items), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,181 @@
+import os
+
+from prefix_trie import PrefixTrie
+from ris_ingest import format_timestamp
+
+LEARN_SECONDS = int(os.environ.get("DETECTOR_LEARN_SECONDS", "300"))  # warm-up before alerting
+# A (prefix, origin) that raised a conflict stays quiet this long, then alerts again if it is still around
+SUSPECT_SECONDS = int(os.environ.get("DETECTOR_SUSPECT_SECONDS", "3600"))
+
+ORIGIN_CONFLICT = "origin_conflict"  # known prefix announced by an origin outside its expected set
+NEW_ORIGIN = "new_origin"            # ASN seen originating a prefix for the first time
+SUBPREFIX = "subprefix"              # new more-specific of a known prefix from a foreign origin
+
+# --- Alert Events ---
+
+class Alert:
+    # Path alerts (path_checks) name the AS at fault in culprit; their
+    # expected holds the monitored origin's expected upstreams
+
+    __slots__ = ("kind", "prefix", "origin", "expected", "peer_asn", "collector", "timestamp", "path",
+                 "covering_prefix", "culprit")
+
+    def __init__(self, kind, prefix, origin, expected, peer_asn, collector, timestamp, path, covering_prefix=None,
+                 culprit=None):
+        self.kind = kind
+        self.prefix = prefix
+        self.origin = origin
+        self.expected = expected
+        self.peer_asn = peer_asn
+        self.collector = collector
+        self.timestamp = timestamp
+        self.path = path
+        self.covering_prefix = covering_prefix
+        self.culprit = culprit
+
+    def to_dict(self):
+        alert = {
+            "type": "alert",
+            "kind": self.kind,
+            "prefix": self.prefix,
+            "origin_as": self.origin,
+            "expected_origins": list(self.expected),
+            "peer_asn": self.peer_asn,
+            "collector": self.collector,
+            "timestamp": format_timestamp(self.timestamp),
+            "path": self.path
+        }
+        if self.covering_prefix is not None:
+            alert["covering_prefix"] = self.covering_prefix
+        if self.culprit is not None:
+            alert["culprit_as"] = self.culprit
+            alert["expected_upstreams"] = alert.pop("expected_origins")
+        return alert
+
+def origin_list(state):
+    if state is None:
+        return []
+    return list(state) if type(state) is tuple else [state]
+
+# --- Origin Detector ---
+
+class OriginDetector:
+    # Per-prefix state is a bare int for the usual single-origin prefix and a
+    # sorted tuple only for prefixes that are legitimately multi-origin, so a
+    # full table costs one dict entry per prefix. The same state is mirrored
+    # into a prefix trie, touched only when a prefix is new or changes origin,
+    # to find covering prefixes for sub-prefix hijack checks. Origins that
+    # raised a conflict are never learned as expected; they wait in
+    # `suspects` until their quiet period ends.
+
+    def __init__(self, learn_seconds=LEARN_SECONDS, now=None, suspect_seconds=SUSPECT_SECONDS):
+        self.origins = {}          # prefix → origin ASN | tuple of origin ASNs
+        self.trie = PrefixTrie()
+        self.known_origins = set()
+        self.suspects = {}         # (prefix, origin) → stream time its quiet period ends
+        self.suspect_seconds = suspect_seconds
+        self._prune_at = 1024
+        # Stream time, not wall time, so a replayed recording learns and alerts like the live feed did;
+        # without `now` the window starts at the first update's timestamp
+        self.learn_seconds = learn_seconds
+        self.learn_until = now + learn_seconds if now is not None else None
+        self.learning = True
+        self.updates = 0
+        self.alerts = 0
+
+    def expected_origins(self, prefix):
+        state = self.origins.get(prefix)
+        if state is None:
+            return ()
+        return state if type(state) is tuple else (state,)
+
+    def learn(self, prefix, origin):
+        # Seeds expected state without alerting (baseline tables, RIB dumps)
+        state = self.origins.get(prefix)
+        if state is None:
+            new_state = origin
+        elif state != origin:
+            expected = state if type(state) is tuple else (state,)
+            if origin in expected:
+                return
+            new_state = tuple(sorted(expected + (origin,)))
+        else:
+            return
+        try:
+            self.trie.insert(prefix, new_state)
+        except ValueError:
+            return
+        self.origins[prefix] = new_state
+        self.known_origins.add(origin)
+
+    def covering_origins(self, prefix):
+        # Nearest strictly less-specific known prefix and its origins, or None
+        try:
+            found = self.trie.longest_covering(prefix, include_self=False)
+        except ValueError:
+            return None
+        if found is None:
+            return None
+        covering, state = found
+        return covering, state if type(state) is tuple else (state,)
+
+    def process(self, prefix, origin, timestamp, peer_asn=None, collector=None, path=None):
+        # Returns None on the fast path (origin already expected), else a list of Alerts
+        self.updates += 1
+        if self.learn_until is None:
+            self.learn_until = timestamp + self.learn_seconds
+        state = self.origins.get(prefix)
+        if state == origin:
+            return None
+
+        alerts = None
+        if timestamp >= self.learn_until:
+            self.learning = False
+            key = (prefix, origin)
+            quiet_until = self.suspects.get(key)
+            if quiet_until is not None and timestamp < quiet_until:
+                return None
+            if state is not None:
+                expected = state if type(state) is tuple else (state,)
+                if origin in expected:
+                    return None
+                alerts = [Alert(ORIGIN_CONFLICT, prefix, origin, expected, peer_asn, collector, timestamp, path)]
+            else:
+                covering = self.covering_origins(prefix)
+                if covering is not None and origin not in covering[1]:
+                    alerts = [Alert(SUBPREFIX, prefix, origin, covering[1], peer_asn, collector, timestamp, path,
+                                    covering_prefix=covering[0])]
+            conflict = alerts is not None
+            if conflict:
+                # A conflicting origin must not become expected, or a repeat of the hijack goes unreported
+                self.suspects[key] = timestamp + self.suspect_seconds
+                if len(self.suspects) > self._prune_at:
+                    self._prune_suspects(timestamp)
+            if origin not in self.known_origins:
+                self.known_origins.add(origin)
+                alert = Alert(NEW_ORIGIN, prefix, origin, self.expected_origins(prefix), peer_asn, collector, timestamp, path)
+                alerts = (alerts or []) + [alert]
+            if conflict:
+                self.alerts += len(alerts)
+                return alerts
+
+        self.learn(prefix, origin)
+        if alerts:
+            self.alerts += len(alerts)
+        return alerts
+
+    def _prune_suspects(self, now):
+        self.suspects = {key: until for key, until in self.suspects.items() if until > now}
+        self._prune_at = max(1024, 2 * len(self.suspects))
+
+    def stats(self):
+        return {
+            "prefixes": len(self.origins),
+            "moas_prefixes": sum(1 for state in self.origins.values() if type(state) is tuple),
+            "trie_prefixes": len(self.trie),
+            "known_origins": len(self.known_origins),
+            "suspects": len(self.suspects),
+            "updates": self.updates,
+            "alerts": self.alerts,
+            "learning": self.learning
+        }
@@ -0,0 +1,381 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+
+try:
+    import msgpack
+except ImportError:  # msgpack encoding is unavailable without it
+    msgpack = None
+
+from metrics import Histogram, FAST_BUCKETS
+from prefix_trie import PrefixTrie, parse_prefix
+
+CLIENT_QUEUE_SIZE = 1000
+DROP_OLDEST = "drop_oldest"  # keep the newest items when a client falls behind
+COALESCE = "coalesce"        # keep only the latest item per prefix while backed up
+POLICIES = (DROP_OLDEST, COALESCE)
+PREFIX_MATCHES = ("exact", "more_specific", "covering")
+ENCODINGS = ("json", "columnar", "msgpack")
+UPDATE_COLUMNS = ("prefix", "origin_as", "peer_asn", "collector", "timestamp")
+MAX_BATCH_SIZE = 10000
+MAX_BATCH_MS = 5000
+SEND_EWMA = 0.1  # weight of the newest send in a client's smoothed send latency
+
+SEND_SECONDS = Histogram("fanout_send_seconds", "Time to hand one frame to a client socket",
+                         buckets=FAST_BUCKETS + (0.5, 1, 5))
+_client_ids = itertools.count(1)
+
+# --- Subscription Filters ---
+
+class Subscription:
+    # All given dimensions must match; an empty subscription matches everything.
+    # prefix_match "more_specific" selects the prefix and everything inside it,
+    # "covering" selects the prefix and everything that covers it.
+
+    __slots__ = ("prefix", "prefix_match", "origins", "peers", "collectors")
+
+    def __init__(self, prefix=None, prefix_match="more_specific", origins=(), peers=(), collectors=()):
+        if prefix_match not in PREFIX_MATCHES:
+            raise ValueError(f"prefix_match must be one of {PREFIX_MATCHES}")
+        if prefix:
+            parse_prefix(prefix)
+        self.prefix = prefix
+        self.prefix_match = prefix_match
+        self.origins = frozenset(int(str(asn).upper().removeprefix("AS")) for asn in origins)
+        self.peers = frozenset(str(asn) for asn in peers)
+        self.collectors = frozenset(collectors)
+
+    @classmethod
+    def from_dict(cls, filters):
+        def as_list(value):
+            if value is None:
+                return ()
+            return value if isinstance(value, (list, tuple)) else (value,)
+
+        return cls(
+            prefix=filters.get("prefix") or None,
+            prefix_match=filters.get("prefix_match", "more_specific"),
+            origins=as_list(filters.get("origin_asn")),
+            peers=as_list(filters.get("peer_asn")),
+            collectors=as_list(filters.get("collector"))
+        )
+
+    def matches_attrs(self, item):
+        # Non-prefix dimensions; the prefix dimension is resolved by the trie index
+        if self.origins and item.origin not in self.origins:
+            return False
+        if self.peers and str(item.peer_asn) not in self.peers:
+            return False
+        if self.collectors and item.collector not in self.collectors:
+            return False
+        return True
+
+# --- Per-Client Outbound Queue ---
+
+class ClientQueue:
+    def __init__(self, maxsize=CLIENT_QUEUE_SIZE, policy=DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        if maxsize < 1:
+            # put() evicts before appending, so a full queue must hold at least one item
+            raise ValueError("queue_size must be at least 1")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._items = {} if policy == COALESCE else deque()
+        self._seq = 0
+        self._wake_at = 1
+        self._ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        if self.policy == COALESCE:
+            # Published items (update records, alerts) coalesce per kind and prefix;
+            # control messages (plain dicts and strings) are never merged
+            prefix = getattr(item, "prefix", None)
+            key = (type(item), getattr(item, "kind", None), prefix)
+            if prefix is None:
+                # Nothing to coalesce on; give the item a unique key
+                self._seq += 1
+                key = (None, None, self._seq)
+            if key in self._items:
+                self.dropped += 1
+            elif len(self._items) >= self.maxsize:
+                del self._items[next(iter(self._items))]
+                self.dropped += 1
+            self._items[key] = item
+        else:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+        if len(self._items) >= self._wake_at:
+            self._ready.set()
+
+    def get_nowait(self):
+        if self.policy == COALESCE:
+            key = next(iter(self._items))
+            return self._items.pop(key)
+        return self._items.popleft()
+
+    async def wait(self, timeout=None, min_items=1):
+        # True once at least min_items are queued; on timeout, whether any are
+        if len(self._items) < min_items:
+            self._wake_at = min_items
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return len(self._items) > 0
+            finally:
+                self._wake_at = 1
+        return True
+
+# --- Batch Encoding ---
+
+class BatchMode:
+    # Opt-in micro-batching: one frame per `size` items or per `delay_ms`,
+    # whichever comes first. "json" sends a list of update objects,
+    # "columnar" sends one array per field, "msgpack" is columnar in binary.
+
+    __slots__ = ("size", "delay", "encoding")
+
+    def __init__(self, size=500, delay_ms=100, encoding="columnar"):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"encoding must be one of {ENCODINGS}")
+        if encoding == "msgpack" and msgpack is None:
+            raise ValueError("msgpack encoding requires the msgpack package")
+        self.size = max(1, min(int(size), MAX_BATCH_SIZE))
+        self.delay = max(0, min(int(delay_ms), MAX_BATCH_MS)) / 1000
+        self.encoding = encoding
+
+def columns_for(updates):
+    # The rpki column only appears once the source validates against a VRP snapshot
+    return UPDATE_COLUMNS + ("rpki",) if updates and "rpki" in updates[0] else UPDATE_COLUMNS
+
+def encode_batch(items, encoding):
+    # Returns str for text frames, bytes for binary frames
+    items = [item.to_dict() if hasattr(item, "to_dict") else item for item in items]
+    if encoding == "json":
+        return json.dumps(items, separators=(",", ":"))
+    updates = [item for item in items if "type" not in item]
+    frame = {
+        "type": "batch",
+        "count": len(updates),
+        "columns": {col: [u.get(col) for u in updates] for col in columns_for(updates)},
+        "events": [item for item in items if "type" in item]
+    }
+    if encoding == "msgpack":
+        return msgpack.packb(frame)
+    return json.dumps(frame, separators=(",", ":"))
+
+# --- Connected Client ---
+
+class Client:
+    def __init__(self, ws, subscription=None, queue=None, batch=None):
+        self.id = next(_client_ids)
+        self.ws = ws
+        self.batch = batch
+        self.subscription = subscription if subscription is not None else Subscription()
+        self.queue = queue if queue is not None else ClientQueue()
+        self.sent = 0
+        self.send_seconds = 0.0  # smoothed per-frame send latency
+        self.writer = None
+
+    async def send(self, frame):
+        t0 = time.perf_counter()
+        if isinstance(frame, str):
+            await self.ws.send_text(frame)
+        elif isinstance(frame, bytes):
+            await self.ws.send_bytes(frame)
+        else:
+            await self.ws.send_json(frame)
+        elapsed = time.perf_counter() - t0
+        SEND_SECONDS.observe(elapsed)
+        self.send_seconds += (elapsed - self.send_seconds) * SEND_EWMA
+
+# --- Fan-out Hub ---
+
+class FanoutHub:
+    # Routes each item to interested clients through per-dimension indexes,
+    # so the cost of publish() grows with the number of matching clients,
+    # not the number connected. publish() never awaits: items are queued
+    # and every client's writer task drains its own queue.
+
+    def __init__(self, ping_interval=10):
+        self.ping_interval = ping_interval
+        self.clients = set()
+        self._unfiltered = set()
+        self._by_origin = {}
+        self._by_peer = {}
+        self._by_collector = {}
+        self._by_prefix = PrefixTrie()  # prefix → {client: prefix_match}
+        self._prefix_subs = 0
+        self.published = 0
+        self.delivered = 0
+        self.dropped_closed = 0  # drops counted by clients that have since disconnected
+
+    def __len__(self):
+        return len(self.clients)
+
+    # Index maintenance
+
+    def _index(self, client):
+        sub = client.subscription
+        # Each client is indexed under a single, most selective dimension
+        if sub.prefix:
+            entry = self._by_prefix.get(sub.prefix)
+            if entry is None:
+                entry = {}
+                self._by_prefix.insert(sub.prefix, entry)
+            entry[client] = sub.prefix_match
+            self._prefix_subs += 1
+        elif sub.origins:
+            for asn in sub.origins:
+                self._by_origin.setdefault(asn, set()).add(client)
+        elif sub.peers:
+            for asn in sub.peers:
+                self._by_peer.setdefault(asn, set()).add(client)
+        elif sub.collectors:
+            for name in sub.collectors:
+                self._by_collector.setdefault(name, set()).add(client)
+        else:
+            self._unfiltered.add(client)
+
+    def _unindex(self, client):
+        sub = client.subscription
+        if sub.prefix:
+            entry = self._by_prefix.get(sub.prefix)
+            if entry is not None and entry.pop(client, None) is not None:
+                self._prefix_subs -= 1
+                if not entry:
+                    self._by_prefix.remove(sub.prefix)
+        for index, keys in ((self._by_origin, sub.origins), (self._by_peer, sub.peers),
+                            (self._by_collector, sub.collectors)):
+            for key in keys:
+                members = index.get(key)
+                if members is not None:
+                    members.discard(client)
+                    if not members:
+                        del index[key]
+        self._unfiltered.discard(client)
+
+    def register(self, client):
+        self.clients.add(client)
+        self._index(client)
+        client.writer = asyncio.create_task(self._writer(client))
+        return client
+
+    def unregister(self, client):
+        if client not in self.clients:
+            return
+        self.clients.discard(client)
+        self.dropped_closed += client.queue.dropped
+        self._unindex(client)
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+
+    def subscribe(self, client, subscription):
+        self._unindex(client)
+        client.subscription = subscription
+        self._index(client)
+
+    # Routing
+
+    def _candidates(self, item):
+        found = set(self._unfiltered)
+        origin = item.origin
+        if origin in self._by_origin:
+            found |= self._by_origin[origin]
+        peer = item.peer_asn
+        if peer is not None and str(peer) in self._by_peer:
+            found |= self._by_peer[str(peer)]
+        collector = item.collector
+        if collector in self._by_collector:
+            found |= self._by_collector[collector]
+
+        prefix = item.prefix
+        if self._prefix_subs and prefix:
+            try:
+                # Subscriptions on this prefix or anything covering it
+                for sub_prefix, entry in self._by_prefix.covering(prefix):
+                    exact = sub_prefix == prefix
+                    for client, mode in entry.items():
+                        if exact or mode == "more_specific":
+                            found.add(client)
+                # Subscriptions on anything more specific ("covering" mode)
+                for sub_prefix, entry in self._by_prefix.more_specifics(prefix, include_self=False):
+                    for client, mode in entry.items():
+                        if mode == "covering":
+                            found.add(client)
+            except ValueError:
+                pass
+        return found
+
+    def publish(self, item):
+        # item: an UpdateRecord or Alert (anything with prefix/origin/peer_asn/
+        # collector attributes and to_dict()); serialized per client at send time
+        delivered = 0
+        for client in self._candidates(item):
+            if client.subscription.matches_attrs(item):
+                client.queue.put(item)
+                delivered += 1
+        self.published += 1
+        self.delivered += delivered
+        return delivered
+
+    async def _writer(self, client):
+        try:
+            while True:
+                if not await client.queue.wait(self.ping_interval):
+                    # Idle: heartbeat doubles as stale-connection detection
+                    await client.ws.send_text("ping")
+                    continue
+                if client.batch is not None:
+                    await self._send_batches(client)
+                    continue
+                while len(client.queue):
+                    item = client.queue.get_nowait()
+                    await client.send(item if isinstance(item, (str, dict)) else item.to_dict())
+                    client.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.unregister(client)
+            try:
+                await client.ws.close()
+            except RuntimeError:
+                pass
+
+    async def _send_batches(self, client):
+        batch, queue = client.batch, client.queue
+        # Hold the first item until the batch fills up or its delay runs out
+        await queue.wait(batch.delay, min_items=batch.size)
+        while len(queue):
+            items = []
+            while len(queue) and len(items) < batch.size:
+                item = queue.get_nowait()
+                if isinstance(item, str):
+                    await client.send(item)
+                else:
+                    items.append(item)
+            if not items:
+                continue
+            await client.send(encode_batch(items, batch.encoding))
+            client.sent += len(items)
+
+    def stats(self):
+        return {
+            "clients": len(self.clients),
+            "batched": sum(1 for c in self.clients if c.batch is not None),
+            "unfiltered": len(self._unfiltered),
+            "prefix_subscriptions": self._prefix_subs,
+            "queued": sum(len(c.queue) for c in self.clients),
+            "dropped": sum(c.queue.dropped for c in self.clients),
+            "dropped_total": self.dropped_closed + sum(c.queue.dropped for c in self.clients),
+            "max_queue_depth": max((len(c.queue) for c in self.clients), default=0)
+        }
@@ -0,0 +1,119 @@
+import asyncio
+import math
+import os
+
+from ripestat_gateway import gateway
+
+GEO_CONCURRENCY = int(os.environ.get("GEO_CONCURRENCY", "16"))  # geoloc lookups in flight per map
+GEO_CELL_DEGREES = 2.0      # default cluster grid; 0 = one marker per distinct location
+CLUSTER_SAMPLE = 5          # prefixes listed per cluster
+UNLOCATED_SAMPLE = 20
+
+# --- Lookups ---
+
+def location_prefixes(location):
+    # Older geoloc responses list covered resources under "resources", newer ones under "prefixes"
+    return location.get("prefixes") or location.get("resources") or []
+
+async def lookup(resource):
+    data = await gateway.get("geoloc", {"resource": resource})
+    return (data.get("data") or {}).get("locations") or []
+
+async def resolve_prefixes(prefixes, concurrency=GEO_CONCURRENCY):
+    # prefix → geoloc locations, at most `concurrency` lookups in flight
+    # (the gateway rate limit and cache still apply); failures map to None
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(prefix):
+        async with slots:
+            try:
+                return prefix, await lookup(prefix)
+            except Exception as e:
+                print(f"WARNING:geo_batch:geoloc {prefix} failed: {e}")
+                return prefix, None
+
+    return dict(await asyncio.gather(*(one(p) for p in prefixes)))
+
+async def locate_asn(asn):
+    # One ASN-wide geoloc call places most prefixes at once; only the
+    # announced prefixes it does not mention are looked up one by one
+    announced = await gateway.get("announced-prefixes", {"resource": asn})
+    prefixes = sorted({p["prefix"] for p in (announced.get("data") or {}).get("prefixes", []) if p.get("prefix")})
+    try:
+        locations = await lookup(asn)
+    except Exception as e:
+        print(f"WARNING:geo_batch:geoloc {asn} failed, resolving prefixes one by one: {e}")
+        locations = []
+
+    placed = {}
+    for loc in locations:
+        for prefix in location_prefixes(loc):
+            placed.setdefault(prefix, []).append(loc)
+    missing = [p for p in prefixes if p not in placed]
+    resolved = await resolve_prefixes(missing)
+    for prefix in prefixes:
+        if prefix not in placed:
+            placed[prefix] = resolved.get(prefix)
+    return {prefix: placed[prefix] for prefix in prefixes}
+
+# --- Clustering ---
+
+def cluster_locations(located, cell=GEO_CELL_DEGREES):
+    # located: prefix → locations. Prefixes are first grouped by exact
+    # location, then locations are merged per lat/lon grid cell.
+    sites = {}
+    for prefix, locations in located.items():
+        for loc in locations or ():
+            lat, lon = loc.get("latitude"), loc.get("longitude")
+            if lat is None or lon is None:
+                continue
+            key = (round(lat, 4), round(lon, 4), loc.get("country") or "", loc.get("city") or "")
+            sites.setdefault(key, set()).add(prefix)
+
+    cells = {}
+    for (lat, lon, country, city), site_prefixes in sites.items():
+        key = (math.floor(lat / cell), math.floor(lon / cell)) if cell > 0 else (lat, lon)
+        entry = cells.get(key)
+        if entry is None:
+            entry = cells[key] = {"lat_sum": 0.0, "lon_sum": 0.0, "weight": 0, "prefixes": set(), "places": {}}
+        n = len(site_prefixes)
+        entry["lat_sum"] += lat * n
+        entry["lon_sum"] += lon * n
+        entry["weight"] += n
+        entry["prefixes"] |= site_prefixes
+        place = ", ".join(p for p in (city, country) if p) or "unknown"
+        entry["places"][place] = entry["places"].get(place, 0) + n
+
+    clusters = []
+    for entry in cells.values():
+        places = sorted(entry["places"].items(), key=lambda kv: -kv[1])
+        clusters.append({
+            "lat": round(entry["lat_sum"] / entry["weight"], 4),
+            "lon": round(entry["lon_sum"] / entry["weight"], 4),
+            "prefixes": len(entry["prefixes"]),
+            "places": [name for name, _ in places[:3]],
+            "sample": sorted(entry["prefixes"])[:CLUSTER_SAMPLE]
+        })
+    clusters.sort(key=lambda c: -c["prefixes"])
+    return clusters, len(sites)
+
+async def geo_map(resource, cell=GEO_CELL_DEGREES):
+    # Compact map payload for an ASN (all announced prefixes) or a single prefix
+    resource = resource.strip()
+    if resource.upper().startswith("AS") or resource.isdigit():
+        located = await locate_asn("AS" + resource.upper().lstrip("AS"))
+    else:
+        located = {resource: await lookup(resource)}
+    clusters, sites = cluster_locations(located, cell)
+    unlocated = sorted(p for p, locs in located.items() if locs is not None and not locs)
+    return {
+        "resource": resource,
+        "prefixes": len(located),
+        "located": sum(1 for locs in located.values() if locs),
+        "unlocated": len(unlocated),
+        "failed": sum(1 for locs in located.values() if locs is None),
+        "locations": sites,
+        "cell_degrees": cell,
+        "clusters": clusters,
+        "unlocated_sample": unlocated[:UNLOCATED_SAMPLE]
+    }
@@ -0,0 +1,419 @@
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import sys
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ris_ingest import format_timestamp
+
+# incidents: detections are grouped into incidents and clients get one update
+# per incident change; raw: every detection is published as it happens
+ALERT_DELIVERY = os.environ.get("ALERT_DELIVERY", "incidents")
+INCIDENT_WINDOW = int(os.environ.get("INCIDENT_WINDOW", "600"))  # seconds a peer keeps counting after its last detection
+# Visibility (peers) at which an incident reaches each level after "low"
+INCIDENT_THRESHOLDS = os.environ.get("INCIDENT_THRESHOLDS", "5,20")
+INCIDENT_FLUSH_MS = int(os.environ.get("INCIDENT_FLUSH_MS", "1000"))  # delivery batch interval
+INCIDENT_MAX_BATCH = int(os.environ.get("INCIDENT_MAX_BATCH", "1000"))  # updates per batch, the rest wait
+INCIDENT_MAX_OPEN = int(os.environ.get("INCIDENT_MAX_OPEN", "50000"))
+INCIDENT_WEBHOOK_URL = os.environ.get("INCIDENT_WEBHOOK_URL")  # POSTed a JSON list per batch when set
+WEBHOOK_TIMEOUT = 5   # seconds
+WEBHOOK_QUEUE = 100   # batches waiting for a slow webhook before the oldest is dropped
+
+LEVELS = ("low", "medium", "high")
+OPENED = "opened"
+ESCALATED = "escalated"
+DEESCALATED = "deescalated"
+UPDATED = "updated"      # a new kind of detection joined the incident
+RESOLVED = "resolved"    # no detection for a whole window
+
+_incident_ids = itertools.count(1)
+
+def parse_thresholds(spec):
+    thresholds = tuple(int(v) for v in spec.split(",") if v.strip())
+    if len(thresholds) != len(LEVELS) - 1 or list(thresholds) != sorted(thresholds):
+        raise ValueError(f"INCIDENT_THRESHOLDS needs {len(LEVELS) - 1} ascending peer counts")
+    return thresholds
+
+# --- Incidents ---
+
+class Incident:
+    # Every detection for one (prefix, suspect AS): the origin of origin
+    # alerts, the culprit of path alerts. peers maps (collector, peer ASN)
+    # to the time that peer last reported it.
+
+    __slots__ = ("id", "prefix", "suspect", "kinds", "expected", "peers", "oldest", "detections", "first_seen",
+                 "last_seen", "level", "path", "peer_asn", "collector")
+
+    def __init__(self, prefix, suspect, first_seen):
+        self.id = next(_incident_ids)
+        self.prefix = prefix
+        self.suspect = suspect
+        self.kinds = []
+        self.expected = ()
+        self.peers = {}
+        self.oldest = first_seen  # never above the oldest peer time
+        self.detections = 0
+        self.first_seen = first_seen
+        self.last_seen = first_seen
+        self.level = 0
+        self.path = None
+        self.peer_asn = None
+        self.collector = None
+
+class IncidentUpdate:
+    # What clients receive: an incident as of the batch it went out in.
+    # Routable by FanoutHub like an Alert (prefix, origin = suspect, last peer).
+
+    __slots__ = ("id", "event", "kind", "kinds", "prefix", "origin", "expected", "visibility", "collectors",
+                 "detections", "level", "first_seen", "last_seen", "path", "peer_asn", "collector")
+
+    def __init__(self, id, event, kinds, prefix, origin, expected, visibility, collectors, detections, level,
+                 first_seen, last_seen, path, peer_asn, collector):
+        self.id = id
+        self.event = event
+        self.kind = kinds[0]
+        self.kinds = kinds
+        self.prefix = prefix
+        self.origin = origin
+        self.expected = expected
+        self.visibility = visibility
+        self.collectors = collectors
+        self.detections = detections
+        self.level = level
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.path = path
+        self.peer_asn = peer_asn
+        self.collector = collector
+
+    @classmethod
+    def of(cls, incident, event):
+        return cls(incident.id, event, list(incident.kinds), incident.prefix, incident.suspect,
+                   list(incident.expected), len(incident.peers), len({c for c, _ in incident.peers}),
+                   incident.detections, LEVELS[incident.level], incident.first_seen, incident.last_seen,
+                   incident.path, incident.peer_asn, incident.collector)
+
+    def to_dict(self):
+        return {
+            "type": "incident",
+            "id": self.id,
+            "event": self.event,
+            "kinds": self.kinds,
+            "level": self.level,
+            "prefix": self.prefix,
+            "suspect_as": self.origin,
+            "expected": self.expected,
+            "visibility": self.visibility,
+            "collectors": self.collectors,
+            "detections": self.detections,
+            "first_seen": format_timestamp(self.first_seen),
+            "last_seen": format_timestamp(self.last_seen),
+            "path": self.path,
+            "peer_asn": self.peer_asn,
+            "collector": self.collector
+        }
+
+# --- Correlation ---
+
+class IncidentCorrelator:
+    # add() is called for every raw detection and observe() for every other
+    # announcement; each only touches one incident: a dict probe, a peer
+    # timestamp and a level check. Changes are collected per incident until
+    # the next flush, so an incident that escalates and gains hundreds of
+    # peers within one interval goes out once, with its latest counts.
+    # Windows run on stream time (detection timestamps), advanced by the wall
+    # clock while the stream is quiet, so recorded traffic replayed at any
+    # speed correlates the same way.
+
+    def __init__(self, window=INCIDENT_WINDOW, thresholds=None, max_open=INCIDENT_MAX_OPEN,
+                 max_batch=INCIDENT_MAX_BATCH):
+        self.window = window
+        self.thresholds = thresholds or parse_thresholds(INCIDENT_THRESHOLDS)
+        self.max_open = max_open
+        self.max_batch = max_batch
+        self.open = OrderedDict()  # least recently detected first
+        self.escalated = {}  # the open incidents above "low", the only ones that can deescalate
+        self.pending = {}   # incident id → (incident, event)
+        self.stream_time = None
+        self._stream_seen = None
+        self.detections = 0
+        self.opened = 0
+        self.resolved = 0
+        self.updates = 0
+        self.batches = 0
+        self.evicted = 0
+
+    def now(self):
+        if self.stream_time is None:
+            return time.time()
+        return self.stream_time + (time.monotonic() - self._stream_seen)
+
+    def _level(self, visibility):
+        level = 0
+        for threshold in self.thresholds:
+            if visibility >= threshold:
+                level += 1
+        return level
+
+    def _mark(self, incident, event):
+        found = self.pending.get(incident.id)
+        # "opened" stays until flushed, unless the incident is resolved first
+        if found is None or found[1] != OPENED or event == RESOLVED:
+            self.pending[incident.id] = (incident, event)
+
+    def add(self, alert):
+        self.detections += 1
+        suspect = alert.culprit if alert.culprit is not None else alert.origin
+        key = (alert.prefix, suspect)
+        incident = self.open.get(key)
+        if incident is None:
+            if len(self.open) >= self.max_open:
+                self._evict()
+            incident = self.open[key] = Incident(alert.prefix, suspect, alert.timestamp)
+            self.opened += 1
+            event = OPENED
+        else:
+            event = None
+        if alert.kind not in incident.kinds:
+            incident.kinds.append(alert.kind)
+            if event is None:
+                event = UPDATED
+        if alert.expected:
+            incident.expected = tuple(alert.expected)
+        self._seen(key, incident, event, alert)
+
+    def observe(self, record):
+        # Announcements of an open (prefix, origin) incident count as
+        # visibility even when the detector stays quiet: it raises origin
+        # alerts on the first sighting only
+        key = (record.prefix, record.origin)
+        incident = self.open.get(key)
+        if incident is not None:
+            self._seen(key, incident, None, record)
+
+    def _seen(self, key, incident, event, item):
+        ts = item.timestamp
+        if self.stream_time is None or ts > self.stream_time:
+            self.stream_time = ts
+            self._stream_seen = time.monotonic()
+        self.open.move_to_end(key)
+        cutoff = self.stream_time - self.window
+        if incident.oldest < cutoff:
+            # Peers that left the window no longer count towards escalation,
+            # whatever the level; sweep only recounts escalated incidents
+            self._expire_peers(incident, cutoff)
+        incident.peers[(item.collector, item.peer_asn)] = ts
+        if ts < incident.oldest:
+            incident.oldest = ts
+        incident.detections += 1
+        if ts > incident.last_seen:
+            incident.last_seen = ts
+        incident.path = item.path
+        incident.peer_asn = item.peer_asn
+        incident.collector = item.collector
+        level = self._level(len(incident.peers))
+        if level > incident.level:
+            if not incident.level:
+                self.escalated[key] = incident
+            incident.level = level
+            if event is None:
+                event = ESCALATED
+        elif level < incident.level:
+            self._deescalate(key, incident, level)
+        if event is not None:
+            self._mark(incident, event)
+
+    @staticmethod
+    def _expire_peers(incident, cutoff):
+        incident.peers = {peer: ts for peer, ts in incident.peers.items() if ts >= cutoff}
+        incident.oldest = min(incident.peers.values(), default=cutoff)
+
+    def _deescalate(self, key, incident, level):
+        incident.level = level
+        if not level:
+            del self.escalated[key]
+        self._mark(incident, DEESCALATED)
+
+    def _evict(self):
+        # Bound memory during floods: resolve the incident quiet for the longest
+        self._resolve(next(iter(self.open)))
+        self.evicted += 1
+
+    def _resolve(self, key):
+        incident = self.open.pop(key)
+        self.escalated.pop(key, None)
+        self.resolved += 1
+        self._mark(incident, RESOLVED)
+
+    def sweep(self, now=None):
+        # Peers whose last detection left the window stop counting; an
+        # incident without any is resolved. Runs every flush, so it never
+        # walks all open incidents: quiet ones are taken off the front of
+        # the LRU order (stream timestamps can arrive slightly out of order,
+        # a straggler goes on a later sweep) and only escalated incidents
+        # have their peers recounted.
+        cutoff = (now if now is not None else self.now()) - self.window
+        while self.open:
+            key, incident = next(iter(self.open.items()))
+            if incident.last_seen >= cutoff:
+                break
+            self._resolve(key)
+        for key, incident in list(self.escalated.items()):
+            if incident.oldest >= cutoff:
+                continue
+            if incident.last_seen < cutoff:
+                self._resolve(key)
+                continue
+            self._expire_peers(incident, cutoff)
+            level = self._level(len(incident.peers))
+            if level < incident.level:
+                self._deescalate(key, incident, level)
+
+    def flush(self):
+        # At most max_batch updates, highest level first; the rest keep
+        # coalescing until a later batch has room
+        if not self.pending:
+            return []
+        if len(self.pending) <= self.max_batch:
+            pending, self.pending = self.pending, {}
+            sent = pending.values()
+        else:
+            sent = heapq.nlargest(self.max_batch, self.pending.values(), key=lambda item: item[0].level)
+            for incident, _ in sent:
+                del self.pending[incident.id]
+        updates = [IncidentUpdate.of(incident, event) for incident, event in sent]
+        self.updates += len(updates)
+        self.batches += 1
+        return updates
+
+    async def run(self, deliver, interval_ms=INCIDENT_FLUSH_MS):
+        while True:
+            await asyncio.sleep(interval_ms / 1000)
+            self.sweep()
+            updates = self.flush()
+            if updates:
+                deliver(updates)
+
+    def stats(self):
+        return {
+            "open": len(self.open),
+            "by_level": {name: sum(1 for i in self.open.values() if i.level == n) for n, name in enumerate(LEVELS)},
+            "detections": self.detections,
+            "opened": self.opened,
+            "resolved": self.resolved,
+            "evicted": self.evicted,
+            "updates_sent": self.updates,
+            "batches": self.batches,
+            "pending": len(self.pending),
+            "max_batch": self.max_batch,
+            "window_seconds": self.window,
+            "thresholds": dict(zip(LEVELS[1:], self.thresholds))
+        }
+
+    def top(self, limit=100):
+        found = sorted(self.open.values(), key=lambda i: (i.level, len(i.peers)), reverse=True)[:limit]
+        return [IncidentUpdate.of(incident, None).to_dict() for incident in found]
+
+# --- Webhook Sink ---
+
+class WebhookSink:
+    # POSTs each batch as a JSON list, one request at a time from a worker
+    # thread. Batches queue while the receiver is slow or down; past
+    # max_pending the oldest are dropped (counted), never the event loop.
+
+    def __init__(self, url, max_pending=WEBHOOK_QUEUE, timeout=WEBHOOK_TIMEOUT):
+        # Checked up front: a bad INCIDENT_WEBHOOK_URL stops the service instead of failing every batch
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError(f"INCIDENT_WEBHOOK_URL must be an http(s) URL, got {url!r}")
+        self.url = url
+        self.timeout = timeout
+        self.queue = deque(maxlen=max_pending)
+        self._ready = asyncio.Event()
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def submit(self, updates):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append([u.to_dict() for u in updates])
+        self._ready.set()
+
+    def _post(self, batch):
+        request = urllib.request.Request(self.url, data=json.dumps(batch).encode(), method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    async def run(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self.queue:
+                batch = self.queue.popleft()
+                try:
+                    await asyncio.to_thread(self._post, batch)
+                    self.sent += 1
+                    self.last_error = None
+                except Exception as e:
+                    # Timeouts, refused connections, HTTP errors, bad status lines: the batch is lost, the sink goes on
+                    self.failed += 1
+                    self.last_error = str(e)
+                    print(f"WARNING:incidents:Webhook {self.url} failed: {e!r}")
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "queued": len(self.queue),
+            "sent_batches": self.sent,
+            "failed_batches": self.failed,
+            "dropped_batches": self.dropped,
+            "last_error": self.last_error
+        }
+
+correlator = IncidentCorrelator()
+
+# --- Local Sink ---
+
+class SinkHandler(BaseHTTPRequestHandler):
+    # Receives webhook batches and appends one JSON line per incident update
+    out = sys.stdout
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            batch = json.loads(body)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        for update in batch:
+            self.out.write(json.dumps(update) + "\n")
+        self.out.flush()
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incident webhook tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sink = sub.add_parser("sink", help="receive INCIDENT_WEBHOOK_URL batches and write them as NDJSON")
+    sink.add_argument("--host", default="127.0.0.1")
+    sink.add_argument("--port", type=int, default=8768)
+    sink.add_argument("--out", help="file to append to (default: stdout)")
+    args = parser.parse_args()
+    if args.out:
+        SinkHandler.out = open(args.out, "a")
+    print(f"INFO:incidents:Webhook sink on http://{args.host}:{args.port}/", file=sys.stderr)
+    ThreadingHTTPServer((args.host, args.port), SinkHandler).serve_forever()
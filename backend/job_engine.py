@@ -0,0 +1,95 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from metrics import Histogram
+from prefix_trie import PrefixTrie, parse_prefix, FAMILIES
+from ripestat_gateway import RIPESTAT_URL, gateway
+
+RIPE_URL = os.environ.get("RIPE_UPDATES_URL", f"{RIPESTAT_URL}/bgp-updates/data.json")
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "8"))  # in-flight chunks per job
+BULK_CONCURRENCY = int(os.environ.get("BULK_CONCURRENCY", "32"))  # in-flight fetches per bulk job
+MAX_RECORDS = 1000  # RIPEstat max_records per window; a full window may be truncated
+
+CHUNK_FETCH_SECONDS = Histogram("job_chunk_fetch_seconds", "Historic job chunk fetch latency, cache hits included")
+
+# --- Chunk Planning ---
+
+def split_chunks(starttime: str, endtime: str, chunk_hours=2):
+    start = datetime.fromisoformat(starttime.rstrip("Z"))
+    end = datetime.fromisoformat(endtime.rstrip("Z"))
+    chunks = []
+    cur = start
+    while cur < end:
+        nxt = min(end, cur + timedelta(hours=chunk_hours))
+        chunks.append((cur.isoformat() + "Z", nxt.isoformat() + "Z"))
+        cur = nxt
+    return chunks
+
+def is_asn(resource):
+    return resource.strip().upper().removeprefix("AS").isdigit()
+
+def plan_bulk(resources):
+    # Shared fetch plan for a portfolio: {resource: cover}. Every source
+    # returns a prefix together with its more-specifics, so a prefix inside
+    # another portfolio prefix is cut out of the outermost one's windows
+    # instead of being fetched again (cover None = fetched directly).
+    trie = PrefixTrie()
+    for resource in resources:
+        if not is_asn(resource):
+            trie.insert(resource, resource)
+    plan = {}
+    for resource in resources:
+        covers = [] if is_asn(resource) else trie.covering(resource, include_self=False)
+        plan[resource] = covers[0][1] if covers else None
+    return plan
+
+def restrict_updates(data, prefix):
+    # Only the updates for `prefix` and its more-specifics
+    if not (data or {}).get("data"):
+        return data
+    version, key, length = parse_prefix(prefix)
+    shift = FAMILIES[version][1] - length
+    kept = []
+    for u in data["data"].get("updates") or []:
+        try:
+            u_version, u_key, u_length = parse_prefix((u.get("attrs") or {}).get("target_prefix") or "")
+        except ValueError:
+            continue
+        if u_version == version and u_length >= length and u_key >> shift == key >> shift:
+            kept.append(u)
+    return {**data, "data": {**data["data"], "resource": prefix, "updates": kept}}
+
+# --- Fetching ---
+
+async def fetch_chunk(resource, start, end, url=RIPE_URL):
+    # Pacing, retries and the global in-flight cap live in the RIPEstat gateway
+    params = {"resource": resource, "starttime": start, "endtime": end, "max_records": MAX_RECORDS}
+    return await gateway.get(url, params)
+
+# --- Concurrent Job Execution ---
+
+async def run_chunks(resource, chunks, on_result, concurrency=JOB_CONCURRENCY, fetch=fetch_chunk):
+    # Fetches all chunks with at most `concurrency` in flight and calls
+    # on_result(idx, start, end, data) strictly in chunk order, buffering
+    # chunks that finish ahead of their predecessors.
+    job_slots = asyncio.Semaphore(max(1, concurrency))
+    finished = {}
+    next_idx = 0
+
+    async def worker(idx, stt, edt):
+        nonlocal next_idx
+        async with job_slots:
+            with CHUNK_FETCH_SECONDS.time():
+                data = await fetch(resource, stt, edt)
+        finished[idx] = (stt, edt, data)
+        while next_idx in finished:
+            await on_result(next_idx, *finished.pop(next_idx))
+            next_idx += 1
+
+    tasks = [asyncio.create_task(worker(idx, stt, edt)) for idx, (stt, edt) in enumerate(chunks)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,318 @@
+from abc import ABC, abstractmethod
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+JOB_STORE = os.environ.get("JOB_STORE", "sqlite")   # "sqlite" or "memory"
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", os.path.join(DATA_DIR, "jobs.db"))
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", str(24 * 3600)))
+
+JOB_FIELDS = ("status", "resource", "total_chunks", "completed_chunks", "error")
+BULK_FIELDS = ("status", "children", "plan", "error")
+FINAL_STATUSES = ("completed", "failed")
+ORPHANED_ERROR = "The worker running this job stopped"
+JOB_HEARTBEAT_SECONDS = 30  # how often a process marks itself alive in a shared store
+OWNER_TIMEOUT = 3 * JOB_HEARTBEAT_SECONDS  # silence after which its unfinished jobs are failed
+
+# --- Store Interface ---
+
+class JobStore(ABC):
+    # Calls block (SQLite I/O): the API runs them with asyncio.to_thread
+
+    @abstractmethod
+    def create_job(self, job_id, resource, total_chunks):
+        ...
+
+    @abstractmethod
+    def get_job(self, job_id):
+        # Returns the job's progress fields (no chunk data) or None
+        ...
+
+    @abstractmethod
+    def update_job(self, job_id, **fields):
+        ...
+
+    @abstractmethod
+    def add_chunk(self, job_id, idx, start, end, data):
+        ...
+
+    @abstractmethod
+    def get_chunks(self, job_id, cursor=0, limit=None):
+        ...
+
+    @abstractmethod
+    def create_bulk(self, bulk_id, children, plan):
+        # children: {resource: child job_id}; each child is an ordinary job
+        ...
+
+    @abstractmethod
+    def get_bulk(self, bulk_id):
+        ...
+
+    @abstractmethod
+    def update_bulk(self, bulk_id, **fields):
+        ...
+
+    @abstractmethod
+    def evict_expired(self, now=None):
+        ...
+
+    @abstractmethod
+    def heartbeat(self, now=None):
+        # Marks this process, the owner of the jobs it creates, as alive
+        ...
+
+    @abstractmethod
+    def fail_orphaned(self, error=ORPHANED_ERROR, now=None):
+        # Unfinished jobs and bulk jobs whose owning process has stopped
+        # heartbeating lost their fetch task; returns how many jobs were failed
+        ...
+
+    def close(self):
+        pass
+
+# --- In-Memory Backend ---
+
+class MemoryJobStore(JobStore):
+    def __init__(self, ttl=JOB_TTL_SECONDS):
+        self.ttl = ttl
+        self._jobs = {}
+        self._chunks = {}
+        self._bulk = {}
+
+    def create_job(self, job_id, resource, total_chunks):
+        self._jobs[job_id] = {
+            "status": "pending",
+            "resource": resource,
+            "total_chunks": total_chunks,
+            "completed_chunks": 0,
+            "error": None,
+            "updated_at": time.time()
+        }
+        self._chunks[job_id] = []
+
+    def get_job(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        return {k: job[k] for k in JOB_FIELDS}
+
+    def update_job(self, job_id, **fields):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(fields, updated_at=time.time())
+
+    def add_chunk(self, job_id, idx, start, end, data):
+        self._chunks[job_id].append({"start": start, "end": end, "data": data})
+        self.update_job(job_id, completed_chunks=idx + 1)
+
+    def get_chunks(self, job_id, cursor=0, limit=None):
+        chunks = self._chunks.get(job_id, [])
+        return chunks[cursor:] if limit is None else chunks[cursor:cursor + limit]
+
+    def create_bulk(self, bulk_id, children, plan):
+        self._bulk[bulk_id] = {"status": "pending", "children": dict(children), "plan": plan, "error": None,
+                               "updated_at": time.time()}
+
+    def get_bulk(self, bulk_id):
+        bulk = self._bulk.get(bulk_id)
+        if bulk is None:
+            return None
+        return {k: bulk[k] for k in BULK_FIELDS}
+
+    def update_bulk(self, bulk_id, **fields):
+        bulk = self._bulk.get(bulk_id)
+        if bulk is not None:
+            bulk.update(fields, updated_at=time.time())
+
+    def evict_expired(self, now=None):
+        cutoff = (now or time.time()) - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job["updated_at"] < cutoff]
+        for job_id in expired:
+            self._jobs.pop(job_id, None)
+            self._chunks.pop(job_id, None)
+        for bulk_id in [b for b, bulk in self._bulk.items() if bulk["updated_at"] < cutoff]:
+            del self._bulk[bulk_id]
+        return len(expired)
+
+    def heartbeat(self, now=None):
+        pass
+
+    def fail_orphaned(self, error=ORPHANED_ERROR, now=None):
+        # Jobs live and die with this process, so none is ever orphaned
+        return 0
+
+# --- SQLite Backend ---
+
+class SQLiteJobStore(JobStore):
+    # Chunks are written one row at a time as they arrive, so only the
+    # requested page is ever loaded back into memory. WAL mode lets several
+    # uvicorn workers share the same file; each job records the process that
+    # runs it, and processes heartbeat in the owners table.
+
+    def __init__(self, path=JOB_DB_PATH, ttl=JOB_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.owner = uuid.uuid4().hex  # this process, new on every start
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                resource TEXT NOT NULL,
+                total_chunks INTEGER NOT NULL,
+                completed_chunks INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                start TEXT NOT NULL,
+                end TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (job_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS bulk_jobs (
+                bulk_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                children TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS owners (
+                owner TEXT PRIMARY KEY,
+                heartbeat_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at);
+        """)
+        for table in ("jobs", "bulk_jobs"):
+            # Files created before jobs had owners; their unfinished jobs count as orphaned
+            columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+            if "owner" not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN owner TEXT")
+        self._conn.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cur = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cur
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def create_job(self, job_id, resource, total_chunks):
+        self._execute(
+            "INSERT INTO jobs (job_id, status, resource, total_chunks, updated_at, owner) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, "pending", resource, total_chunks, time.time(), self.owner)
+        )
+
+    def get_job(self, job_id):
+        rows = self._query(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE job_id = ?", (job_id,))
+        if not rows:
+            return None
+        return dict(zip(JOB_FIELDS, rows[0]))
+
+    def update_job(self, job_id, **fields):
+        fields = {k: v for k, v in fields.items() if k in JOB_FIELDS}
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def add_chunk(self, job_id, idx, start, end, data):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks (job_id, idx, start, end, data) VALUES (?, ?, ?, ?, ?)",
+                (job_id, idx, start, end, json.dumps(data))
+            )
+            self._conn.execute(
+                "UPDATE jobs SET completed_chunks = ?, updated_at = ? WHERE job_id = ?",
+                (idx + 1, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def get_chunks(self, job_id, cursor=0, limit=None):
+        rows = self._query(
+            "SELECT start, end, data FROM chunks WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?",
+            (job_id, cursor, -1 if limit is None else limit)
+        )
+        return [{"start": start, "end": end, "data": json.loads(data)} for start, end, data in rows]
+
+    def create_bulk(self, bulk_id, children, plan):
+        self._execute(
+            "INSERT INTO bulk_jobs (bulk_id, status, children, plan, updated_at, owner) VALUES (?, ?, ?, ?, ?, ?)",
+            (bulk_id, "pending", json.dumps(children), json.dumps(plan), time.time(), self.owner)
+        )
+
+    def get_bulk(self, bulk_id):
+        rows = self._query(f"SELECT {', '.join(BULK_FIELDS)} FROM bulk_jobs WHERE bulk_id = ?", (bulk_id,))
+        if not rows:
+            return None
+        bulk = dict(zip(BULK_FIELDS, rows[0]))
+        bulk["children"], bulk["plan"] = json.loads(bulk["children"]), json.loads(bulk["plan"])
+        return bulk
+
+    def update_bulk(self, bulk_id, **fields):
+        fields = {k: json.dumps(v) if k in ("children", "plan") else v for k, v in fields.items() if k in BULK_FIELDS}
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        self._execute(f"UPDATE bulk_jobs SET {assignments} WHERE bulk_id = ?", (*fields.values(), bulk_id))
+
+    def evict_expired(self, now=None):
+        cutoff = (now or time.time()) - self.ttl
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM chunks WHERE job_id IN (SELECT job_id FROM jobs WHERE updated_at < ?)", (cutoff,)
+            )
+            self._conn.execute("DELETE FROM bulk_jobs WHERE updated_at < ?", (cutoff,))
+            evicted = self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        return evicted
+
+    def heartbeat(self, now=None):
+        self._execute("INSERT OR REPLACE INTO owners (owner, heartbeat_at) VALUES (?, ?)",
+                      (self.owner, now or time.time()))
+
+    def fail_orphaned(self, error=ORPHANED_ERROR, now=None):
+        now = now or time.time()
+        final = ", ".join("?" for _ in FINAL_STATUSES)
+        orphaned = (f"status NOT IN ({final}) AND (owner IS NULL OR owner NOT IN "
+                    f"(SELECT owner FROM owners WHERE heartbeat_at >= ?))")
+        params = (error, now, *FINAL_STATUSES, now - OWNER_TIMEOUT)
+        with self._lock:
+            failed = self._conn.execute(
+                f"UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE {orphaned}", params
+            ).rowcount
+            self._conn.execute(f"UPDATE bulk_jobs SET status = 'failed', error = ?, updated_at = ? WHERE {orphaned}",
+                               params)
+            self._conn.execute("DELETE FROM owners WHERE heartbeat_at < ?", (now - OWNER_TIMEOUT,))
+            self._conn.commit()
+        return failed
+
+    def close(self):
+        # Other processes fail this one's unfinished jobs on their next check
+        with self._lock:
+            self._conn.execute("DELETE FROM owners WHERE owner = ?", (self.owner,))
+            self._conn.commit()
+            self._conn.close()
+
+# --- Factory ---
+
+def create_job_store(kind=JOB_STORE):
+    if kind == "memory":
+        return MemoryJobStore()
+    if kind == "sqlite":
+        return SQLiteJobStore()
+    raise ValueError(f"Unknown job store: {kind}")
@@ -1,57 +1,608 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException
-from datetime import datetime, timedelta
-import uuid
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel
 import asyncio
 import httpx
+import json
+import threading
+import time
+import uuid
+from datetime import timezone
+
+from as_graph import AsGraph, GraphCache, render, GRAPH_TOP_K
+from detector import OriginDetector, origin_list
+from geo_batch import geo_map, GEO_CELL_DEGREES
+from job_engine import fetch_chunk, run_chunks, plan_bulk, restrict_updates, BULK_CONCURRENCY, MAX_RECORDS
+from job_store import create_job_store, FINAL_STATUSES, JOB_HEARTBEAT_SECONDS
+from metrics import Counter, Gauge, Histogram, Collected, render as render_metrics, CONTENT_TYPE
+from mrt_ingest import ARCHIVE_DIR, fetch_archive_window, shutdown_pool, to_ripestat_update
+from path_analytics import PathTable, summarize, TOP_N
+from path_checks import checker as path_checker, summarize_updates, AS_REL_FILE
+from profiler import router as profiler_router, PROFILER_ENABLED
+from ripestat_gateway import gateway, close_client, ENDPOINT_TTLS
+from rpki import validator, tag_updates, parse_asn
+from update_store import UpdateStore
+from window_cache import WindowCache, snap_windows, clip_updates, parse_time, format_time, normalize_resource
 
 app = FastAPI()
-RIPE_URL = "https://stat.ripe.net/data/bgp-updates/data.json"
-jobs = {}  # job_id → {status, chunk_results: [], total_chunks, resource}
-
-async def fetch_chunk(resource, start, end):
-    params = {"resource": resource, "starttime": start, "endtime": end, "max_records": 1000}
-    async with httpx.AsyncClient(timeout=20) as client:
-        resp = await client.get(RIPE_URL, params=params)
-        resp.raise_for_status()
-        return resp.json()
-
-async def process_job(job_id: str, resource: str, starttime: str, endtime: str, chunk_hours=2):
-    start = datetime.fromisoformat(starttime.rstrip("Z"))
-    end = datetime.fromisoformat(endtime.rstrip("Z"))
-    chunks = []
-    cur = start
-    while cur < end:
-        nxt = min(end, cur + timedelta(hours=chunk_hours))
-        chunks.append((cur.isoformat()+"Z", nxt.isoformat()+"Z"))
-        cur = nxt
-
-    jobs[job_id] = {
-        "status": "pending",
-        "chunk_results": [],
-        "total_chunks": len(chunks),
-        "resource": resource
+STREAM_POLL_INTERVAL = 0.5  # seconds between checks for new chunks on a stream
+RESULTS_PAGE_LIMIT = 50     # max chunks returned per results poll
+EVICT_INTERVAL = 600        # seconds between expired-job sweeps
+SOURCES = ("ripestat", "archive", "store")  # archive: local MRT files under ARCHIVE_DIR, store: the update store
+UPDATES_PAGE_LIMIT = 5000   # max updates returned per /api/updates page
+MAX_BULK_RESOURCES = 2000   # resources per bulk job
+job_store = create_job_store()
+window_cache = WindowCache()
+update_store = UpdateStore()
+graph_cache = GraphCache()
+prefix_indexes = GraphCache()  # job id → JobPrefixIndex
+
+# --- Metrics ---
+
+JOBS_IN_FLIGHT = Gauge("historic_jobs_in_flight", "Historic jobs currently fetching")
+BULK_JOBS_IN_FLIGHT = Gauge("historic_bulk_jobs_in_flight", "Bulk historic jobs currently running")
+JOBS_FINISHED = Counter("historic_jobs_finished", "Historic jobs finished, by final status", ("status",))
+JOB_SECONDS = Histogram("historic_job_seconds", "Historic job wall-clock time",
+                        buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800))
+HTTP_SECONDS = Histogram("http_request_seconds", "API request latency by route", ("method", "route"))
+
+def cache_counts():
+    gateway_totals = gateway.stats()
+    return {
+        ("window", "hit"): window_cache.hits,
+        ("window", "miss"): window_cache.misses,
+        ("ripestat", "hit"): gateway_totals["hits"] + gateway_totals["coalesced"],
+        ("ripestat", "miss"): gateway_totals["upstream"],
+        ("graph", "hit"): graph_cache.hits,
+        ("graph", "miss"): graph_cache.misses
     }
 
-    for idx, (stt, edt) in enumerate(chunks):
-        jobs[job_id]["status"] = f"processing_chunk_{idx+1}/{len(chunks)}"
-        data = await fetch_chunk(resource, stt, edt)
-        jobs[job_id]["chunk_results"].append({
-            "start": stt,
-            "end": edt,
-            "data": data
-        })
+def cache_hit_ratios():
+    counts = cache_counts()
+    ratios = {}
+    for name in ("window", "ripestat", "graph"):
+        total = counts[(name, "hit")] + counts[(name, "miss")]
+        ratios[(name,)] = counts[(name, "hit")] / total if total else 0.0
+    return ratios
+
+Collected("cache_lookups", "Cache lookups by cache and result", cache_counts, kind="counter", labelnames=("cache", "result"))
+Collected("cache_hit_ratio", "Share of cache lookups served without an upstream call", cache_hit_ratios,
+          labelnames=("cache",))
+Collected("ripestat_inflight", "RIPEstat requests currently in flight", lambda: len(gateway._inflight))
+Collected("ripestat_limiter_waits", "Times a RIPEstat request waited for a rate-limit token",
+          lambda: gateway.limiter.waits, kind="counter")
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    # Route templates, not raw paths, keep job ids out of the label values
+    HTTP_SECONDS.labels(request.method, route.path if route is not None else "unmatched").observe(time.perf_counter() - t0)
+    return response
 
-    jobs[job_id]["status"] = "completed"
+async def fetch_window(resource, start, end):
+    return await window_cache.fetch(resource, start, end, fetch_chunk)
+
+def epoch(ts: str):
+    return parse_time(ts).replace(tzinfo=timezone.utc).timestamp()
+
+def scan_store(resource, starttime, endtime):
+    result = update_store.scan_resource(resource, epoch(starttime), epoch(endtime))
+    return {
+        "status": "ok",
+        "data": {
+            "resource": resource,
+            "query_starttime": starttime,
+            "query_endtime": endtime,
+            "updates": [to_ripestat_update(r) for r in result.records()]
+        }
+    }
+
+async def fetch_store_window(resource, start, end):
+    return await asyncio.to_thread(scan_store, resource, start, end)
+
+async def process_job(job_id: str, resource: str, starttime: str, endtime: str, chunks, fetch=fetch_window):
+    async def on_result(idx, stt, edt, data):
+        # Results arrive here in chunk order, whatever order the fetches finished in.
+        # Grid windows at either end are trimmed back to the requested range.
+        stt, edt = max(stt, starttime), min(edt, endtime)
+
+        def store():
+            job_store.add_chunk(job_id, idx, stt, edt, tag_updates(clip_updates(data, stt, edt)))
+            job_store.update_job(job_id, status=f"processing_chunk_{idx+1}/{len(chunks)}")
+
+        await asyncio.to_thread(store)
+
+    JOBS_IN_FLIGHT.inc()
+    t0 = time.perf_counter()
+    try:
+        await run_chunks(resource, chunks, on_result, fetch=fetch)
+    except Exception as e:
+        await asyncio.to_thread(job_store.update_job, job_id, status="failed", error=str(e))
+        JOBS_FINISHED.labels("failed").inc()
+        return
+    finally:
+        JOBS_IN_FLIGHT.dec()
+        JOB_SECONDS.observe(time.perf_counter() - t0)
+
+    await asyncio.to_thread(job_store.update_job, job_id, status="completed")
+    JOBS_FINISHED.labels("completed").inc()
+
+def source_fetch(source: str):
+    if source not in SOURCES:
+        raise HTTPException(status_code=400, detail=f"source must be one of {SOURCES}")
+    if source == "archive" and not ARCHIVE_DIR:
+        raise HTTPException(status_code=400, detail="No local MRT archive configured (ARCHIVE_DIR)")
+    # Local sources are read straight from disk, so they bypass the RIPEstat window cache
+    return {"ripestat": fetch_window, "archive": fetch_archive_window, "store": fetch_store_window}[source]
 
 @app.post("/api/bgp-historic-job")
-async def create_job(resource: str, starttime: str, endtime: str, background_tasks: BackgroundTasks):
+async def create_job(resource: str, starttime: str, endtime: str, background_tasks: BackgroundTasks, source: str = "ripestat"):
+    fetch = source_fetch(source)
     job_id = str(uuid.uuid4())
-    background_tasks.add_task(process_job, job_id, resource, starttime, endtime)
+    try:
+        starttime, endtime = format_time(parse_time(starttime)), format_time(parse_time(endtime))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid starttime or endtime")
+    chunks = snap_windows(starttime, endtime)
+    await asyncio.to_thread(job_store.create_job, job_id, resource, len(chunks))
+    background_tasks.add_task(process_job, job_id, resource, starttime, endtime, chunks, fetch)
     return {"job_id": job_id}
 
-@app.get("/api/bgp-historic-job/{job_id}")
-async def get_job_status(job_id: str):
-    job = jobs.get(job_id)
+async def get_job_or_404(job_id: str):
+    job = await asyncio.to_thread(job_store.get_job, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
+
+@app.get("/api/bgp-historic-job/{job_id}")
+async def get_job_status(job_id: str):
+    return await get_job_or_404(job_id)
+
+@app.get("/api/bgp-historic-job/{job_id}/results")
+async def get_job_results(job_id: str, cursor: int = 0, limit: int = RESULTS_PAGE_LIMIT):
+    # Returns only the chunks after `cursor`; pass the returned cursor back on the next poll
+    job = await get_job_or_404(job_id)
+    cursor = max(0, cursor)
+    chunks = await asyncio.to_thread(job_store.get_chunks, job_id, cursor, max(1, limit))
+    next_cursor = cursor + len(chunks)
+    return {
+        "status": job["status"],
+        "cursor": next_cursor,
+        "chunks": chunks,
+        "done": job["status"] in FINAL_STATUSES and next_cursor >= job["completed_chunks"]
+    }
+
+@app.get("/api/bgp-historic-job/{job_id}/stream")
+async def stream_job_results(job_id: str, cursor: int = 0):
+    # NDJSON stream: one line per chunk result from `cursor` on, then a final status line
+    await get_job_or_404(job_id)
+
+    async def ndjson_lines():
+        pos = max(0, cursor)
+        while True:
+            job = await asyncio.to_thread(job_store.get_job, job_id)
+            if job is None:
+                return
+            for chunk in await asyncio.to_thread(job_store.get_chunks, job_id, pos, RESULTS_PAGE_LIMIT):
+                pos += 1
+                yield json.dumps({"cursor": pos, "chunk": chunk}) + "\n"
+            if job["status"] in FINAL_STATUSES and pos >= job["completed_chunks"]:
+                yield json.dumps({"cursor": pos, "status": job["status"], "error": job["error"]}) + "\n"
+                return
+            if pos >= job["completed_chunks"]:
+                await asyncio.sleep(STREAM_POLL_INTERVAL)
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+# --- Bulk Jobs ---
+
+class BulkJobRequest(BaseModel):
+    resources: list[str]
+    starttime: str
+    endtime: str
+    source: str = "ripestat"
+
+async def process_bulk_job(bulk_id: str, children: dict, covers: dict, starttime: str, endtime: str, chunks, fetch):
+    # One child job per resource, all drawing on the same fetch budget and
+    # window cache; covered prefixes are cut out of their cover's windows.
+    slots = asyncio.Semaphore(BULK_CONCURRENCY)
+    counts = {"window_requests": 0, "derived": 0, "fallbacks": 0}
+
+    async def shared_fetch(resource, start, end):
+        async with slots:
+            counts["window_requests"] += 1
+            return await fetch(resource, start, end)
+
+    def fetch_for(resource):
+        cover = covers.get(resource)
+        if cover is None:
+            return shared_fetch
+
+        async def derived(_, start, end):
+            data = await shared_fetch(cover, start, end)
+            if len(((data or {}).get("data") or {}).get("updates") or []) >= MAX_RECORDS:
+                # The cover's window was cut at max_records and may be missing this prefix's updates
+                counts["fallbacks"] += 1
+                return await shared_fetch(resource, start, end)
+            counts["derived"] += 1
+            return restrict_updates(data, resource)
+        return derived
+
+    await asyncio.to_thread(job_store.update_bulk, bulk_id, status="processing")
+    BULK_JOBS_IN_FLIGHT.inc()
+    try:
+        await asyncio.gather(*(
+            process_job(job_id, resource, starttime, endtime, chunks, fetch_for(resource))
+            for resource, job_id in children.items()
+        ))
+    finally:
+        BULK_JOBS_IN_FLIGHT.dec()
+    plan = (await asyncio.to_thread(job_store.get_bulk, bulk_id))["plan"]
+    await asyncio.to_thread(job_store.update_bulk, bulk_id, status="completed", plan={**plan, **counts})
+
+@app.post("/api/bgp-historic-bulk-job")
+async def create_bulk_job(request: BulkJobRequest, background_tasks: BackgroundTasks):
+    fetch = source_fetch(request.source)
+    resources = list(dict.fromkeys(normalize_resource(r) for r in request.resources if r.strip()))
+    if not resources:
+        raise HTTPException(status_code=400, detail="resources must not be empty")
+    if len(resources) > MAX_BULK_RESOURCES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_RESOURCES} resources per bulk job")
+    try:
+        covers = plan_bulk(resources)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    bulk_id = str(uuid.uuid4())
+    try:
+        starttime, endtime = format_time(parse_time(request.starttime)), format_time(parse_time(request.endtime))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid starttime or endtime")
+    chunks = snap_windows(starttime, endtime)
+    children = {resource: str(uuid.uuid4()) for resource in resources}
+
+    def create_children():
+        for resource, job_id in children.items():
+            job_store.create_job(job_id, resource, len(chunks))
+
+    await asyncio.to_thread(create_children)
+    direct = sum(1 for cover in covers.values() if cover is None)
+    plan = {
+        "resources": len(resources),
+        "direct": direct,
+        "covered": len(resources) - direct,
+        "windows": len(chunks),
+        "planned_fetches": direct * len(chunks),
+        "covers": {resource: cover for resource, cover in covers.items() if cover is not None}
+    }
+    await asyncio.to_thread(job_store.create_bulk, bulk_id, children, plan)
+    background_tasks.add_task(process_bulk_job, bulk_id, children, covers, starttime, endtime, chunks, fetch)
+    return {"bulk_id": bulk_id, "jobs": children, "plan": plan}
+
+@app.get("/api/bgp-historic-bulk-job/{bulk_id}")
+async def get_bulk_job_status(bulk_id: str):
+    # Per-resource progress; results are read per resource from /api/bgp-historic-job/{job_id}/...
+    bulk = await asyncio.to_thread(job_store.get_bulk, bulk_id)
+    if not bulk:
+        raise HTTPException(status_code=404, detail="Bulk job not found")
+    jobs = await asyncio.to_thread(lambda: {job_id: job_store.get_job(job_id) for job_id in bulk["children"].values()})
+    resources = []
+    for resource, job_id in bulk["children"].items():
+        job = jobs[job_id] or {"status": "expired", "completed_chunks": 0, "total_chunks": 0, "error": None}
+        resources.append({
+            "resource": resource,
+            "job_id": job_id,
+            "status": job["status"],
+            "completed_chunks": job["completed_chunks"],
+            "total_chunks": job["total_chunks"],
+            "error": job["error"]
+        })
+    return {
+        "status": bulk["status"],
+        "plan": bulk["plan"],
+        "total_resources": len(resources),
+        "completed_resources": sum(1 for r in resources if r["status"] == "completed"),
+        "failed_resources": sum(1 for r in resources if r["status"] == "failed"),
+        "completed_chunks": sum(r["completed_chunks"] for r in resources),
+        "total_chunks": sum(r["total_chunks"] for r in resources),
+        "resources": resources
+    }
+
+def iter_job_updates(job_id: str):
+    # Every update stored for a job so far, chunk by chunk
+    cursor = 0
+    while True:
+        chunks = job_store.get_chunks(job_id, cursor, RESULTS_PAGE_LIMIT)
+        if not chunks:
+            return
+        cursor += len(chunks)
+        for chunk in chunks:
+            yield from (chunk.get("data") or {}).get("data", {}).get("updates", [])
+
+class JobPrefixIndex:
+    # Origins per announced prefix of one job, extended with the chunks
+    # stored since the last query instead of rebuilt from all of them
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.detector = OriginDetector(learn_seconds=0)
+        self.cursor = 0
+        self._lock = threading.Lock()
+
+    def _catch_up(self):
+        while True:
+            chunks = job_store.get_chunks(self.job_id, self.cursor, RESULTS_PAGE_LIMIT)
+            if not chunks:
+                return
+            self.cursor += len(chunks)
+            for chunk in chunks:
+                for update in (chunk.get("data") or {}).get("data", {}).get("updates", []):
+                    attrs = update.get("attrs", {})
+                    path = attrs.get("path") or []
+                    if update.get("type") == "A" and attrs.get("target_prefix") and path and not isinstance(path[-1], list):
+                        self.detector.learn(attrs["target_prefix"], path[-1])
+
+    def query(self, prefix, relation):
+        with self._lock:
+            self._catch_up()
+            if relation == "covering":
+                found = self.detector.trie.covering(prefix)
+            else:
+                found = self.detector.trie.more_specifics(prefix)
+            return [{"prefix": p, "origins": origin_list(state)} for p, state in found]
+
+@app.get("/api/bgp-historic-job/{job_id}/prefixes")
+async def get_job_prefixes(job_id: str, prefix: str, relation: str = "more_specifics"):
+    # Covering / more-specific lookup over the prefixes announced in a job's results
+    await get_job_or_404(job_id)
+    if relation not in ("covering", "more_specifics"):
+        raise HTTPException(status_code=400, detail="relation must be 'covering' or 'more_specifics'")
+    index = prefix_indexes.get_or_build(job_id, lambda: JobPrefixIndex(job_id))
+    try:
+        return await asyncio.to_thread(index.query, prefix, relation)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid prefix")
+
+@app.get("/api/updates")
+async def get_updates(resource: str, starttime: str, endtime: str, cursor: int = 0, limit: int = UPDATES_PAGE_LIMIT,
+                      collector: str = None):
+    # Direct range scan over the local update store; page through with the returned cursor
+    collectors = collector.split(",") if collector else None
+
+    def scan():
+        result = update_store.scan_resource(resource, epoch(starttime), epoch(endtime), collectors)
+        page = [to_ripestat_update(r) for r in result.records(max(0, cursor), max(1, min(limit, UPDATES_PAGE_LIMIT)))]
+        tag_updates({"data": {"updates": page}})
+        return len(result), page
+
+    try:
+        count, page = await asyncio.to_thread(scan)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid resource or time range")
+    next_cursor = max(0, cursor) + len(page)
+    return {"count": count, "cursor": next_cursor, "updates": page, "done": next_cursor >= count}
+
+@app.get("/api/updates/stats")
+async def get_update_store_stats():
+    return update_store.stats()
+
+@app.get("/api/bgp-historic-job/{job_id}/path-stats")
+async def get_job_path_stats(job_id: str, top: int = TOP_N):
+    # AS-path aggregates over the job's results so far (check "status" for completeness)
+    job = await get_job_or_404(job_id)
+    summary = await asyncio.to_thread(lambda: summarize(PathTable.from_updates(iter_job_updates(job_id)), max(1, top)))
+    return {"status": job["status"], **summary}
+
+@app.get("/api/updates/path-stats")
+async def get_update_path_stats(resource: str, starttime: str, endtime: str, top: int = TOP_N, collector: str = None):
+    collectors = collector.split(",") if collector else None
+
+    def analyze():
+        result = update_store.scan_resource(resource, epoch(starttime), epoch(endtime), collectors)
+        return summarize(PathTable.from_scan(result), max(1, top))
+
+    try:
+        return await asyncio.to_thread(analyze)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid resource or time range")
+
+# --- Path Anomalies ---
+
+class PathCheckRequest(BaseModel):
+    paths: list
+
+@app.get("/api/bgp-historic-job/{job_id}/path-anomalies")
+async def get_job_path_anomalies(job_id: str, limit: int = 100):
+    # Valley-free / upstream / fake-origin checks over the job's results so far
+    job = await get_job_or_404(job_id)
+    if not path_checker.enabled:
+        raise HTTPException(status_code=503, detail="No AS relationships loaded (AS_REL_FILE) or MONITORED_ORIGINS set")
+    summary = await asyncio.to_thread(summarize_updates, iter_job_updates(job_id), max(0, limit))
+    return {"status": job["status"], **summary}
+
+@app.post("/api/path-checks")
+async def post_path_checks(request: PathCheckRequest):
+    results = []
+    for path in request.paths:
+        found = path_checker.check(path) if isinstance(path, list) else None
+        results.append([{"kind": kind, "culprit_as": culprit, "expected": list(expected)}
+                        for kind, culprit, expected in found or ()])
+    return {"results": results}
+
+@app.get("/api/path-checks/stats")
+async def path_check_stats():
+    return path_checker.stats()
+
+# --- AS Graphs ---
+
+class PathGraphRequest(BaseModel):
+    paths: list
+    top_k: int = GRAPH_TOP_K
+    k_core: int = 0
+    min_weight: int = 1
+    layout: bool = False
+
+def graph_view(source_key, load_table, origin, prefix, top_k, k_core, min_weight, layout):
+    # The adjacency is built once per source (and filter); each pruning/layout is cached on top
+    def build():
+        table = load_table()
+        if origin is not None or prefix:
+            table = table.select(table.matching(origin, prefix or None))
+        return AsGraph.from_table(table)
+
+    graph_key = source_key + (origin, prefix)
+    graph = graph_cache.get_or_build(graph_key, build)
+    return graph_cache.get_or_build(graph_key + (top_k, k_core, min_weight, layout),
+                                    lambda: render(graph, top_k, k_core, min_weight, layout))
+
+@app.get("/api/bgp-historic-job/{job_id}/as-graph")
+async def get_job_as_graph(job_id: str, top_k: int = GRAPH_TOP_K, k_core: int = 0, min_weight: int = 1,
+                           layout: bool = False, origin: int = None, prefix: str = None):
+    job = await get_job_or_404(job_id)
+    # Keyed on completed chunks, so a running job's graph refreshes as results arrive
+    source_key = ("job", job_id, job["completed_chunks"])
+    try:
+        view = await asyncio.to_thread(graph_view, source_key, lambda: PathTable.from_updates(iter_job_updates(job_id)),
+                                       origin, prefix, top_k, k_core, min_weight, layout)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid prefix")
+    return {"status": job["status"], **view}
+
+@app.get("/api/updates/as-graph")
+async def get_update_as_graph(resource: str, starttime: str, endtime: str, top_k: int = GRAPH_TOP_K, k_core: int = 0,
+                              min_weight: int = 1, layout: bool = False, collector: str = None):
+    collectors = collector.split(",") if collector else None
+    source_key = ("store", resource, starttime, endtime, collector)
+
+    def load_table():
+        return PathTable.from_scan(update_store.scan_resource(resource, epoch(starttime), epoch(endtime), collectors))
+
+    try:
+        return await asyncio.to_thread(graph_view, source_key, load_table, None, None, top_k, k_core, min_weight, layout)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid resource or time range")
+
+@app.post("/api/as-graph")
+async def post_as_graph(request: PathGraphRequest):
+    # For clients holding their own paths (e.g. RIPEstat routing-status announcements);
+    # the build is as large as the request body, so it stays off the loop with the render
+    def build():
+        graph = AsGraph.from_table(PathTable.from_paths(request.paths))
+        return render(graph, request.top_k, request.k_core, request.min_weight, request.layout)
+
+    try:
+        return await asyncio.to_thread(build)
+    except OverflowError:
+        raise HTTPException(status_code=400, detail="ASNs must be between 0 and 4294967295")
+
+# --- RIPEstat Gateway ---
+
+@app.get("/api/ripestat/stats")
+async def get_ripestat_stats():
+    return gateway.stats()
+
+@app.get("/api/ripestat/{endpoint}")
+async def ripestat_data(endpoint: str, request: Request):
+    # Frontend RIPEstat data calls, e.g. /api/ripestat/geoloc?resource=8.8.8.0/24.
+    # Responses are RIPEstat's own JSON, shared through the gateway cache.
+    if endpoint not in ENDPOINT_TTLS:
+        raise HTTPException(status_code=404, detail=f"Unsupported RIPEstat data call: {endpoint}")
+    try:
+        return await gateway.get(endpoint, dict(request.query_params))
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"RIPEstat {endpoint}: {e.response.reason_phrase}")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"RIPEstat {endpoint} unreachable: {e}")
+
+# --- Geolocation Map ---
+
+@app.get("/api/geo-map")
+async def get_geo_map(resource: str, cell: float = GEO_CELL_DEGREES):
+    # All announced prefixes of an ASN (or one prefix), clustered on a cell x cell degree grid
+    try:
+        return await geo_map(resource, max(0.0, cell))
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"RIPEstat: {e.response.reason_phrase}")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"RIPEstat unreachable: {e}")
+
+# --- RPKI Origin Validation ---
+
+@app.get("/api/rpki/validate")
+async def rpki_validate(prefix: str, origin: str):
+    if not validator.loaded:
+        raise HTTPException(status_code=503, detail="No VRP snapshot loaded (RPKI_VRP_FILE)")
+    try:
+        asn = parse_asn(origin)
+        covering = validator.table.covering(prefix)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid prefix or origin")
+    return {"prefix": prefix, "origin": asn, "status": validator.validate(prefix, asn), "vrps": covering}
+
+@app.get("/api/rpki/stats")
+async def rpki_stats():
+    return validator.stats()
+
+@app.post("/api/rpki/reload")
+async def rpki_reload():
+    if not validator.path:
+        raise HTTPException(status_code=404, detail="No VRP snapshot configured (RPKI_VRP_FILE)")
+    if await validator.reload() is None:
+        raise HTTPException(status_code=500, detail=validator.last_error)
+    return validator.stats()
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return {**await asyncio.to_thread(window_cache.stats), "graphs": graph_cache.stats()}
+
+# --- Health, Metrics and Profiling ---
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+if PROFILER_ENABLED:
+    app.include_router(profiler_router)
+
+# --- Expired Job Eviction ---
+
+async def evict_expired_jobs():
+    while True:
+        evicted = await asyncio.to_thread(job_store.evict_expired)
+        if evicted:
+            print(f"INFO:main:Evicted {evicted} expired jobs.")
+        await asyncio.to_thread(window_cache.purge_expired)
+        await asyncio.sleep(EVICT_INTERVAL)
+
+async def job_heartbeats():
+    # Fetch tasks die with their process; jobs whose process stopped heartbeating
+    # would otherwise stay processing forever. Other workers' live jobs are left alone.
+    while True:
+        await asyncio.to_thread(job_store.heartbeat)
+        failed = await asyncio.to_thread(job_store.fail_orphaned)
+        if failed:
+            print(f"INFO:main:Marked {failed} jobs of stopped workers as failed.")
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+
+@app.on_event("startup")
+async def on_startup():
+    app.state.heartbeats = asyncio.create_task(job_heartbeats())
+    asyncio.create_task(evict_expired_jobs())
+    if validator.path:
+        app.state.rpki = asyncio.create_task(validator.watch())
+    if AS_REL_FILE:
+        app.state.paths = asyncio.create_task(path_checker.load_async(AS_REL_FILE))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await close_client()
+    shutdown_pool()
+    job_store.close()
+    window_cache.close()
+    update_store.close()
@@ -0,0 +1,172 @@
+import time
+from bisect import bisect_left
+
+# Minimal Prometheus text-format metrics (no client library needed). Hot
+# paths only touch plain attributes: Counter.inc() is an addition and
+# Histogram.observe() a bisect, everything else happens at scrape time.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.1)
+
+REGISTRY = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# --- Metric Types ---
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if registry is not None:
+            registry.append(self)
+
+    def labels(self, *values):
+        # Child series for one label combination; keep a reference on hot paths
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._child()
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        # (suffix, label names, label values, value)
+        if not self.labelnames:
+            yield from self._samples((), ())
+            return
+        for values, child in list(self._children.items()):
+            yield from child._samples(self.labelnames, values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(names, values)} {_number(value)}")
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.value = 0
+
+    def _child(self):
+        return Counter(self.name, self.help, registry=None)
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def _samples(self, names, values):
+        yield "_total" if not self.name.endswith("_total") else "", names, values, self.value
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.value = 0
+
+    def _child(self):
+        return Gauge(self.name, self.help, registry=None)
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def _samples(self, names, values):
+        yield "", names, values, self.value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _child(self):
+        return Histogram(self.name, self.help, buckets=self.buckets, registry=None)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def _samples(self, names, values):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            yield "_bucket", names + ("le",), values + (_number(bound),), cumulative
+        yield "_sum", names, values, self.sum
+        yield "_count", names, values, self.count
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class Collected(Metric):
+    # Values read from existing stats at scrape time: collect() returns a
+    # number, or {label values tuple: number} for labelled metrics
+
+    def __init__(self, name, help, collect, kind="gauge", labelnames=(), registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self):
+        suffix = "_total" if self.kind == "counter" and not self.name.endswith("_total") else ""
+        try:
+            found = self.collect()
+        except Exception as e:
+            print(f"WARNING:metrics:collecting {self.name} failed: {e}")
+            return
+        if not self.labelnames:
+            yield suffix, (), (), found
+            return
+        for values, value in found.items():
+            yield suffix, self.labelnames, values if isinstance(values, tuple) else (values,), value
+
+# --- Exposition ---
+
+def render(registry=REGISTRY):
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+Collected("process_uptime_seconds", "Seconds since this process imported the metrics module",
+          lambda start=time.time(): time.time() - start)
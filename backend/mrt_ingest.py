@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+try:
+    import pybgpstream
+except ImportError:  # archive ingestion is unavailable without libbgpstream
+    pybgpstream = None
+
+from prefix_trie import parse_prefix
+
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR")
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", str(os.cpu_count() or 2)))
+UPDATES_FILE_SPAN = 15 * 60  # RouteViews files cover 15 min, RIS files 5 min
+
+# RIS:        <archive>/rrc00/2025.08/updates.20250804.2200.gz, bview.20250804.0000.gz
+# RouteViews: <archive>/route-views2/2025.08/UPDATES/updates.20250804.2200.bz2, RIBS/rib.20250804.0000.bz2
+FILE_PATTERN = re.compile(r"^(updates|bview|rib)\.(\d{8})\.(\d{4})\.(gz|bz2)$")
+
+# --- Archive Discovery ---
+
+class MrtFile:
+    __slots__ = ("path", "collector", "kind", "timestamp")
+
+    def __init__(self, path, collector, kind, timestamp):
+        self.path = path
+        self.collector = collector
+        self.kind = kind            # "updates" or "ribs"
+        self.timestamp = timestamp  # file start, epoch seconds
+
+def discover_files(archive_dir, start=None, end=None, kinds=("updates",), collectors=None):
+    # MRT files under archive_dir overlapping [start, end), oldest first.
+    # The collector is the first directory below the archive root.
+    files = []
+    for root, _, names in os.walk(archive_dir):
+        rel = os.path.relpath(root, archive_dir)
+        collector = rel.split(os.sep)[0] if rel != "." else None
+        if collector is None or (collectors and collector not in collectors):
+            continue
+        for name in names:
+            match = FILE_PATTERN.match(name)
+            if not match:
+                continue
+            kind = "updates" if match.group(1) == "updates" else "ribs"
+            if kind not in kinds:
+                continue
+            ts = datetime.strptime(match.group(2) + match.group(3), "%Y%m%d%H%M").replace(tzinfo=timezone.utc).timestamp()
+            span = UPDATES_FILE_SPAN if kind == "updates" else 0
+            if (start is not None and ts + span <= start) or (end is not None and ts >= end):
+                continue
+            files.append(MrtFile(os.path.join(root, name), collector, kind, ts))
+    files.sort(key=lambda f: (f.timestamp, f.collector))
+    return files
+
+# --- Resource Matching ---
+
+def resource_matcher(resource):
+    # "AS15169"/"15169" matches on origin; a prefix matches itself and its more-specifics
+    if not resource:
+        return None
+    resource = resource.strip().upper()
+    if resource.removeprefix("AS").isdigit():
+        asn = int(resource.removeprefix("AS"))
+        return lambda prefix, origin: origin == asn
+    version, key, length = parse_prefix(resource)
+    width = 32 if version == 4 else 128
+
+    def match_prefix(prefix, origin):
+        try:
+            p_version, p_key, p_length = parse_prefix(prefix)
+        except ValueError:
+            return False
+        return p_version == version and p_length >= length and (p_key >> (width - length)) == (key >> (width - length))
+    return match_prefix
+
+# --- File Parsing (runs in worker processes) ---
+
+def parse_mrt_file(path, collector, kind="updates", resource=None, start=None, end=None):
+    # → (elems seen, [(timestamp, type, collector, peer_asn, prefix, origin, path, communities), ...])
+    # type is "A", "W" or "R" (RIB entry); path is a tuple of ASNs, AS_SETs kept as strings
+    if pybgpstream is None:
+        raise RuntimeError("pybgpstream is required for MRT archive ingestion")
+    stream = pybgpstream.BGPStream(data_interface="singlefile")
+    stream.set_data_interface_option("singlefile", "upd-file" if kind == "updates" else "rib-file", path)
+    matches = resource_matcher(resource)
+
+    records = []
+    seen = 0
+    for elem in stream:
+        seen += 1
+        if elem.type not in ("A", "W", "R"):
+            continue
+        ts = elem.time
+        if (start is not None and ts < start) or (end is not None and ts >= end):
+            continue
+        fields = elem.fields
+        prefix = fields.get("prefix")
+        if prefix is None:
+            continue
+        as_path = ()
+        origin = None
+        if elem.type != "W":
+            as_path = tuple(int(hop) if hop.isdigit() else hop for hop in fields.get("as-path", "").split())
+            if as_path and type(as_path[-1]) is int:
+                origin = as_path[-1]
+        if matches is not None and not matches(prefix, origin):
+            continue
+        records.append((ts, elem.type, collector, elem.peer_asn, prefix, origin, as_path,
+                        tuple(fields.get("communities") or ())))
+    return seen, records
+
+# --- Process Pool ---
+
+_pool = None
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS)
+    return _pool
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+async def ingest_files(files, resource=None, start=None, end=None):
+    # Parses files in parallel (one task per file) and returns
+    # (elems seen, records sorted by time)
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, parse_mrt_file, f.path, f.collector, f.kind, resource, start, end)
+        for f in files
+    ))
+    seen = sum(count for count, _ in results)
+    records = [record for _, found in results for record in found]
+    records.sort(key=lambda r: r[0])
+    return seen, records
+
+# --- Historic Job Source ---
+
+def to_ripestat_update(record):
+    # Same shape as RIPEstat bgp-updates entries so job consumers need no changes
+    ts, kind, collector, peer_asn, prefix, origin, as_path, communities = record
+    attrs = {"target_prefix": prefix, "source_id": f"{collector}-{peer_asn}"}
+    if kind != "W":
+        attrs["path"] = list(as_path)
+        attrs["community"] = [str(c) for c in communities]
+    return {
+        "type": "W" if kind == "W" else "A",
+        "timestamp": datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+        "attrs": attrs
+    }
+
+async def fetch_archive_window(resource, starttime, endtime, archive_dir=None):
+    # Drop-in replacement for job_engine.fetch_chunk backed by local MRT files
+    archive_dir = archive_dir or ARCHIVE_DIR
+    if not archive_dir:
+        raise RuntimeError("ARCHIVE_DIR is not configured")
+    start = datetime.fromisoformat(starttime.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp()
+    end = datetime.fromisoformat(endtime.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp()
+    # Walking a large archive would block the loop as long as a parse
+    files = await asyncio.to_thread(discover_files, archive_dir, start, end)
+    _, records = await ingest_files(files, resource, start, end)
+    return {
+        "status": "ok",
+        "data": {
+            "resource": resource,
+            "query_starttime": starttime,
+            "query_endtime": endtime,
+            "updates": [to_ripestat_update(r) for r in records]
+        }
+    }
+
+# --- Command Line ---
+
+async def main(args):
+    start = datetime.fromisoformat(args.start.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp() if args.start else None
+    end = datetime.fromisoformat(args.end.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp() if args.end else None
+    kinds = ("updates", "ribs") if args.ribs else ("updates",)
+    files = discover_files(args.archive, start, end, kinds, args.collector)
+    print(f"files={len(files)} collectors={len({f.collector for f in files})} workers={INGEST_WORKERS}")
+    t0 = time.perf_counter()
+    seen, records = await ingest_files(files, args.resource, start, end)
+    elapsed = time.perf_counter() - t0
+    print(f"elems={seen} records={len(records)} in {elapsed:.1f}s → {seen / elapsed:,.0f} elems/s")
+    shutdown_pool()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse a local MRT archive")
+    parser.add_argument("--archive", default=ARCHIVE_DIR or "archive")
+    parser.add_argument("--start", help="ISO time, e.g. 2025-08-04T22:00:00Z")
+    parser.add_argument("--end")
+    parser.add_argument("--resource", help="ASN or prefix filter")
+    parser.add_argument("--collector", nargs="*")
+    parser.add_argument("--ribs", action="store_true", help="include RIB dumps")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,241 @@
+import numpy as np
+
+from prefix_trie import parse_prefix, FAMILIES
+
+TOP_N = 20
+
+# --- Flat Path Table ---
+
+class PathTable:
+    # Many AS paths as two flat arrays: the hops of path i are
+    # asns[offsets[i]:offsets[i + 1]]. AS_SET hops are stored as 0. Each path
+    # also carries its prefix, peer and time, dictionary-encoded to ints, so
+    # every statistic below is a handful of whole-array NumPy operations.
+
+    def __init__(self, offsets, asns, timestamps, prefix_ids, prefixes, peer_ids, peers, withdrawals=0):
+        self.offsets = np.asarray(offsets, np.int64)
+        self.asns = np.asarray(asns, np.uint32)
+        self.timestamps = np.asarray(timestamps, np.float64)
+        self.prefix_ids = np.asarray(prefix_ids, np.int64)
+        self.prefixes = list(prefixes)
+        self.peer_ids = np.asarray(peer_ids, np.int64)
+        self.peers = list(peers)
+        self.withdrawals = withdrawals
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_updates(cls, updates):
+        # RIPEstat bgp-updates entries (as stored in job results); withdrawals are only counted
+        lengths, hops, stamps, prefix_ids, peer_ids = [], [], [], [], []
+        prefixes, peers = {}, {}
+        withdrawals = 0
+        for update in updates:
+            if update.get("type") != "A":
+                withdrawals += update.get("type") == "W"
+                continue
+            attrs = update.get("attrs") or {}
+            path = attrs.get("path") or []
+            hops.extend(hop if type(hop) is int else 0 for hop in path)
+            lengths.append(len(path))
+            stamps.append((update.get("timestamp") or "1970-01-01T00:00:00").rstrip("Z"))
+            prefix_ids.append(prefixes.setdefault(attrs.get("target_prefix"), len(prefixes)))
+            peer_ids.append(peers.setdefault(attrs.get("source_id"), len(peers)))
+        offsets = np.zeros(len(lengths) + 1, np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        timestamps = np.array(stamps, "datetime64[s]").astype(np.float64) if stamps else ()
+        return cls(offsets, hops, timestamps, prefix_ids, prefixes, peer_ids, peers, withdrawals)
+
+    @classmethod
+    def from_paths(cls, paths):
+        # Bare AS paths (lists of ASNs), e.g. from RIPEstat routing-status
+        paths = [path for path in paths if isinstance(path, list)]
+        offsets = np.zeros(len(paths) + 1, np.int64)
+        np.cumsum([len(path) for path in paths], out=offsets[1:])
+        hops = [hop if type(hop) is int else 0 for path in paths for hop in path]
+        zeros = np.zeros(len(paths), np.int64)
+        return cls(offsets, hops, zeros.astype(np.float64), zeros, [None], zeros, [None])
+
+    @classmethod
+    def from_scan(cls, result):
+        # update_store.ScanResult: paths are gathered straight from the partition columns
+        offsets_parts, hop_parts, ts_parts, prefix_parts, peer_parts = [], [], [], [], []
+        prefixes, peers = {}, {}
+        withdrawals = 0
+        base = 0
+        for hour, collector, rows in result.segments:
+            part = result.store.partition(hour, collector)
+            announced = part["type"][rows] != 1
+            withdrawals += int(len(rows) - announced.sum())
+            rows = rows[announced].astype(np.int64)
+            starts = part["path_offsets"][rows].astype(np.int64)
+            lengths = part["path_offsets"][rows + 1].astype(np.int64) - starts
+            ends = np.cumsum(lengths)
+            gather = np.repeat(starts - (ends - lengths), lengths) + np.arange(ends[-1] if len(ends) else 0)
+            hop_parts.append(part["path_asns"][gather])
+            offsets_parts.append(base + ends)
+            base += int(ends[-1]) if len(ends) else 0
+            ts_parts.append(part["timestamp"][rows])
+
+            pids = part["prefix_id"][rows]
+            local, inverse = np.unique(pids, return_inverse=True)
+            remap = np.array([prefixes.setdefault(part.prefix(pid), len(prefixes)) for pid in local.tolist()], np.int64)
+            prefix_parts.append(remap[inverse])
+            local, inverse = np.unique(part["peer_asn"][rows], return_inverse=True)
+            remap = np.array([peers.setdefault(f"{collector}-{peer}", len(peers)) for peer in local.tolist()], np.int64)
+            peer_parts.append(remap[inverse])
+
+        def joined(parts, dtype):
+            return np.concatenate(parts) if parts else np.empty(0, dtype)
+
+        offsets = np.concatenate(([0], joined(offsets_parts, np.int64)))
+        return cls(offsets, joined(hop_parts, np.uint32), joined(ts_parts, np.float64),
+                   joined(prefix_parts, np.int64), prefixes, joined(peer_parts, np.int64), peers, withdrawals)
+
+    def select(self, mask):
+        # A new table with only the paths where mask is True
+        mask = np.asarray(mask, bool)
+        starts = self.offsets[:-1][mask]
+        lengths = self.lengths()[mask]
+        ends = np.cumsum(lengths)
+        gather = np.repeat(starts - (ends - lengths), lengths) + np.arange(ends[-1] if len(ends) else 0)
+        return PathTable(np.concatenate(([0], ends)), self.asns[gather], self.timestamps[mask],
+                         self.prefix_ids[mask], self.prefixes, self.peer_ids[mask], self.peers, self.withdrawals)
+
+    def matching(self, origin=None, prefix=None):
+        # Path mask: announced by `origin`, and/or for a prefix overlapping `prefix`
+        mask = np.ones(len(self), bool)
+        if origin is not None:
+            mask &= self.origins() == origin
+        if prefix is not None:
+            version, key, length = parse_prefix(prefix)
+            width = FAMILIES[version][1]
+            overlaps = np.zeros(len(self.prefixes), bool)
+            for i, candidate in enumerate(self.prefixes):
+                try:
+                    c_version, c_key, c_length = parse_prefix(candidate or "")
+                except ValueError:
+                    continue
+                shift = width - min(length, c_length)
+                overlaps[i] = c_version == version and (c_key >> shift) == (key >> shift)
+            mask &= overlaps[self.prefix_ids]
+        return mask
+
+    # Per-path columns
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def path_index(self):
+        # Path number of every hop in asns
+        return np.repeat(np.arange(len(self)), self.lengths())
+
+    def origins(self):
+        # Last hop of each path (0 for empty paths and AS_SET origins)
+        found = np.zeros(len(self), np.uint32)
+        nonempty = self.lengths() > 0
+        found[nonempty] = self.asns[self.offsets[1:][nonempty] - 1]
+        return found
+
+    def first_hops(self):
+        found = np.zeros(len(self), np.uint32)
+        nonempty = self.lengths() > 0
+        found[nonempty] = self.asns[self.offsets[:-1][nonempty]]
+        return found
+
+    def _hop_pairs(self):
+        # Masks over consecutive hop pairs (asns[i], asns[i + 1]) inside the same path
+        index = self.path_index()
+        same_path = index[1:] == index[:-1]
+        repeated = same_path & (self.asns[1:] == self.asns[:-1])
+        return index, same_path, repeated
+
+    def prepend_counts(self):
+        # Extra copies of prepended hops, per path
+        index, _, repeated = self._hop_pairs()
+        return np.bincount(index[1:][repeated], minlength=len(self))
+
+    def edge_counts(self):
+        # (from ASN, to ASN, count) for every adjacency, prepends collapsed and AS_SETs skipped
+        _, same_path, repeated = self._hop_pairs()
+        left, right = self.asns[:-1], self.asns[1:]
+        keep = same_path & ~repeated & (left != 0) & (right != 0)
+        keys = (left[keep].astype(np.uint64) << np.uint64(32)) | right[keep]
+        keys, counts = np.unique(keys, return_counts=True)
+        return (keys >> np.uint64(32)).astype(np.uint32), (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32), counts
+
+    def origin_changes(self):
+        # Per prefix: times a peer's announced origin differed from that peer's previous one
+        origins = self.origins()
+        order = np.lexsort((self.timestamps, self.peer_ids, self.prefix_ids))
+        prefix, peer, origin = self.prefix_ids[order], self.peer_ids[order], origins[order]
+        changed = (prefix[1:] == prefix[:-1]) & (peer[1:] == peer[:-1]) & (origin[1:] != origin[:-1]) \
+            & (origin[1:] != 0) & (origin[:-1] != 0)
+        return np.bincount(prefix[1:][changed], minlength=len(self.prefixes))
+
+# --- Aggregates ---
+
+def _top(keys, counts, n):
+    order = np.argsort(-counts, kind="stable")[:n]
+    return keys[order].tolist(), counts[order].tolist()
+
+def summarize(table, top=TOP_N):
+    lengths = table.lengths()
+    announced = len(table)
+    summary = {"announcements": announced, "withdrawals": table.withdrawals, "paths": {}}
+    if not announced:
+        return summary
+
+    prepends = table.prepend_counts()
+    unique_lengths = lengths - prepends
+    histogram = np.bincount(lengths)
+    summary["paths"] = {
+        "mean_length": round(float(lengths.mean()), 3),
+        "mean_unique_length": round(float(unique_lengths.mean()), 3),
+        "max_length": int(lengths.max()),
+        "length_histogram": {str(n): int(c) for n, c in enumerate(histogram) if c}
+    }
+
+    asns, counts = np.unique(table.origins(), return_counts=True)
+    asns, counts = _top(asns, counts, top)
+    summary["origins"] = [{"asn": a, "count": c} for a, c in zip(asns, counts) if a]
+
+    asns, counts = np.unique(table.first_hops(), return_counts=True)
+    asns, counts = _top(asns, counts, top)
+    summary["first_hops"] = [{"asn": a, "count": c} for a, c in zip(asns, counts) if a]
+
+    # A prepender is counted once per path it prepends in
+    index, _, repeated = table._hop_pairs()
+    pairs = np.unique((index[1:][repeated].astype(np.uint64) << np.uint64(32)) | table.asns[1:][repeated])
+    asns, counts = np.unique((pairs & np.uint64(0xFFFFFFFF)).astype(np.uint32), return_counts=True)
+    asns, counts = _top(asns, counts, top)
+    summary["prepending"] = {
+        "paths": int((prepends > 0).sum()),
+        "share": round(float((prepends > 0).mean()), 4),
+        "top_prependers": [{"asn": a, "paths": c} for a, c in zip(asns, counts)]
+    }
+
+    left, right, counts = table.edge_counts()
+    order = np.argsort(-counts, kind="stable")[:top]
+    summary["edges"] = {
+        "distinct": int(len(counts)),
+        "top": [{"from": int(left[i]), "to": int(right[i]), "count": int(counts[i])} for i in order]
+    }
+
+    changes = table.origin_changes()
+    origins = table.origins()
+    known = origins != 0
+    seen = np.unique((table.prefix_ids[known].astype(np.uint64) << np.uint64(32)) | origins[known])
+    per_prefix = {}
+    for key in seen.tolist():
+        per_prefix.setdefault(key >> 32, []).append(key & 0xFFFFFFFF)
+    ids, counts = _top(np.arange(len(changes)), changes, top)
+    summary["origin_changes"] = {
+        "total": int(changes.sum()),
+        "prefixes_with_changes": int((changes > 0).sum()),
+        "multi_origin_prefixes": sum(1 for found in per_prefix.values() if len(found) > 1),
+        "top": [{"prefix": table.prefixes[i], "changes": c, "origins": per_prefix.get(i, [])}
+                for i, c in zip(ids, counts) if c]
+    }
+    return summary
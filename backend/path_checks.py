@@ -0,0 +1,268 @@
+import asyncio
+import bz2
+import gzip
+import os
+import time
+from collections import Counter
+
+AS_REL_FILE = os.environ.get("AS_REL_FILE")  # CAIDA as-rel (serial-1 or serial-2), .txt/.bz2/.gz
+# Origins we operate: "64500:174/3356,64501" (optional expected upstreams after the colon)
+MONITORED_ORIGINS = os.environ.get("MONITORED_ORIGINS", "")
+CACHE_SIZE = 1 << 18  # checked paths kept
+
+# Relationship of a to b
+PROVIDER = 1    # a is b's provider (a → b is downhill)
+PEER = 0
+CUSTOMER = -1   # a is b's customer (a → b is uphill)
+
+ROUTE_LEAK = "route_leak"                    # valley: a route from a provider/peer re-exported to a provider/peer
+UNEXPECTED_UPSTREAM = "unexpected_upstream"  # monitored origin reached through a neighbor outside its upstreams
+FAKE_ORIGIN = "fake_origin"                  # monitored ASN next to an AS it has no relationship with
+
+# --- AS Relationship Graph ---
+
+def open_text(path):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path)
+
+class AsRelationships:
+    # Every link is stored once, under lo << 32 | hi (lo < hi), with the
+    # relationship of lo to hi. A CAIDA file (~500k links) becomes one
+    # dict of ints: a lookup is a shift, an or and one probe, and the whole
+    # graph is invisible to the cyclic garbage collector.
+
+    def __init__(self):
+        self._links = {}
+        self.ases = 0
+
+    def __len__(self):
+        return len(self._links)
+
+    def add(self, a, b, rel):
+        if a < b:
+            self._links[a << 32 | b] = rel
+        else:
+            self._links[b << 32 | a] = -rel
+
+    def rel(self, a, b):
+        # PROVIDER / PEER / CUSTOMER, None when the link is unknown
+        if a < b:
+            return self._links.get(a << 32 | b)
+        rel = self._links.get(b << 32 | a)
+        return -rel if rel else rel
+
+    @classmethod
+    def load(cls, path):
+        # "<provider>|<customer>|-1" and "<peer>|<peer>|0"; serial-2 adds a
+        # source column, '#' lines are comments
+        graph = cls()
+        seen = set()
+        with open_text(path) as f:
+            for line in f:
+                if line.startswith("#"):
+                    continue
+                parts = line.split("|")
+                if len(parts) < 3:
+                    continue
+                try:
+                    a, b, rel = int(parts[0]), int(parts[1]), int(parts[2])
+                except ValueError:
+                    continue
+                if rel == -1:
+                    graph.add(a, b, PROVIDER)
+                elif rel == 0:
+                    graph.add(a, b, PEER)
+                else:
+                    continue
+                seen.add(a)
+                seen.add(b)
+        graph.ases = len(seen)
+        return graph
+
+# --- Path Checker ---
+
+def parse_monitored(spec):
+    # "64500:174/3356,64501" → {64500: frozenset({174, 3356}), 64501: None}
+    monitored = {}
+    for item in spec.split(","):
+        asn, _, upstreams = item.strip().partition(":")
+        if not asn:
+            continue
+        monitored[int(asn.upper().removeprefix("AS"))] = (
+            frozenset(int(u) for u in upstreams.split("/") if u) if upstreams else None)
+    return monitored
+
+class PathChecker:
+    # Checks one AS path (collector peer first, origin last) in a single
+    # pass over its hops: one relationship probe per link and one set probe
+    # per hop, so the cost depends on the path length only. The RIS stream
+    # repeats paths heavily and every prefix of a message shares one path,
+    # so results are also cached per path.
+
+    def __init__(self, graph=None, monitored=None):
+        self.graph = graph or AsRelationships()
+        self.monitored = monitored or {}
+        self.path = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.checked = 0
+        self.links = 0
+        self.unknown_links = 0
+        self.findings = Counter()
+        self._cache = {}
+
+    @property
+    def enabled(self):
+        return self.loaded_at is not None or bool(self.monitored)
+
+    def load(self, path):
+        t0 = time.perf_counter()
+        self.graph = AsRelationships.load(path)
+        self._cache = {}
+        self.path = path
+        self.loaded_at = time.time()
+        self.load_seconds = time.perf_counter() - t0
+        print(f"INFO:path_checks:Loaded {len(self.graph)} AS links ({self.graph.ases} ASes) "
+              f"from {path} in {self.load_seconds:.1f}s")
+
+    async def load_async(self, path):
+        try:
+            await asyncio.to_thread(self.load, path)
+        except (OSError, EOFError) as e:
+            print(f"WARNING:path_checks:Loading {path} failed: {e}")
+
+    def monitor(self, asn, upstreams=None):
+        self.monitored[int(asn)] = frozenset(upstreams) if upstreams else None
+        self._cache = {}
+
+    def unmonitor(self, asn):
+        self.monitored.pop(int(asn), None)
+        self._cache = {}
+
+    def check(self, path):
+        # → None for a clean path, else a tuple of (kind, culprit ASN, expected ASNs)
+        key = tuple(path) if type(path) is list else path
+        try:
+            found = self._cache[key]
+        except KeyError:
+            found = self._check(key)
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = found
+        except TypeError:
+            # AS_SET hops are lists, so the tuple is unhashable
+            found = self._check(key)
+        self.checked += 1
+        if found:
+            for kind, _, _ in found:
+                self.findings[kind] += 1
+        return found
+
+    def _check(self, path):
+        hops = []
+        for hop in path:
+            if type(hop) is not int:
+                hop = None  # AS_SET: no relationship can be checked across it
+            if not hops or hops[-1] != hop:
+                hops.append(hop)  # drop prepending
+        found = []
+        rel = self.graph.rel
+        monitored = self.monitored
+
+        # Walk in propagation order, origin → collector peer: uphill links,
+        # at most one peer link, then only downhill links
+        descending = False
+        for i in range(len(hops) - 1, 0, -1):
+            sender, receiver = hops[i], hops[i - 1]
+            if sender is None or receiver is None:
+                continue
+            link = rel(sender, receiver)
+            self.links += 1
+            if link is None:
+                self.unknown_links += 1
+                continue
+            if link == PROVIDER:
+                descending = True
+            elif descending:
+                # sender got the route from a provider or peer and passed it up or across
+                found.append((ROUTE_LEAK, sender, ()))
+                break
+            elif link == PEER:
+                descending = True
+
+        if monitored:
+            last = len(hops) - 1
+            for i in range(1, len(hops)):
+                asn = hops[i]
+                if asn not in monitored:
+                    continue
+                neighbor = hops[i - 1]
+                if neighbor is None:
+                    continue
+                upstreams = monitored[asn]
+                if upstreams is None and not self.graph:
+                    continue  # nothing to compare against
+                link = rel(neighbor, asn)
+                if link is None and (upstreams is None or neighbor not in upstreams):
+                    found.append((FAKE_ORIGIN, neighbor, tuple(upstreams or ())))
+                elif i == last and upstreams is not None and neighbor not in upstreams:
+                    # Any known link is a legitimate neighbor, so only configured upstreams can be unexpected
+                    found.append((UNEXPECTED_UPSTREAM, neighbor, tuple(upstreams)))
+        return tuple(found) or None
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "links": len(self.graph),
+            "ases": self.graph.ases,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "monitored_origins": len(self.monitored),
+            "checked_paths": self.checked,
+            "cached_paths": len(self._cache),
+            "unknown_link_share": self.unknown_links / self.links if self.links else 0.0,
+            "findings": dict(self.findings)
+        }
+
+checker = PathChecker(monitored=parse_monitored(MONITORED_ORIGINS))
+
+def summarize_updates(updates, limit=100):
+    # Batch pass over RIPEstat-style updates (historic job results)
+    counts = Counter()
+    culprits = Counter()
+    anomalies = []
+    checked = 0
+    for update in updates:
+        if update.get("type") != "A":
+            continue
+        attrs = update.get("attrs") or {}
+        path = attrs.get("path") or []
+        if not path:
+            continue
+        checked += 1
+        found = checker.check(path)
+        if not found:
+            continue
+        for kind, culprit, expected in found:
+            counts[kind] += 1
+            culprits[(kind, culprit)] += 1
+            if len(anomalies) < limit:
+                anomalies.append({
+                    "kind": kind,
+                    "prefix": attrs.get("target_prefix"),
+                    "origin_as": path[-1] if type(path[-1]) is int else None,
+                    "culprit_as": culprit,
+                    "expected": list(expected),
+                    "peer": attrs.get("source_id"),
+                    "timestamp": update.get("timestamp"),
+                    "path": path
+                })
+    return {
+        "checked": checked,
+        "counts": dict(counts),
+        "top_culprits": [{"kind": kind, "asn": asn, "count": n} for (kind, asn), n in culprits.most_common(20)],
+        "anomalies": anomalies
+    }
@@ -0,0 +1,193 @@
+import socket
+
+# --- Prefix Encoding ---
+
+FAMILIES = {4: (socket.AF_INET, 32), 6: (socket.AF_INET6, 128)}
+
+def parse_prefix(prefix: str):
+    # "10.0.0.0/8" → (4, network int, 8); host bits are masked off
+    addr, _, length = prefix.partition("/")
+    version = 6 if ":" in addr else 4
+    family, width = FAMILIES[version]
+    length = int(length) if length else width
+    if not 0 <= length <= width:
+        raise ValueError(f"Invalid prefix length: {prefix}")
+    try:
+        key = int.from_bytes(socket.inet_pton(family, addr), "big")
+    except OSError:
+        raise ValueError(f"Invalid prefix: {prefix}")
+    key &= ~((1 << (width - length)) - 1)
+    return version, key, length
+
+def format_prefix(version, key, length):
+    family, width = FAMILIES[version]
+    return f"{socket.inet_ntop(family, key.to_bytes(width // 8, 'big'))}/{length}"
+
+# --- Patricia Trie ---
+
+class _Node:
+    __slots__ = ("key", "length", "value", "left", "right")
+
+    def __init__(self, key, length, value=None):
+        self.key = key
+        self.length = length
+        self.value = value
+        self.left = None
+        self.right = None
+
+class PrefixTrie:
+    # Path-compressed binary trie, one per address family. Only announced
+    # prefixes and the branch points between them get nodes, so every
+    # operation walks at most `prefix length` nodes. Values are opaque
+    # (the detector stores its origin state here); None marks glue nodes.
+
+    def __init__(self):
+        self._roots = {4: None, 6: None}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, prefix, value):
+        version, key, length = parse_prefix(prefix)
+        width = FAMILIES[version][1]
+        node = self._roots[version]
+        parent = None
+        parent_bit = 0
+        while node is not None:
+            # Length of the common leading bits of the new prefix and this node
+            common = width - (key ^ node.key).bit_length()
+            if node.length < common:
+                common = node.length
+            if length < common:
+                common = length
+            if common == node.length:
+                if common == length:
+                    if node.value is None:
+                        self.size += 1
+                    node.value = value
+                    return
+                parent = node
+                parent_bit = (key >> (width - 1 - common)) & 1
+                node = node.right if parent_bit else node.left
+                continue
+            # New prefix diverges from (or sits above) this node: splice in
+            if common == length:
+                fork = _Node(key, length, value)
+            else:
+                fork = _Node(key & ~((1 << (width - common)) - 1), common)
+                leaf = _Node(key, length, value)
+                if (key >> (width - 1 - common)) & 1:
+                    fork.right = leaf
+                else:
+                    fork.left = leaf
+            if (node.key >> (width - 1 - common)) & 1:
+                fork.right = node
+            else:
+                fork.left = node
+            self._attach(version, parent, parent_bit, fork)
+            self.size += 1
+            return
+        self._attach(version, parent, parent_bit, _Node(key, length, value))
+        self.size += 1
+
+    def _attach(self, version, parent, bit, node):
+        if parent is None:
+            self._roots[version] = node
+        elif bit:
+            parent.right = node
+        else:
+            parent.left = node
+
+    def _walk(self, version, key, length):
+        # Yields (node, bit) for every node on the path whose prefix covers
+        # key/length, shortest first; bit is the branch taken below it.
+        width = FAMILIES[version][1]
+        node = self._roots[version]
+        while node is not None and node.length <= length:
+            if width - (key ^ node.key).bit_length() < node.length:
+                return
+            bit = (key >> (width - 1 - node.length)) & 1 if node.length < length else 0
+            yield node, bit
+            if node.length == length:
+                return
+            node = node.right if bit else node.left
+
+    def get(self, prefix, default=None):
+        version, key, length = parse_prefix(prefix)
+        for node, _ in self._walk(version, key, length):
+            if node.length == length:
+                return default if node.value is None else node.value
+        return default
+
+    def remove(self, prefix):
+        version, key, length = parse_prefix(prefix)
+        path = []
+        for node, bit in self._walk(version, key, length):
+            if node.length == length:
+                break
+            path.append((node, bit))
+        else:
+            return None
+        if node.value is None:
+            return None
+        value, node.value = node.value, None
+        self.size -= 1
+        # Collapse the node, and its parent if that leaves a one-child glue node
+        self._compact(version, node, path)
+        return value
+
+    def _compact(self, version, node, path):
+        while node is not None and node.value is None and (node.left is None or node.right is None):
+            child = node.left or node.right
+            parent, bit = path.pop() if path else (None, 0)
+            self._attach(version, parent, bit, child)
+            node = parent
+
+    def covering(self, prefix, include_self=True):
+        # All stored prefixes equal to or less specific than `prefix`, shortest first
+        version, key, length = parse_prefix(prefix)
+        return [
+            (format_prefix(version, node.key, node.length), node.value)
+            for node, _ in self._walk(version, key, length)
+            if node.value is not None and (include_self or node.length < length)
+        ]
+
+    def longest_covering(self, prefix, include_self=True):
+        found = self.covering(prefix, include_self)
+        return found[-1] if found else None
+
+    def more_specifics(self, prefix, include_self=True):
+        # All stored prefixes equal to or more specific than `prefix`
+        version, key, length = parse_prefix(prefix)
+        width = FAMILIES[version][1]
+        node = self._roots[version]
+        while node is not None and node.length < length:
+            if width - (key ^ node.key).bit_length() < node.length:
+                return []
+            node = node.right if (key >> (width - 1 - node.length)) & 1 else node.left
+        if node is None or width - (key ^ node.key).bit_length() < length:
+            return []
+        found = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.value is not None and (include_self or node.length > length):
+                found.append((format_prefix(version, node.key, node.length), node.value))
+            if node.right is not None:
+                stack.append(node.right)
+            if node.left is not None:
+                stack.append(node.left)
+        return found
+
+    def items(self):
+        for version, root in self._roots.items():
+            stack = [root] if root is not None else []
+            while stack:
+                node = stack.pop()
+                if node.value is not None:
+                    yield format_prefix(version, node.key, node.length), node.value
+                if node.right is not None:
+                    stack.append(node.right)
+                if node.left is not None:
+                    stack.append(node.left)
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+# 1 mounts the unauthenticated /debug/profile endpoints; keep them off public ports
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "0") == "1"
+DEFAULT_INTERVAL_MS = 10
+MAX_PROFILE_SECONDS = 300
+MAX_STACK_DEPTH = 64
+
+# --- Sampling Profiler ---
+
+class SamplingProfiler:
+    # A daemon thread snapshots every other thread's Python stack each
+    # `interval` and counts identical stacks. The profiled code is never
+    # instrumented, so overhead is one sys._current_frames() per sample and
+    # nothing at all while stopped. Output is the collapsed-stack format
+    # understood by flamegraph.pl and speedscope.
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.samples = 0
+        self.interval = DEFAULT_INTERVAL_MS / 1000
+        self.started_at = None
+        self.stopped_at = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms=DEFAULT_INTERVAL_MS, seconds=60):
+        # Starts a fresh profile that stops by itself after `seconds`
+        if self.running:
+            return False
+        with self._lock:
+            self.stacks = Counter()
+            self.samples = 0
+        self.interval = max(1, interval_ms) / 1000
+        self.started_at, self.stopped_at = time.time(), None
+        self._stop.clear()
+        deadline = time.monotonic() + min(seconds, MAX_PROFILE_SECONDS)
+        self._thread = threading.Thread(target=self._run, args=(deadline,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def _run(self, deadline):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                        code = frame.f_code
+                        name = names.get(code)
+                        if name is None:
+                            name = names[code] = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+                        stack.append(name)
+                        frame = frame.f_back
+                    self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+        self.stopped_at = time.time()
+
+    def collapsed(self, limit=None):
+        # "outer;...;inner count" lines, heaviest first
+        with self._lock:
+            top = self.stacks.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in top)
+
+    def status(self):
+        with self._lock:
+            distinct, samples = len(self.stacks), self.samples
+        return {
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": samples,
+            "distinct_stacks": distinct,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at
+        }
+
+profiler = SamplingProfiler()
+
+# --- Endpoints ---
+
+# Mounted by both services when PROFILER_ENABLED=1
+router = APIRouter(prefix="/debug/profile")
+
+@router.post("/start")
+async def start_profile(interval_ms: float = DEFAULT_INTERVAL_MS, seconds: float = 60):
+    if not profiler.start(interval_ms, seconds):
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return profiler.status()
+
+@router.post("/stop")
+async def stop_profile():
+    await asyncio.to_thread(profiler.stop)
+    return profiler.status()
+
+@router.get("")
+async def get_profile(limit: int = None):
+    # Collapsed stacks: flamegraph.pl profile.txt > profile.svg, or open in speedscope
+    return PlainTextResponse(profiler.collapsed(limit))
@@ -0,0 +1,392 @@
+import asyncio
+import json
+import os
+import struct
+import time
+from functools import lru_cache
+
+from metrics import Collected
+from prefix_trie import FAMILIES, parse_prefix, format_prefix
+
+try:
+    import msgpack
+except ImportError:  # snapshots fall back to JSON
+    msgpack = None
+
+RIB_ENABLED = os.environ.get("RIB_ENABLED", "1") == "1"  # 0 skips the RIB on the ingest path
+RIB_SNAPSHOT_FILE = os.environ.get("RIB_SNAPSHOT_FILE")  # periodic snapshot, restored on startup when set
+RIB_SNAPSHOT_INTERVAL = int(os.environ.get("RIB_SNAPSHOT_INTERVAL", "300"))  # seconds between snapshots
+RIB_SNAPSHOT_MAX_AGE = int(os.environ.get("RIB_SNAPSHOT_MAX_AGE", "3600"))  # older snapshots are ignored on startup
+SNAPSHOT_CHUNK = 2000  # prefixes per snapshot frame; the loop gets control back between frames
+
+# Snapshot file: MAGIC, then frames of a 4-byte big-endian length, a codec
+# byte (m = msgpack, j = JSON) and one body:
+#
+#   first:  {"saved_at", "peers": [[collector, peer_asn]]}
+#   paths:  ["paths", [path, ...]] — the next path ids, in order
+#   routes: [version, length, networks, counts, routes] — networks hex, packed
+#           big-endian (width/8 bytes each), counts the routes per network,
+#           routes flattened [peer id, path id << 32 | since, ...]
+#
+# Each routes frame follows the paths frame holding the paths it uses first,
+# so neither the paths nor the routes are ever encoded in one piece. The
+# header frame is written first but built last, when every peer is known.
+
+MAGIC = b"RIBSNAP1"
+HEADER = struct.Struct("!I")
+
+# --- Prefix Encoding ---
+
+@lru_cache(maxsize=262144)
+def prefix_key(prefix):
+    # "10.0.0.0/8" → (4, 8, network bits as an int)
+    version, key, length = parse_prefix(prefix)
+    return version, length, key >> (FAMILIES[version][1] - length)
+
+def path_key(path):
+    # Interning key: the path as a tuple, AS_SET hops as tuples
+    try:
+        key = tuple(path)
+        hash(key)
+        return key
+    except TypeError:
+        return tuple(tuple(hop) if type(hop) is list else hop for hop in path)
+
+def _encode(body):
+    if msgpack is not None:
+        payload = b"m" + msgpack.packb(body)
+    else:
+        payload = b"j" + json.dumps(body, separators=(",", ":")).encode()
+    return HEADER.pack(len(payload)) + payload
+
+def _decode(payload):
+    if payload[:1] == b"m":
+        if msgpack is None:
+            raise ValueError("RIB snapshot is msgpack but the msgpack package is missing")
+        return msgpack.unpackb(payload[1:])
+    return json.loads(payload[1:])
+
+# --- RIB ---
+
+class Rib:
+    # Current route per (collector, peer, prefix), built from the RIS Live
+    # stream. Tables are nested dicts of ints: address family → prefix
+    # length → network bits → {peer id: path id << 32 | since}. Peers and
+    # AS paths are interned once (a full table shares a few hundred thousand
+    # distinct paths between millions of routes) and paths are refcounted,
+    # so a path disappears with its last route. Nothing here is a container
+    # of objects, so the RIB adds nothing to cyclic GC pauses.
+
+    def __init__(self):
+        self._levels = {4: {}, 6: {}}
+        self._peers = []         # peer id → (collector, peer_asn)
+        self._peer_ids = {}
+        self._paths = []         # path id → path tuple, None once free
+        self._path_ids = {}
+        self._refs = []
+        self._free = []
+        self.routes = 0
+        self.prefixes = 0
+        self.announcements = 0
+        self.withdrawals = 0
+        self.unknown_withdrawals = 0
+        self.invalid = 0
+        self.restored_from = None
+        self.saved_at = None
+        self.save_seconds = None
+        self.saves = 0
+        self.last_error = None
+
+    def __len__(self):
+        return self.routes
+
+    # --- Interning ---
+
+    def _peer(self, collector, peer_asn):
+        key = (collector, peer_asn)
+        peer = self._peer_ids.get(key)
+        if peer is None:
+            peer = self._peer_ids[key] = len(self._peers)
+            self._peers.append(key)
+        return peer
+
+    def _intern(self, key):
+        path = self._path_ids.get(key)
+        if path is None:
+            if self._free:
+                path = self._free.pop()
+                self._paths[path] = key
+                self._refs[path] = 0
+            else:
+                path = len(self._paths)
+                self._paths.append(key)
+                self._refs.append(0)
+            self._path_ids[key] = path
+        return path
+
+    def _release(self, path):
+        self._refs[path] -= 1
+        if not self._refs[path]:
+            del self._path_ids[self._paths[path]]
+            self._paths[path] = None
+            self._free.append(path)
+
+    # --- Updates ---
+
+    def apply(self, records):
+        # All records of one RIS message: same collector, peer, path and time
+        if not records:
+            return
+        first = records[0]
+        peer = self._peer(first.collector, first.peer_asn)
+        since = int(first.timestamp)
+        path = None
+        levels = self._levels
+        for record in records:
+            try:
+                version, length, network = prefix_key(record.prefix)
+            except (ValueError, KeyError, AttributeError):
+                self.invalid += 1
+                continue
+            level = levels[version].get(length)
+            if record.withdrawn:
+                self.withdrawals += 1
+                routes = level.get(network) if level is not None else None
+                old = routes.pop(peer, None) if routes is not None else None
+                if old is None:
+                    self.unknown_withdrawals += 1
+                    continue
+                self._release(old >> 32)
+                self.routes -= 1
+                if not routes:
+                    del level[network]
+                    self.prefixes -= 1
+                    if not level:
+                        del levels[version][length]
+                continue
+            self.announcements += 1
+            if path is None:
+                # Interned on the first announcement, so a message of
+                # withdrawals never leaves an unreferenced path behind
+                path = self._intern(path_key(record.path))
+            if level is None:
+                level = levels[version][length] = {}
+            routes = level.get(network)
+            if routes is None:
+                routes = level[network] = {}
+                self.prefixes += 1
+            old = routes.get(peer)
+            if old is not None and old >> 32 == path:
+                continue  # same path again: the route and its age are unchanged
+            routes[peer] = path << 32 | since
+            self._refs[path] += 1
+            if old is None:
+                self.routes += 1
+            else:
+                self._release(old >> 32)
+
+    # --- Queries ---
+
+    def _peer_filter(self, collector=None, peer_asn=None):
+        if collector is None and peer_asn is None:
+            return None
+        return {
+            peer for peer, (c, asn) in enumerate(self._peers)
+            if (collector is None or c == collector) and (peer_asn is None or str(asn) == str(peer_asn))
+        }
+
+    def _routes(self, routes, peers):
+        found = []
+        for peer, packed in routes.items():
+            if peers is not None and peer not in peers:
+                continue
+            collector, peer_asn = self._peers[peer]
+            path = self._paths[packed >> 32]
+            origin = path[-1] if path and type(path[-1]) is int else None
+            found.append({
+                "collector": collector,
+                "peer_asn": peer_asn,
+                "path": [list(hop) if type(hop) is tuple else hop for hop in path],
+                "origin_as": origin,
+                "since": packed & 0xffffffff
+            })
+        return found
+
+    def lookup(self, prefix, collector=None, peer_asn=None):
+        # Routes for exactly `prefix`, one per (collector, peer)
+        version, length, network = prefix_key(prefix)
+        routes = self._levels[version].get(length, {}).get(network)
+        if routes is None:
+            return []
+        return self._routes(routes, self._peer_filter(collector, peer_asn))
+
+    def covering(self, prefix, collector=None, peer_asn=None, include_self=True):
+        # Every prefix in the RIB equal to or less specific than `prefix`,
+        # shortest first; one probe per prefix length present in the RIB
+        version, key, length = parse_prefix(prefix)
+        width = FAMILIES[version][1]
+        peers = self._peer_filter(collector, peer_asn)
+        levels = self._levels[version]
+        found = []
+        for level in sorted(levels):
+            if level > length or (level == length and not include_self):
+                break
+            routes = levels[level].get(key >> (width - level))
+            if routes is None:
+                continue
+            matched = self._routes(routes, peers)
+            if matched:
+                network = (key >> (width - level)) << (width - level)
+                found.append({"prefix": format_prefix(version, network, level), "routes": matched})
+        return found
+
+    # --- Snapshots ---
+
+    async def save(self, path):
+        # Chunks are built on the event loop between updates, so each route
+        # is copied as it is at that moment; the file is written off the loop
+        t0 = time.perf_counter()
+        frames = []
+        snapshot_paths = []
+        emitted = 0
+        remap = {}
+        for version, levels in self._levels.items():
+            size = FAMILIES[version][1] // 8
+            for length, level in list(levels.items()):
+                items = list(level.items())
+                for start in range(0, len(items), SNAPSHOT_CHUNK):
+                    networks, counts, flat = [], [], []
+                    for network, routes in items[start:start + SNAPSHOT_CHUNK]:
+                        if not routes:
+                            continue
+                        networks.append(network.to_bytes(size, "big"))
+                        counts.append(len(routes))
+                        for peer, packed in routes.items():
+                            old = packed >> 32
+                            key = self._paths[old]
+                            new = remap.get(old)
+                            # Ids are freed and reused while the save yields; a reused id holds another path
+                            if new is None or snapshot_paths[new] is not key:
+                                new = remap[old] = len(snapshot_paths)
+                                snapshot_paths.append(key)
+                            flat.append(peer)
+                            flat.append(new << 32 | packed & 0xffffffff)
+                    if len(snapshot_paths) > emitted:
+                        frames.append(_encode(["paths", snapshot_paths[emitted:]]))
+                        emitted = len(snapshot_paths)
+                    if counts:
+                        frames.append(_encode([version, length, b"".join(networks).hex(), counts, flat]))
+                    await asyncio.sleep(0)
+        saved_at = time.time()
+        header = _encode({"saved_at": saved_at, "peers": [list(peer) for peer in self._peers]})
+        try:
+            await asyncio.to_thread(self._write, path, header, frames)
+        except OSError as e:
+            self.last_error = str(e)
+            print(f"WARNING:rib:Writing snapshot {path} failed: {e}")
+            return None
+        self.saved_at = saved_at
+        self.save_seconds = time.perf_counter() - t0
+        self.saves += 1
+        self.last_error = None
+        print(f"INFO:rib:Saved {self.routes} routes to {path} in {self.save_seconds:.1f}s")
+        return saved_at
+
+    @staticmethod
+    def _write(path, header, frames):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(header)
+            for frame in frames:
+                f.write(frame)
+        os.replace(tmp, path)
+
+    def restore(self, path, max_age=RIB_SNAPSHOT_MAX_AGE):
+        # Fills an empty RIB from a snapshot; called before the stream starts
+        t0 = time.perf_counter()
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a RIB snapshot")
+        pos = len(MAGIC)
+        frames = []
+        while pos < len(data):
+            size, = HEADER.unpack_from(data, pos)
+            pos += HEADER.size
+            frames.append(data[pos:pos + size])
+            pos += size
+        header = _decode(frames[0])
+        age = time.time() - header["saved_at"]
+        if max_age and age > max_age:
+            print(f"INFO:rib:Ignoring snapshot {path}, saved {age:.0f}s ago (RIB_SNAPSHOT_MAX_AGE={max_age})")
+            return False
+        for collector, peer_asn in header["peers"]:
+            self._peer(collector, peer_asn)
+        ids = []
+        for payload in frames[1:]:
+            frame = _decode(payload)
+            if frame[0] == "paths":
+                ids.extend(self._intern(path_key(p)) for p in frame[1])
+                continue
+            version, length, networks, counts, flat = frame
+            size = FAMILIES[version][1] // 8
+            networks = bytes.fromhex(networks)
+            level = self._levels[version].setdefault(length, {})
+            i = 0
+            for n, count in enumerate(counts):
+                routes = level[int.from_bytes(networks[n * size:(n + 1) * size], "big")] = {}
+                for j in range(i, i + 2 * count, 2):
+                    path_id = ids[flat[j + 1] >> 32]
+                    routes[flat[j]] = path_id << 32 | flat[j + 1] & 0xffffffff
+                    self._refs[path_id] += 1
+                i += 2 * count
+                self.routes += count
+            self.prefixes += len(counts)
+        self.restored_from = header["saved_at"]
+        print(f"INFO:rib:Restored {self.routes} routes ({self.prefixes} prefixes) from {path} "
+              f"in {time.perf_counter() - t0:.1f}s, saved {age:.0f}s ago")
+        return True
+
+    async def restore_async(self, path):
+        try:
+            return await asyncio.to_thread(self.restore, path)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, IndexError, struct.error) as e:
+            print(f"WARNING:rib:Restoring {path} failed, starting cold: {e}")
+            return False
+
+    async def snapshot_loop(self, path, interval=RIB_SNAPSHOT_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            await self.save(path)
+
+    def stats(self):
+        return {
+            "routes": self.routes,
+            "prefixes": self.prefixes,
+            "peers": len(self._peers),
+            "paths": len(self._path_ids),
+            "announcements": self.announcements,
+            "withdrawals": self.withdrawals,
+            "unknown_withdrawals": self.unknown_withdrawals,
+            "invalid_prefixes": self.invalid,
+            "snapshot_file": RIB_SNAPSHOT_FILE,
+            "restored_from": self.restored_from,
+            "saved_at": self.saved_at,
+            "save_seconds": self.save_seconds,
+            "last_error": self.last_error
+        }
+
+rib = Rib()
+
+# --- Metrics ---
+
+Collected("rib_routes", "Routes in the RIB, one per (collector, peer, prefix)", lambda: rib.routes)
+Collected("rib_prefixes", "Prefixes with at least one route in the RIB", lambda: rib.prefixes)
+Collected("rib_paths", "Distinct AS paths interned by the RIB", lambda: len(rib._path_ids))
+Collected("rib_snapshots", "RIB snapshots written", lambda: rib.saves, kind="counter")
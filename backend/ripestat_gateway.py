@@ -0,0 +1,289 @@
+import asyncio
+import os
+import random
+import time
+from collections import OrderedDict, deque
+
+import httpx
+
+from metrics import Counter, Histogram
+
+RIPESTAT_URL = os.environ.get("RIPESTAT_URL", "https://stat.ripe.net/data")
+RIPESTAT_SOURCEAPP = os.environ.get("RIPESTAT_SOURCEAPP", "bgphijackdetector")  # identifies us to RIPE NCC
+RIPESTAT_RATE = float(os.environ.get("RIPESTAT_RATE", "8"))     # requests/second, 0 = unlimited
+RIPESTAT_BURST = int(os.environ.get("RIPESTAT_BURST", "16"))
+RIPESTAT_CACHE_SIZE = int(os.environ.get("RIPESTAT_CACHE_SIZE", "5000"))
+GLOBAL_CONCURRENCY = int(os.environ.get("GLOBAL_CONCURRENCY", "32"))  # in-flight upstream requests
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5   # seconds
+BACKOFF_MAX = 30     # seconds
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LATENCY_SAMPLES = 1024
+
+# Seconds a successful response stays fresh, per data call. 0 = never
+# cached (bgp-updates windows are cached by window_cache instead).
+ENDPOINT_TTLS = {
+    "as-overview": 86400,
+    "announced-prefixes": 3600,
+    "routing-status": 300,
+    "geoloc": 86400,
+    "looking-glass": 60,
+    "bgp-updates": 0,
+}
+DEFAULT_TTL = 600
+
+REQUEST_SECONDS = Histogram("ripestat_request_seconds", "Upstream RIPEstat request latency", ("endpoint",))
+RETRIES = Counter("ripestat_retries", "Upstream RIPEstat requests retried", ("endpoint", "reason"))
+
+# --- Shared HTTP Client ---
+
+_client = None
+
+def get_client():
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=20,
+            limits=httpx.Limits(max_connections=GLOBAL_CONCURRENCY,
+                                max_keepalive_connections=GLOBAL_CONCURRENCY),
+        )
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def retry_delay(attempt, resp=None):
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(BACKOFF_MAX, int(retry_after))
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+# --- Rate Limiting ---
+
+class TokenBucket:
+    # `rate` requests per second on average, bursts of up to `burst`.
+    # pause() holds every caller back, e.g. after a 429 with Retry-After.
+
+    def __init__(self, rate=RIPESTAT_RATE, burst=RIPESTAT_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.waits = 0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            if self.rate <= 0:
+                return
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            self.waits += 1
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+# --- Response Cache ---
+
+class TtlCache:
+    # LRU of (expires_at, value); expired entries are dropped on access
+
+    def __init__(self, size=RIPESTAT_CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, now=None):
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= (now or time.monotonic()):
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value, ttl, now=None):
+        self._items[key] = ((now or time.monotonic()) + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+# --- Metrics ---
+
+class EndpointStats:
+    __slots__ = ("name", "requests", "hits", "coalesced", "upstream", "errors", "throttled", "latency_total",
+                 "latency_max", "latencies")
+
+    def __init__(self, name=""):
+        self.name = name
+        self.requests = 0
+        self.hits = 0
+        self.coalesced = 0
+        self.upstream = 0
+        self.errors = 0
+        self.throttled = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def observe(self, seconds):
+        self.upstream += 1
+        self.latency_total += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        self.latencies.append(seconds)
+
+    def to_dict(self):
+        recent = sorted(self.latencies)
+
+        def quantile(q):
+            return round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1000, 1) if recent else None
+
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "upstream": self.upstream,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "hit_rate": round((self.hits + self.coalesced) / self.requests, 4) if self.requests else 0.0,
+            "latency_ms": {
+                "mean": round(self.latency_total / self.upstream * 1000, 1) if self.upstream else None,
+                "p50": quantile(0.5),
+                "p95": quantile(0.95),
+                "max": round(self.latency_max * 1000, 1)
+            }
+        }
+
+# --- Gateway ---
+
+def endpoint_name(url):
+    # ".../data/geoloc/data.json" → "geoloc"
+    parts = [p for p in url.split("?")[0].split("/") if p]
+    return parts[-2] if len(parts) >= 2 and parts[-1].startswith("data.") else parts[-1]
+
+class RipeStatGateway:
+    # Every RIPEstat data call in the backend goes through get(): a fresh
+    # cached answer is returned at once, identical concurrent requests share
+    # one upstream call, and upstream calls are paced by a token bucket and
+    # capped at GLOBAL_CONCURRENCY in flight.
+
+    def __init__(self, base_url=RIPESTAT_URL, limiter=None, cache=None, ttls=None):
+        self.base_url = base_url.rstrip("/")
+        self.limiter = limiter if limiter is not None else TokenBucket()
+        self.cache = cache if cache is not None else TtlCache()
+        self.ttls = {**ENDPOINT_TTLS, **(ttls or {})}
+        self.endpoints = {}
+        self._inflight = {}
+        self._slots = asyncio.Semaphore(GLOBAL_CONCURRENCY)
+
+    def url(self, endpoint):
+        if endpoint.startswith(("http://", "https://")):
+            return endpoint
+        return f"{self.base_url}/{endpoint}/data.json"
+
+    async def get(self, endpoint, params=None, ttl=None):
+        # endpoint: a data call name ("geoloc") or a full URL
+        url = self.url(endpoint)
+        name = endpoint_name(url)
+        stats = self.endpoints.get(name)
+        if stats is None:
+            stats = self.endpoints[name] = EndpointStats(name)
+        stats.requests += 1
+
+        params = {k: str(v) for k, v in (params or {}).items()}
+        if RIPESTAT_SOURCEAPP:
+            params.setdefault("sourceapp", RIPESTAT_SOURCEAPP)
+        key = (url, tuple(sorted(params.items())))
+        ttl = self.ttls.get(name, DEFAULT_TTL) if ttl is None else ttl
+
+        data = self.cache.get(key)
+        if data is not None:
+            stats.hits += 1
+            return data
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            stats.coalesced += 1
+            return await asyncio.shield(pending)
+
+        pending = asyncio.ensure_future(self._fetch(url, params, stats))
+        self._inflight[key] = pending
+        try:
+            data = await asyncio.shield(pending)
+        finally:
+            self._inflight.pop(key, None)
+        if ttl > 0:
+            self.cache.put(key, data, ttl)
+        return data
+
+    async def _fetch(self, url, params, stats):
+        client = get_client()
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            try:
+                async with self._slots:
+                    t0 = time.perf_counter()
+                    resp = await client.get(url, params=params)
+                    elapsed = time.perf_counter() - t0
+                    stats.observe(elapsed)
+                    REQUEST_SECONDS.labels(stats.name).observe(elapsed)
+            except httpx.TransportError:
+                if attempt >= MAX_RETRIES:
+                    stats.errors += 1
+                    raise
+                RETRIES.labels(stats.name, "transport").inc()
+                await asyncio.sleep(retry_delay(attempt))
+                attempt += 1
+                continue
+
+            if resp.status_code == 429:
+                stats.throttled += 1
+            if resp.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                delay = retry_delay(attempt, resp)
+                RETRIES.labels(stats.name, str(resp.status_code)).inc()
+                if resp.status_code == 429:
+                    # RIPE asked us to slow down: hold back every caller, not just this one
+                    self.limiter.pause(delay)
+                # Sleep outside the concurrency slot so other requests keep making progress
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            if resp.status_code >= 400:
+                stats.errors += 1
+            resp.raise_for_status()
+            return resp.json()
+
+    def stats(self):
+        totals = EndpointStats()
+        for stats in self.endpoints.values():
+            for field in ("requests", "hits", "coalesced", "upstream", "errors", "throttled", "latency_total"):
+                setattr(totals, field, getattr(totals, field) + getattr(stats, field))
+            totals.latency_max = max(totals.latency_max, stats.latency_max)
+            totals.latencies.extend(stats.latencies)
+        return {
+            **totals.to_dict(),
+            "cache_entries": len(self.cache),
+            "inflight": len(self._inflight),
+            "limiter_waits": self.limiter.waits,
+            "endpoints": {name: stats.to_dict() for name, stats in sorted(self.endpoints.items())}
+        }
+
+gateway = RipeStatGateway()
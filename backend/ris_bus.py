@@ -0,0 +1,222 @@
+import asyncio
+import json
+import os
+import struct
+
+from detector import Alert
+from ris_ingest import UpdateRecord
+from watchlist import WatchMatch
+from incidents import IncidentUpdate
+
+try:
+    import msgpack
+except ImportError:  # frames fall back to JSON
+    msgpack = None
+
+RIS_BUS_PATH = os.environ.get("RIS_BUS_PATH", "/tmp/ris-bus.sock")
+RIS_BUS_MAX_BUFFER = int(os.environ.get("RIS_BUS_MAX_BUFFER", str(16 * 1024 * 1024)))  # bytes queued per worker
+RECONNECT_DELAY = 1    # seconds, doubled up to MAX_RECONNECT_DELAY
+MAX_RECONNECT_DELAY = 10
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+# Local bus between the ingest process and the fan-out workers. One frame per
+# upstream RIS message: a 4-byte big-endian length, a codec byte (m = msgpack,
+# j = JSON) and a list of items, already normalized and filtered:
+#
+#   [0, prefix, origin, peer_asn, collector, timestamp, path, rpki]
+#   [1, kind, prefix, origin, expected, peer_asn, collector, timestamp, path, covering_prefix, culprit]
+#   [2, channel, entry, match, watched, label, prefix, origin, peer_asn, collector, timestamp, path, withdrawn]
+#   [3, id, event, kinds, prefix, origin, expected, visibility, collectors, detections, level, first_seen,
+#    last_seen, path, peer_asn, collector]
+
+HEADER = struct.Struct("!I")
+RECORD, ALERT, WATCH, INCIDENT = 0, 1, 2, 3
+
+# --- Frame Encoding ---
+
+def encode_items(items):
+    rows = []
+    for item in items:
+        if type(item) is IncidentUpdate:
+            rows.append((INCIDENT, item.id, item.event, item.kinds, item.prefix, item.origin, item.expected,
+                         item.visibility, item.collectors, item.detections, item.level, item.first_seen,
+                         item.last_seen, item.path, item.peer_asn, item.collector))
+        elif type(item) is WatchMatch:
+            rows.append((WATCH, item.channel, item.entry, item.match, item.watched, item.label, item.prefix,
+                         item.origin, item.peer_asn, item.collector, item.timestamp, item.path, item.withdrawn))
+        elif isinstance(item, Alert):
+            rows.append((ALERT, item.kind, item.prefix, item.origin, list(item.expected), item.peer_asn,
+                         item.collector, item.timestamp, item.path, item.covering_prefix, item.culprit))
+        else:
+            rows.append((RECORD, item.prefix, item.origin, item.peer_asn, item.collector, item.timestamp, item.path,
+                         item.rpki))
+    if msgpack is not None:
+        payload = b"m" + msgpack.packb(rows)
+    else:
+        payload = b"j" + json.dumps(rows, separators=(",", ":")).encode()
+    return HEADER.pack(len(payload)) + payload
+
+def decode_items(payload):
+    codec, body = payload[:1], payload[1:]
+    if codec == b"m":
+        if msgpack is None:
+            raise ValueError("bus frame is msgpack but the msgpack package is missing")
+        rows = msgpack.unpackb(body)
+    else:
+        rows = json.loads(body)
+    items = []
+    for row in rows:
+        if row[0] == RECORD:
+            items.append(UpdateRecord(*row[1:7], rpki=row[7]))
+        elif row[0] == ALERT:
+            items.append(Alert(*row[1:]))
+        elif row[0] == WATCH:
+            items.append(WatchMatch(*row[1:]))
+        else:
+            items.append(IncidentUpdate(*row[1:]))
+    return items
+
+# --- Ingest Side ---
+
+class BusPublisher:
+    # Unix socket server in the ingest process. Workers connect and only
+    # read; publishing writes the same encoded frame into each worker's
+    # transport buffer and never awaits, so a stalled worker cannot slow
+    # ingest down. A worker whose buffer passes max_buffer loses frames
+    # (counted) until it catches up.
+
+    def __init__(self, path=RIS_BUS_PATH, max_buffer=RIS_BUS_MAX_BUFFER):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.subscribers = set()
+        self.pending = []
+        self.server = None
+        self.frames = 0
+        self.items = 0
+        self.bytes = 0
+        self.dropped = 0
+
+    async def start(self):
+        if os.path.exists(self.path):
+            # Stale socket file from a previous ingest process
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self._accept, path=self.path)
+        print(f"INFO:ris_bus:Publishing on {self.path}")
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for writer in list(self.subscribers):
+            writer.close()
+        self.subscribers.clear()
+
+    async def _accept(self, reader, writer):
+        self.subscribers.add(writer)
+        print(f"INFO:ris_bus:Worker subscribed ({len(self.subscribers)} total)")
+        try:
+            # Workers never send; EOF or a reset means the worker is gone
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+            print(f"INFO:ris_bus:Worker left ({len(self.subscribers)} total)")
+
+    def add(self, item):
+        self.pending.append(item)
+
+    def flush(self):
+        if not self.pending:
+            return
+        items, self.pending = self.pending, []
+        if not self.subscribers:
+            return
+        frame = encode_items(items)
+        self.frames += 1
+        self.items += len(items)
+        for writer in list(self.subscribers):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                self.dropped += 1
+                continue
+            writer.write(frame)
+            self.bytes += len(frame)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "subscribers": len(self.subscribers),
+            "frames": self.frames,
+            "items": self.items,
+            "bytes": self.bytes,
+            "dropped_frames": self.dropped,
+            "buffered_bytes": sum(w.transport.get_write_buffer_size() for w in self.subscribers)
+        }
+
+# --- Worker Side ---
+
+class BusSubscriber:
+    # Reads frames from the ingest process and hands decoded items to
+    # `deliver`. Reconnects with backoff, so workers and the ingest process
+    # can be restarted independently of each other.
+
+    def __init__(self, path=RIS_BUS_PATH):
+        self.path = path
+        self.connected = False
+        self.frames = 0
+        self.items = 0
+        self.errors = 0
+        self.reconnects = 0
+
+    async def run(self, deliver):
+        delay = RECONNECT_DELAY
+        attempts = 0
+        while True:
+            if attempts:
+                self.reconnects += 1
+            attempts += 1
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                print(f"WARNING:ris_bus:Cannot reach ingest at {self.path}: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+            print(f"INFO:ris_bus:Subscribed to {self.path}")
+            self.connected = True
+            delay = RECONNECT_DELAY
+            try:
+                while True:
+                    size, = HEADER.unpack(await reader.readexactly(HEADER.size))
+                    if size > MAX_FRAME_BYTES:
+                        raise ValueError(f"bus frame of {size} bytes")
+                    payload = await reader.readexactly(size)
+                    try:
+                        items = decode_items(payload)
+                        self.frames += 1
+                        self.items += len(items)
+                        deliver(items)
+                    except Exception as e:
+                        # A malformed frame or a failing delivery costs that frame, never the
+                        # worker's feed: the task is not restarted if it ends
+                        self.errors += 1
+                        print(f"WARNING:ris_bus:Dropping bus frame: {e!r}")
+            except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+                print(f"WARNING:ris_bus:Bus connection lost: {e!r}")
+            except Exception as e:
+                print(f"WARNING:ris_bus:Bus reader failed, reconnecting: {e!r}")
+            finally:
+                self.connected = False
+                writer.close()
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "connected": self.connected,
+            "frames": self.frames,
+            "items": self.items,
+            "errors": self.errors,
+            "reconnects": self.reconnects
+        }
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:  # fall back to the stdlib parser
+    loads = json.loads
+
+# --- Timestamp Formatting ---
+
+@lru_cache(maxsize=4096)
+def _format_second(second):
+    return datetime.utcfromtimestamp(second).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def format_timestamp(ts):
+    # Records keep float epoch seconds; strings are only produced at the edge
+    return _format_second(int(ts))
+
+# --- Update Records ---
+
+class UpdateRecord:
+    # One prefix from one RIS UPDATE. Records from the same message share
+    # their path list. origin is None for withdrawals and AS_SET origins;
+    # rpki is the origin validation state once a VRP snapshot is loaded.
+
+    __slots__ = ("prefix", "origin", "peer_asn", "collector", "timestamp", "path", "withdrawn", "rpki", "_dict")
+
+    def __init__(self, prefix, origin, peer_asn, collector, timestamp, path, withdrawn=False, rpki=None):
+        self.prefix = prefix
+        self.origin = origin
+        self.peer_asn = peer_asn
+        self.collector = collector
+        self.timestamp = timestamp
+        self.path = path
+        self.withdrawn = withdrawn
+        self.rpki = rpki
+        self._dict = None
+
+    def to_dict(self):
+        # Built once and shared by every client the record is sent to
+        if self._dict is None:
+            self._dict = {
+                "prefix": self.prefix,
+                "origin_as": self.origin,
+                "peer_asn": self.peer_asn,
+                "collector": self.collector,
+                "timestamp": format_timestamp(self.timestamp)
+            }
+            if self.withdrawn:
+                self._dict["type"] = "withdrawal"
+            elif self.rpki is not None:
+                self._dict["rpki"] = self.rpki
+        return self._dict
+
+# --- Message Parsing ---
+
+def parse_message(raw):
+    # Raw RIS Live frame (str/bytes) → list of UpdateRecords, announcements first
+    msg = loads(raw)
+    if msg.get("type") != "ris_message":
+        return []
+    data = msg.get("data")
+    if not data or data.get("type") != "UPDATE":
+        return []
+    return parse_update(data)
+
+def parse_update(data):
+    path = data.get("path") or []
+    origin = path[-1] if path else None
+    if origin is not None and type(origin) is not int:
+        # AS_SET origin: ambiguous, passed through without an origin
+        origin = None
+    peer_asn = data.get("peer_asn")
+    collector = data.get("host")
+    timestamp = data["timestamp"]
+
+    records = []
+    append = records.append
+    for ann in data.get("announcements") or ():
+        for prefix in ann.get("prefixes") or ():
+            append(UpdateRecord(prefix, origin, peer_asn, collector, timestamp, path))
+    for prefix in data.get("withdrawals") or ():
+        append(UpdateRecord(prefix, None, peer_asn, collector, timestamp, path, True))
+    return records
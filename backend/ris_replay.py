@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import glob
+import gzip
+import json
+import os
+import time
+import zlib
+
+import websockets
+
+RIS_LIVE_URI = os.environ.get("RIS_LIVE_URI", "wss://ris-live.ripe.net/v1/ws/")
+SEGMENT_SECONDS = 300
+SEGMENT_PREFIX = "ris-"
+SEGMENT_SUFFIX = ".ndjson.gz"
+
+# Segment files hold one "<receive epoch> <raw RIS Live frame>" line per
+# upstream message. A segment being written is named ris-<start>.open...;
+# on rotation it is renamed ris-<start>-<end>.ndjson.gz, so the file names
+# alone form the time index. A recorder opening the directory closes the
+# .open segments a previous process left behind.
+
+# --- Recording ---
+
+class SegmentWriter:
+    def __init__(self, directory, segment_seconds=SEGMENT_SECONDS):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.frames = 0
+        self._file = None
+        self._path = None
+        self._start = None
+        self._last = None
+        os.makedirs(directory, exist_ok=True)
+        recover_segments(directory)
+
+    def write(self, raw, received_at=None):
+        received_at = received_at or time.time()
+        if self._file is not None and received_at - self._start >= self.segment_seconds:
+            self.close()
+        if self._file is None:
+            self._start = received_at
+            self._path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{received_at:.6f}.open{SEGMENT_SUFFIX}")
+            self._file = gzip.open(self._path, "wt", compresslevel=5)
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        self._file.write(f"{received_at:.6f} {raw}\n")
+        self._last = received_at
+        self.frames += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.close()
+        final = os.path.join(self.directory, f"{SEGMENT_PREFIX}{self._start:.6f}-{self._last:.6f}{SEGMENT_SUFFIX}")
+        os.replace(self._path, final)
+        self._file = None
+
+def recover_segments(directory):
+    # Keeps every complete line of a segment whose writer died and renames it
+    # like a closed one; the gzip stream itself is usually cut short
+    recovered = 0
+    for path in glob.glob(os.path.join(directory, f"{SEGMENT_PREFIX}*.open{SEGMENT_SUFFIX}")):
+        start = os.path.basename(path)[len(SEGMENT_PREFIX):-len(f".open{SEGMENT_SUFFIX}")]
+        tmp = f"{path}.tmp"
+        last = None
+        with gzip.open(tmp, "wt", compresslevel=5) as out:
+            try:
+                with gzip.open(path, "rt") as f:
+                    for line in f:
+                        if not line.endswith("\n"):
+                            break
+                        stamp = float(line.partition(" ")[0])
+                        out.write(line)
+                        last = stamp
+            except (EOFError, OSError, ValueError, zlib.error):
+                pass
+        if last is None:
+            os.remove(tmp)
+        else:
+            os.replace(tmp, os.path.join(directory, f"{SEGMENT_PREFIX}{start}-{last:.6f}{SEGMENT_SUFFIX}"))
+            recovered += 1
+        os.remove(path)
+    if recovered:
+        print(f"INFO:ris_replay:Recovered {recovered} unclosed segments in {directory}")
+    return recovered
+
+async def record(uri, directory, duration=None, segment_seconds=SEGMENT_SECONDS):
+    writer = SegmentWriter(directory, segment_seconds)
+    deadline = time.time() + duration if duration else None
+    try:
+        async with websockets.connect(uri, max_size=None) as websocket:
+            await websocket.send(json.dumps({"type": "ris_sub", "data": {"type": "UPDATE"}}))
+            print(f"INFO:ris_replay:Recording {uri} to {directory}")
+            while deadline is None or time.time() < deadline:
+                timeout = None if deadline is None else max(0.0, deadline - time.time())
+                try:
+                    raw = await asyncio.wait_for(websocket.recv(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                writer.write(raw)
+    finally:
+        writer.close()
+        print(f"INFO:ris_replay:Recorded {writer.frames} frames")
+
+# --- Reading Segments ---
+
+def list_segments(directory, start=None, until=None):
+    # Closed segments overlapping [start, until], oldest first
+    segments = []
+    for path in glob.glob(os.path.join(directory, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")):
+        name = os.path.basename(path)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+        if name.endswith(".open"):
+            continue
+        first, _, last = name.partition("-")
+        first, last = float(first), float(last or first)
+        if (start is None or last >= start) and (until is None or first <= until):
+            segments.append((first, path))
+    return [path for _, path in sorted(segments)]
+
+def iter_frames(directory, start=None, until=None):
+    # Yields (receive epoch, raw frame) in recorded order
+    for path in list_segments(directory, start, until):
+        with gzip.open(path, "rt") as f:
+            for line in f:
+                stamp, _, raw = line.rstrip("\n").partition(" ")
+                ts = float(stamp)
+                if start is not None and ts < start:
+                    continue
+                if until is not None and ts > until:
+                    return
+                yield ts, raw
+
+# --- Replay Server ---
+
+class ReplayServer:
+    # Speaks enough of the RIS Live protocol for ris_live_listener: every
+    # connection that sends ris_sub gets its own replay of the recording.
+    # speed=1 keeps the recorded pacing, N plays N times faster, and
+    # speed=None sends as fast as the socket allows.
+
+    def __init__(self, directory, speed=1.0, start=None, until=None, loop=False):
+        self.directory = directory
+        self.speed = speed
+        self.start = start
+        self.until = until
+        self.loop = loop
+        self.sent = 0
+
+    async def _replay(self, websocket):
+        while True:
+            first = None
+            began = time.perf_counter()
+            for n, (ts, raw) in enumerate(iter_frames(self.directory, self.start, self.until)):
+                if first is None:
+                    first = ts
+                if self.speed:
+                    delay = began + (ts - first) / self.speed - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                elif n % 100 == 0:
+                    await asyncio.sleep(0)
+                await websocket.send(raw)
+                self.sent += 1
+            if not self.loop or first is None:
+                return
+
+    async def handler(self, websocket):
+        replay = None
+        try:
+            async for message in websocket:
+                try:
+                    request = json.loads(message)
+                except ValueError:
+                    continue
+                if request.get("type") == "ris_sub" and replay is None:
+                    replay = asyncio.create_task(self._replay(websocket))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if replay is not None:
+                replay.cancel()
+
+    async def serve(self, host="0.0.0.0", port=8766):
+        async with websockets.serve(self.handler, host, port, max_size=None):
+            print(f"INFO:ris_replay:Replaying {self.directory} on ws://{host}:{port}/v1/ws/ "
+                  f"at {'max' if not self.speed else f'{self.speed}x'} speed")
+            await asyncio.Future()
+
+# --- Command Line ---
+
+def parse_speed(value):
+    return None if value == "max" else float(value)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record and replay the RIS Live stream")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record")
+    rec.add_argument("--dir", default="recordings")
+    rec.add_argument("--uri", default=RIS_LIVE_URI)
+    rec.add_argument("--duration", type=float, help="seconds to record (default: until interrupted)")
+    rec.add_argument("--segment-seconds", type=int, default=SEGMENT_SECONDS)
+
+    srv = sub.add_parser("serve")
+    srv.add_argument("--dir", default="recordings")
+    srv.add_argument("--host", default="0.0.0.0")
+    srv.add_argument("--port", type=int, default=8766)
+    srv.add_argument("--speed", type=parse_speed, default=1.0, help="1, N (times faster) or max")
+    srv.add_argument("--from", dest="start", type=float, help="epoch to start from")
+    srv.add_argument("--until", type=float, help="epoch to stop at")
+    srv.add_argument("--loop", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        asyncio.run(record(args.uri, args.dir, args.duration, args.segment_seconds))
+    else:
+        server = ReplayServer(args.dir, args.speed, args.start, args.until, args.loop)
+        asyncio.run(server.serve(args.host, args.port))
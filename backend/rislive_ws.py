@@ -1,26 +1,137 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
 import asyncio
 import json
-from datetime import datetime
+import os
+import time
 import websockets
 
+from detector import OriginDetector, Alert, origin_list
+from ris_ingest import parse_message, UpdateRecord
+from ris_replay import SegmentWriter
+from metrics import Counter, Histogram, Collected, FAST_BUCKETS, render as render_metrics, CONTENT_TYPE
+from profiler import router as profiler_router, PROFILER_ENABLED
+from fanout import FanoutHub, Client, ClientQueue, Subscription, BatchMode, CLIENT_QUEUE_SIZE, DROP_OLDEST
+from ris_bus import BusPublisher, BusSubscriber, RIS_BUS_PATH
+from rpki import validator, STATUS_COUNTERS
+from path_checks import checker as path_checker, AS_REL_FILE
+from rib import rib, RIB_ENABLED, RIB_SNAPSHOT_FILE
+from watchlist import watchlist, WatchMatch, entry_from_dict, WATCHLIST_FILE, PREFIX, ASN, DEFAULT_CHANNEL
+from incidents import correlator, WebhookSink, ALERT_DELIVERY, INCIDENT_WEBHOOK_URL
+
 app = FastAPI()
 
-frontend_clients = set()
+RIS_LIVE_URI = os.environ.get("RIS_LIVE_URI", "wss://ris-live.ripe.net/v1/ws/")
+RIS_RECORD_DIR = os.environ.get("RIS_RECORD_DIR")  # also record raw upstream frames here when set
+# standalone: one process holds the upstream subscription and serves clients.
+# ingest: holds the upstream subscription and runs the detector, publishing
+# normalized records and alerts on the local bus (RIS_BUS_PATH).
+# worker: serves clients from the bus, so any number of uvicorn workers
+# share a single upstream subscription.
+RIS_ROLE = os.environ.get("RIS_ROLE", "standalone")
 PING_INTERVAL = 10  # seconds
 PING_TIMEOUT = 15   # seconds
+MAX_CLIENT_QUEUE_SIZE = 100000
+detector = OriginDetector()
+hub = FanoutHub(ping_interval=PING_INTERVAL)
+watch_hubs = {}  # watchlist channel → FanoutHub, created by the first subscriber
+# Only the process holding the upstream subscription records
+recorder = SegmentWriter(RIS_RECORD_DIR) if RIS_RECORD_DIR and RIS_ROLE != "worker" else None
+bus = BusPublisher(RIS_BUS_PATH) if RIS_ROLE == "ingest" else None
+bus_subscriber = BusSubscriber(RIS_BUS_PATH) if RIS_ROLE == "worker" else None
+webhook = WebhookSink(INCIDENT_WEBHOOK_URL) if INCIDENT_WEBHOOK_URL and RIS_ROLE != "worker" else None
+METRICS_CLIENT_SERIES = int(os.environ.get("METRICS_CLIENT_SERIES", "50"))  # per-client series, deepest queues first
+
+# --- Metrics ---
+
+UPSTREAM_MESSAGES = Counter("ris_upstream_messages", "RIS Live frames received")
+UPSTREAM_BYTES = Counter("ris_upstream_bytes", "RIS Live frame bytes received")
+UPSTREAM_RECONNECTS = Counter("ris_upstream_reconnects", "RIS Live connection attempts after the first")
+DECODE_SECONDS = Histogram("ris_decode_seconds", "Time to parse one RIS Live frame into records", buckets=FAST_BUCKETS)
+RECORDS = Counter("ris_records", "Announcement records published to the fan-out hub")
+ALERTS = Counter("detector_alerts", "Origin alerts raised", ("kind",))
+INCIDENT_UPDATES = Counter("incident_updates", "Incident updates delivered", ("event",))
+WATCH_MATCHES = Counter("watchlist_matches", "Updates matching a watchlist entry, once per entry", ("match",))
+
+def deepest_clients():
+    return sorted(hub.clients, key=lambda c: len(c.queue), reverse=True)[:METRICS_CLIENT_SERIES]
+
+Collected("fanout_clients", "Connected WebSocket clients", lambda: len(hub))
+Collected("fanout_deliveries", "Items queued for clients (one per matching client)", lambda: hub.delivered, kind="counter")
+Collected("fanout_dropped", "Items dropped from client queues, disconnected clients included",
+          lambda: hub.dropped_closed + sum(c.queue.dropped for c in hub.clients), kind="counter")
+Collected("fanout_queued", "Items waiting in all client queues", lambda: sum(len(c.queue) for c in hub.clients))
+Collected("fanout_max_queue_depth", "Deepest client queue", lambda: max((len(c.queue) for c in hub.clients), default=0))
+Collected("fanout_client_queue_depth", "Queue depth per client", labelnames=("client",),
+          collect=lambda: {(c.id,): len(c.queue) for c in deepest_clients()})
+Collected("fanout_client_send_seconds", "Smoothed per-frame send latency per client", labelnames=("client",),
+          collect=lambda: {(c.id,): c.send_seconds for c in deepest_clients()})
+Collected("fanout_client_dropped", "Items dropped per client", labelnames=("client",), kind="counter",
+          collect=lambda: {(c.id,): c.queue.dropped for c in deepest_clients()})
+Collected("detector_prefixes", "Prefixes tracked by the origin detector", lambda: len(detector.trie))
+Collected("watchlist_entries", "Watchlist entries", lambda: len(watchlist))
+Collected("incidents_open", "Open incidents by level", labelnames=("level",),
+          collect=lambda: {(level,): n for level, n in correlator.stats()["by_level"].items()})
+if webhook is not None:
+    Collected("incident_webhook_batches", "Incident batches by webhook outcome", labelnames=("outcome",), kind="counter",
+              collect=lambda: {("sent",): webhook.sent, ("failed",): webhook.failed, ("dropped",): webhook.dropped})
+Collected("watchlist_clients", "Clients subscribed to a watchlist channel", labelnames=("channel",),
+          collect=lambda: {(channel,): len(h) for channel, h in watch_hubs.items()})
+if bus is not None:
+    Collected("ris_bus_subscribers", "Fan-out workers connected to the bus", lambda: len(bus.subscribers))
+    Collected("ris_bus_frames_sent", "Bus frames written, once per frame", lambda: bus.frames, kind="counter")
+    Collected("ris_bus_bytes_sent", "Bus bytes written across all workers", lambda: bus.bytes, kind="counter")
+    Collected("ris_bus_frames_dropped", "Bus frames skipped for workers that fell behind",
+              lambda: bus.dropped, kind="counter")
+if bus_subscriber is not None:
+    Collected("ris_bus_connected", "1 while this worker is subscribed to the bus", lambda: int(bus_subscriber.connected))
+    Collected("ris_bus_frames_received", "Bus frames received", lambda: bus_subscriber.frames, kind="counter")
+    Collected("ris_bus_reconnects", "Bus connection attempts after the first",
+              lambda: bus_subscriber.reconnects, kind="counter")
 
 # --- Client Connection Management ---
 
-async def connect_client(ws: WebSocket):
+def client_options(params):
+    # Filters and queue settings from connect-time query params or a subscribe message
+    filters = {key: params[key] for key in ("prefix", "prefix_match", "origin_asn", "peer_asn", "collector")
+               if params.get(key) not in (None, "")}
+    for key in ("origin_asn", "peer_asn", "collector"):
+        if isinstance(filters.get(key), str):
+            filters[key] = [v for v in filters[key].split(",") if v]
+    subscription = Subscription.from_dict(filters)
+    queue_size = max(1, min(int(params.get("queue_size") or CLIENT_QUEUE_SIZE), MAX_CLIENT_QUEUE_SIZE))
+    return subscription, queue_size, params.get("policy") or DROP_OLDEST
+
+def watch_hub(channel):
+    found = watch_hubs.get(channel)
+    if found is None:
+        found = watch_hubs[channel] = FanoutHub(ping_interval=PING_INTERVAL)
+    return found
+
+async def connect_client(ws: WebSocket, target=hub):
     await ws.accept()
-    frontend_clients.add(ws)
+    params = dict(ws.query_params)
+    try:
+        subscription, queue_size, policy = client_options(params)
+        queue = ClientQueue(queue_size, policy)
+        batch = None
+        if params.get("batch_size") or params.get("batch_ms") or params.get("encoding"):
+            # e.g. ?batch_ms=100&batch_size=500&encoding=msgpack
+            batch = BatchMode(params.get("batch_size") or 500, params.get("batch_ms") or 100,
+                              params.get("encoding") or "columnar")
+    except ValueError as e:
+        # An empty subscription would match everything, so refuse the client instead
+        await ws.send_json({"type": "error", "detail": str(e)})
+        await ws.close(code=1008)
+        return None
+    return target.register(Client(ws, subscription, queue, batch))
 
-async def disconnect_client(ws: WebSocket):
-    frontend_clients.discard(ws)
+async def disconnect_client(client: Client, target=hub):
+    target.unregister(client)
     try:
         # Only attempt close if not already closed
-        await ws.close()
+        await client.ws.close()
     except RuntimeError:
         # WebSocket already closed, ignore
         pass
@@ -31,11 +142,194 @@ async def disconnect_client(ws: WebSocket):
 async def health():
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+if PROFILER_ENABLED:
+    app.include_router(profiler_router)
+
+def detector_or_404():
+    if RIS_ROLE == "worker":
+        raise HTTPException(status_code=404, detail="The detector runs in the ingest process")
+    return detector
+
+def validator_or_404():
+    if RIS_ROLE == "worker":
+        raise HTTPException(status_code=404, detail="RPKI validation runs in the ingest process")
+    return validator
+
+def rib_or_404():
+    if RIS_ROLE == "worker":
+        raise HTTPException(status_code=404, detail="The RIB is kept in the ingest process")
+    if not RIB_ENABLED:
+        raise HTTPException(status_code=404, detail="RIB disabled (RIB_ENABLED=0)")
+    return rib
+
+def watchlist_or_404():
+    if RIS_ROLE == "worker":
+        raise HTTPException(status_code=404, detail="The watchlist is matched in the ingest process")
+    return watchlist
+
+def correlator_or_404():
+    if RIS_ROLE == "worker":
+        raise HTTPException(status_code=404, detail="Incidents are correlated in the ingest process")
+    if ALERT_DELIVERY != "incidents":
+        raise HTTPException(status_code=404, detail="Incident correlation disabled (ALERT_DELIVERY=raw)")
+    return correlator
+
+@app.get("/api/fanout/stats")
+async def fanout_stats():
+    return hub.stats()
+
+@app.get("/api/bus/stats")
+async def bus_stats():
+    source = bus or bus_subscriber
+    if source is None:
+        raise HTTPException(status_code=404, detail="No bus in standalone mode (RIS_ROLE)")
+    return {"role": RIS_ROLE, "pid": os.getpid(), **source.stats()}
+
+@app.get("/api/detector/stats")
+async def detector_stats():
+    return detector_or_404().stats()
+
+@app.get("/api/prefixes/covering")
+async def covering_prefixes(prefix: str):
+    try:
+        found = detector_or_404().trie.covering(prefix)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid prefix")
+    return [{"prefix": p, "origins": origin_list(state)} for p, state in found]
+
+@app.get("/api/prefixes/more-specifics")
+async def more_specific_prefixes(prefix: str, limit: int = 1000):
+    try:
+        found = detector_or_404().trie.more_specifics(prefix)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid prefix")
+    return [{"prefix": p, "origins": origin_list(state)} for p, state in found[:limit]]
+
+@app.get("/api/rib/routes")
+async def rib_routes(prefix: str, collector: str = None, peer_asn: str = None):
+    # What each RIS peer currently sees for exactly this prefix
+    try:
+        return rib_or_404().lookup(prefix, collector, peer_asn)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid prefix")
+
+@app.get("/api/rib/covering")
+async def rib_covering(prefix: str, collector: str = None, peer_asn: str = None):
+    # Routes for the prefix and every less-specific in the RIB; an address finds what carries it
+    try:
+        return rib_or_404().covering(prefix, collector, peer_asn)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid prefix")
+
+@app.get("/api/rib/stats")
+async def rib_stats():
+    return rib_or_404().stats()
+
+@app.post("/api/rib/snapshot")
+async def rib_snapshot():
+    rib_or_404()
+    if not RIB_SNAPSHOT_FILE:
+        raise HTTPException(status_code=404, detail="No snapshot file configured (RIB_SNAPSHOT_FILE)")
+    if await rib.save(RIB_SNAPSHOT_FILE) is None:
+        raise HTTPException(status_code=500, detail=rib.last_error)
+    return rib.stats()
+
+@app.get("/api/incidents")
+async def get_incidents(limit: int = 100):
+    # Open incidents, highest level and widest visibility first
+    return correlator_or_404().top(limit)
+
+@app.get("/api/incidents/stats")
+async def incident_stats():
+    found = correlator_or_404().stats()
+    if webhook is not None:
+        found["webhook"] = webhook.stats()
+    return found
+
+class WatchlistRequest(BaseModel):
+    # Items are "193.0.0.0/21" / 64500 or {"prefix"|"asn", "match", "channel", "label"}
+    prefixes: list = []
+    asns: list = []
+    channel: str = DEFAULT_CHANNEL
+
+class WatchlistRemoveRequest(BaseModel):
+    ids: list[int]
+
+@app.get("/api/watchlist")
+async def get_watchlist(channel: str = None, limit: int = 1000, offset: int = 0):
+    entries = [e for e in watchlist_or_404().entries.values() if channel is None or e.channel == channel]
+    return {"count": len(entries), "entries": [e.to_dict() for e in entries[offset:offset + limit]]}
+
+@app.post("/api/watchlist")
+async def add_to_watchlist(request: WatchlistRequest):
+    # All or nothing: entries are validated before any is added
+    watchlist_or_404()
+    try:
+        entries = ([entry_from_dict(item, PREFIX, request.channel) for item in request.prefixes] +
+                   [entry_from_dict(item, ASN, request.channel) for item in request.asns])
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid watchlist entry: {e}")
+    added = [watchlist.add(entry) for entry in entries]
+    await watchlist.save()
+    return {"added": [entry.to_dict() for entry in added], "entries": len(watchlist)}
+
+@app.post("/api/watchlist/remove")
+async def remove_from_watchlist(request: WatchlistRemoveRequest):
+    watchlist_or_404()
+    removed = [entry_id for entry_id in request.ids if watchlist.remove(entry_id) is not None]
+    await watchlist.save()
+    return {"removed": removed, "entries": len(watchlist)}
+
+@app.delete("/api/watchlist/{entry_id}")
+async def delete_watchlist_entry(entry_id: int):
+    if watchlist_or_404().remove(entry_id) is None:
+        raise HTTPException(status_code=404, detail="Watchlist entry not found")
+    await watchlist.save()
+    return {"removed": [entry_id], "entries": len(watchlist)}
+
+@app.get("/api/watchlist/stats")
+async def watchlist_stats():
+    found = watchlist_or_404().stats()
+    found["subscribers"] = {channel: len(h) for channel, h in watch_hubs.items()}
+    return found
+
+@app.get("/api/rpki/stats")
+async def rpki_stats():
+    return validator_or_404().stats()
+
+@app.get("/api/path-checks/stats")
+async def path_check_stats():
+    detector_or_404()
+    return path_checker.stats()
+
+@app.post("/api/rpki/reload")
+async def rpki_reload():
+    if not validator_or_404().path:
+        raise HTTPException(status_code=404, detail="No VRP snapshot configured (RPKI_VRP_FILE)")
+    if await validator.reload() is None:
+        raise HTTPException(status_code=500, detail=validator.last_error)
+    return validator.stats()
+
 # --- WebSocket Handler for Frontend Connections ---
 
 @app.websocket("/ws/ris-live")
 async def ris_websocket(ws: WebSocket):
-    await connect_client(ws)
+    await serve_client(ws, hub)
+
+@app.websocket("/ws/watchlist")
+async def watchlist_websocket(ws: WebSocket, channel: str = DEFAULT_CHANNEL):
+    # Matches of the watchlist entries registered on `channel`; the usual
+    # filter, queue and batch parameters apply
+    await serve_client(ws, watch_hub(channel))
+
+async def serve_client(ws: WebSocket, target):
+    client = await connect_client(ws, target)
+    if client is None:
+        return
 
     try:
         while True:
@@ -46,23 +340,108 @@ async def ris_websocket(ws: WebSocket):
                 continue
 
             if msg == "ping":
-                await ws.send_text("pong")
+                client.queue.put("pong")
+            elif msg.startswith("{"):
+                # {"type": "subscribe", "filters": {...}} replaces this client's filters
+                try:
+                    request = json.loads(msg)
+                    if request.get("type") == "subscribe":
+                        subscription, _, _ = client_options(request.get("filters") or {})
+                        target.subscribe(client, subscription)
+                        client.queue.put({"type": "subscribed", "filters": request.get("filters") or {}})
+                except ValueError as e:
+                    client.queue.put({"type": "error", "detail": str(e)})
 
     except WebSocketDisconnect:
         # Client disconnected normally
-        await disconnect_client(ws)
+        await disconnect_client(client, target)
 
     except Exception as e:
         print(f"[WS Error] {e}")
-        await disconnect_client(ws)
+        await disconnect_client(client, target)
+
+# --- Record Processing (standalone and ingest roles) ---
+
+def publish(item):
+    # Queue for matching clients only; never waits on a socket
+    hub.publish(item)
+    if bus is not None:
+        bus.add(item)
+
+def raise_alert(alert):
+    ALERTS.labels(alert.kind).inc()
+    if ALERT_DELIVERY == "incidents":
+        # Delivered as incident updates on the next flush
+        correlator.add(alert)
+    else:
+        publish(alert)
+
+def deliver_incidents(updates):
+    # One batch per flush interval, at most one update per changed incident
+    for update in updates:
+        INCIDENT_UPDATES.labels(update.event).inc()
+        publish(update)
+    if bus is not None:
+        bus.flush()
+    if webhook is not None:
+        webhook.submit(updates)
+
+def publish_match(match):
+    # Watchlist matches only go to their channel, never to /ws/ris-live
+    WATCH_MATCHES.labels(match.match).inc()
+    target = watch_hubs.get(match.channel)
+    if target is not None:
+        target.publish(match)
+    if bus is not None:
+        bus.add(match)
+
+def process_records(records):
+    if RIB_ENABLED:
+        rib.apply(records)
+    if watchlist.entries:
+        # Withdrawals of watched prefixes match too
+        for match in watchlist.match(records):
+            publish_match(match)
+    # Read once per message: a snapshot reload swaps the table between messages
+    rpki = validator.table if validator.loaded else None
+    findings = None
+    if records and not records[0].withdrawn and path_checker.enabled:
+        # Every record of a message shares its path, so it is checked once
+        findings = path_checker.check(records[0].path)
+    for record in records:
+        if record.withdrawn:
+            continue
+        if rpki is not None:
+            record.rpki = rpki.validate(record.prefix, record.origin)
+            STATUS_COUNTERS[record.rpki].inc()
+        publish(record)
+        RECORDS.inc()
+        if record.origin is not None:
+            alerts = detector.process(record.prefix, record.origin, record.timestamp,
+                                      record.peer_asn, record.collector, record.path)
+            if alerts:
+                for alert in alerts:
+                    raise_alert(alert)
+            elif correlator.open:
+                correlator.observe(record)
+        if findings:
+            for kind, culprit, expected in findings:
+                raise_alert(Alert(kind, record.prefix, record.origin, expected, record.peer_asn, record.collector,
+                                  record.timestamp, record.path, culprit=culprit))
+    if bus is not None:
+        # One bus frame per upstream message
+        bus.flush()
 
 # --- RIS Live Stream Listener ---
 
 async def ris_live_listener():
-    uri = "wss://ris-live.ripe.net/v1/ws/"
+    attempts = 0
     while True:
+        if attempts:
+            UPSTREAM_RECONNECTS.inc()
+        attempts += 1
         try:
-            async with websockets.connect(uri) as websocket:
+            async with websockets.connect(RIS_LIVE_URI) as websocket:
                 print("INFO:rislive_ws:Subscribed to RIS UPDATE stream.")
                 subscribe_msg = {
                     "type": "ris_sub",
@@ -74,51 +453,68 @@ async def ris_live_listener():
 
                 while True:
                     msg = await websocket.recv()
-                    data = json.loads(msg)
-
-                    if data.get("type") == "UPDATE":
-                        announcements = data.get("data", {}).get("announcements", [])
-                        for ann in announcements:
-                            prefix = ann.get("prefix", "")
-                            origin_as = ann.get("next_hop", "")
-                            timestamp = data["data"]["timestamp"]
-
-                            update = {
-                                "prefix": prefix,
-                                "origin_as": origin_as,
-                                "timestamp": datetime.utcfromtimestamp(timestamp).strftime("%Y-%m-%dT%H:%M:%SZ")
-                            }
-
-                            # Broadcast update to all connected frontend clients
-                            for client in list(frontend_clients):
-                                try:
-                                    await client.send_json(update)
-                                except Exception:
-                                    await disconnect_client(client)
+                    UPSTREAM_MESSAGES.inc()
+                    UPSTREAM_BYTES.inc(len(msg))
+                    if recorder is not None:
+                        recorder.write(msg)
+
+                    t0 = time.perf_counter()
+                    records = parse_message(msg)
+                    DECODE_SECONDS.observe(time.perf_counter() - t0)
+                    process_records(records)
 
         except Exception as e:
             print(f"[RIS Live Error] {e}")
             await asyncio.sleep(5)
 
-# --- Background Task for Heartbeat Pings ---
-
-async def websocket_heartbeat():
-    while True:
-        await asyncio.sleep(PING_INTERVAL)
-
-        stale_clients = []
-        for client in list(frontend_clients):
-            try:
-                await client.send_text("ping")
-            except Exception:
-                stale_clients.append(client)
+# --- Bus Relay (worker role) ---
 
-        for client in stale_clients:
-            await disconnect_client(client)
+def relay(items):
+    # Records and alerts from the ingest process, already filtered
+    records = 0
+    for item in items:
+        if type(item) is WatchMatch:
+            target = watch_hubs.get(item.channel)
+            if target is not None:
+                target.publish(item)
+            continue
+        hub.publish(item)
+        records += type(item) is UpdateRecord
+    RECORDS.inc(records)
 
 # --- Startup Hook ---
 
 @app.on_event("startup")
 async def on_startup():
-    asyncio.create_task(ris_live_listener())
-    asyncio.create_task(websocket_heartbeat())
+    # The loop only keeps weak references to tasks; an idle bus read would
+    # otherwise be garbage collected
+    if bus_subscriber is not None:
+        app.state.source = asyncio.create_task(bus_subscriber.run(relay))
+        return
+    if validator.path:
+        app.state.rpki = asyncio.create_task(validator.watch())
+    if AS_REL_FILE:
+        app.state.paths = asyncio.create_task(path_checker.load_async(AS_REL_FILE))
+    if ALERT_DELIVERY == "incidents":
+        app.state.incidents = asyncio.create_task(correlator.run(deliver_incidents))
+    if webhook is not None:
+        app.state.webhook = asyncio.create_task(webhook.run())
+    if WATCHLIST_FILE:
+        watchlist.path = WATCHLIST_FILE
+        if os.path.exists(WATCHLIST_FILE):
+            await asyncio.to_thread(watchlist.load, WATCHLIST_FILE)
+    if RIB_ENABLED and RIB_SNAPSHOT_FILE:
+        # Resume warm: restored before the stream starts applying updates
+        await rib.restore_async(RIB_SNAPSHOT_FILE)
+        app.state.rib = asyncio.create_task(rib.snapshot_loop(RIB_SNAPSHOT_FILE))
+    if bus is not None:
+        await bus.start()
+    app.state.source = asyncio.create_task(ris_live_listener())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if recorder is not None:
+        # Renames the current segment so list_segments sees it
+        recorder.close()
+    if RIS_ROLE != "worker" and RIB_ENABLED and RIB_SNAPSHOT_FILE:
+        await rib.save(RIB_SNAPSHOT_FILE)
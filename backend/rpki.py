@@ -0,0 +1,257 @@
+import asyncio
+import csv
+import json
+import os
+import re
+import time
+
+from metrics import Counter, Collected
+from prefix_trie import FAMILIES, parse_prefix, format_prefix
+
+RPKI_VRP_FILE = os.environ.get("RPKI_VRP_FILE")  # rpki-client / Routinator JSON or CSV export
+RPKI_RELOAD_INTERVAL = int(os.environ.get("RPKI_RELOAD_INTERVAL", "60"))  # seconds between snapshot mtime checks
+CACHE_SIZE = 1 << 20  # (prefix, origin) results kept per table
+
+VALID = "valid"
+INVALID = "invalid"
+NOT_FOUND = "not-found"
+STATUSES = (VALID, INVALID, NOT_FOUND)
+
+# --- VRP Snapshot Parsing ---
+
+def parse_asn(value):
+    # 13335, "13335" or "AS13335"
+    if isinstance(value, int):
+        return value
+    value = value.strip()
+    return int(value[2:] if value[:2].upper() == "AS" else value)
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+def iter_json_roas(text):
+    # Decodes the "roas" array one object at a time. A single json.loads of
+    # a full snapshot holds the GIL for seconds; this keeps returning to the
+    # interpreter, so ingestion threads keep running during a reload.
+    start = text.find('"roas"')
+    start = text.index("[", start if start >= 0 else 0) + 1
+    decode = json.JSONDecoder().raw_decode
+    match = _SEPARATORS.match
+    pos = match(text, start).end()
+    end = len(text)
+    while pos < end and text[pos] != "]":
+        roa, pos = decode(text, pos)
+        yield roa
+        pos = match(text, pos).end()
+    if pos >= end:
+        # Truncated, or still being written when its mtime changed
+        raise ValueError("VRP snapshot ends inside the roas array")
+
+def read_vrps(path):
+    # → [(prefix, max_length, asn)]. JSON: {"roas": [{"prefix", "maxLength", "asn"}]}
+    # (rpki-client, Routinator, OctoRPKI); CSV: ASN,IP Prefix,Max Length[,Trust Anchor]
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip()[:1] in ("{", "["):
+        return [(roa["prefix"], int(roa.get("maxLength", roa.get("max_length")) or 0), parse_asn(roa["asn"]))
+                for roa in iter_json_roas(text)]
+    vrps = []
+    for row in csv.reader(text.splitlines()):
+        if len(row) < 3:
+            continue
+        try:
+            vrps.append((row[1].strip(), int(row[2]), parse_asn(row[0])))
+        except ValueError:
+            continue  # header line
+    return vrps
+
+# --- VRP Index ---
+
+class VrpTable:
+    # One hash table per (address family, VRP prefix length), keyed by the
+    # network bits. Validating a route probes only the lengths that occur
+    # in the snapshot and are no longer than the route (about 17 for IPv4,
+    # 30 for IPv6 on a full table), each probe a single dict lookup, so the
+    # cost does not grow with the number of VRPs. Results are cached per
+    # (prefix, origin); a reload builds a new table and with it a new cache.
+    #
+    # Each ROA is one int, asn << 8 | max_length, and a network with several
+    # ROAs a tuple of them. Dicts of ints are invisible to the cyclic garbage
+    # collector, so a full table adds nothing to GC pauses in the ingest loop.
+
+    def __init__(self, vrps=()):
+        tables = {4: {}, 6: {}}
+        self.size = 0
+        self.skipped = 0
+        for prefix, max_length, asn in vrps:
+            try:
+                version, key, length = parse_prefix(prefix)
+            except (ValueError, KeyError):
+                self.skipped += 1
+                continue
+            width = FAMILIES[version][1]
+            if not length <= max_length <= width:
+                max_length = max(length, min(max_length, width))
+            by_network = tables[version].setdefault(length, {})
+            network = key >> (width - length)
+            packed = asn << 8 | max_length
+            found = by_network.get(network)
+            if found is None:
+                by_network[network] = packed
+            elif found != packed and (type(found) is int or packed not in found):
+                by_network[network] = (found if type(found) is tuple else (found,)) + (packed,)
+            self.size += 1
+        # (length, host bits, table) per family, shortest first
+        self._levels = {
+            version: tuple((length, FAMILIES[version][1] - length, by_length[length]) for length in sorted(by_length))
+            for version, by_length in tables.items()
+        }
+        self._cache = {}
+
+    def __len__(self):
+        return self.size
+
+    def validate(self, prefix, origin):
+        # RFC 6811 origin validation; origin None (AS_SET) never matches
+        cache_key = (prefix, origin)
+        status = self._cache.get(cache_key)
+        if status is None:
+            status = self._lookup(prefix, origin)
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            self._cache[cache_key] = status
+        return status
+
+    def _lookup(self, prefix, origin):
+        try:
+            version, key, length = parse_prefix(prefix)
+        except (ValueError, KeyError, AttributeError):
+            return NOT_FOUND
+        status = NOT_FOUND
+        for level, shift, table in self._levels[version]:
+            if level > length:
+                break
+            entries = table.get(key >> shift)
+            if entries is None:
+                continue
+            status = INVALID
+            if type(entries) is int:
+                if entries >> 8 == origin and length <= entries & 0xff:
+                    return VALID
+                continue
+            for packed in entries:
+                if packed >> 8 == origin and length <= packed & 0xff:
+                    return VALID
+        return status
+
+    def covering(self, prefix):
+        # VRPs whose prefix covers `prefix`, shortest first
+        version, key, length = parse_prefix(prefix)
+        found = []
+        for level, shift, table in self._levels[version]:
+            if level > length:
+                break
+            entries = table.get(key >> shift)
+            if entries is None:
+                continue
+            network = format_prefix(version, (key >> shift) << shift, level)
+            for packed in (entries,) if type(entries) is int else entries:
+                found.append({"prefix": network, "max_length": packed & 0xff, "asn": packed >> 8})
+        return found
+
+# --- Snapshot Holder ---
+
+class RpkiValidator:
+    # Owns the current VrpTable. A reload parses and indexes the new
+    # snapshot off the event loop and then swaps one reference, so updates
+    # keep being validated against the old table until the new one is ready.
+
+    def __init__(self, path=RPKI_VRP_FILE):
+        self.path = path
+        self.table = VrpTable()
+        self.mtime = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.loads = 0
+        self.last_error = None
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def validate(self, prefix, origin):
+        return self.table.validate(prefix, origin)
+
+    def load(self, path=None):
+        path = path or self.path
+        t0 = time.perf_counter()
+        mtime = os.stat(path).st_mtime
+        table = VrpTable(read_vrps(path))
+        self.table = table
+        self.path, self.mtime = path, mtime
+        self.loaded_at = time.time()
+        self.load_seconds = time.perf_counter() - t0
+        self.loads += 1
+        self.last_error = None
+        print(f"INFO:rpki:Loaded {table.size} VRPs from {path} in {self.load_seconds:.1f}s")
+        return table
+
+    async def reload(self, path=None):
+        try:
+            return await asyncio.to_thread(self.load, path)
+        except Exception as e:
+            # Keep validating against the previous snapshot; watch() retries while the mtime differs
+            self.last_error = str(e)
+            print(f"WARNING:rpki:Loading {path or self.path} failed: {e}")
+            return None
+
+    async def watch(self, interval=RPKI_RELOAD_INTERVAL):
+        while True:
+            try:
+                changed = os.stat(self.path).st_mtime != self.mtime
+            except OSError:
+                changed = False
+            if changed:
+                await self.reload()
+            await asyncio.sleep(interval)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "vrps": self.table.size,
+            "skipped": self.table.skipped,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "loads": self.loads,
+            "cached_results": len(self.table._cache),
+            "last_error": self.last_error
+        }
+
+validator = RpkiValidator()
+
+# --- Metrics ---
+
+VALIDATIONS = Counter("rpki_validations", "Announcements tagged by RPKI origin validation state", ("status",))
+STATUS_COUNTERS = {status: VALIDATIONS.labels(status) for status in STATUSES}  # hot-path children
+
+Collected("rpki_vrps", "VRPs in the loaded snapshot", lambda: validator.table.size)
+Collected("rpki_snapshot_loads", "VRP snapshots loaded, first load included", lambda: validator.loads, kind="counter")
+Collected("rpki_snapshot_age_seconds", "Seconds since the snapshot file was last modified",
+          lambda: time.time() - validator.mtime if validator.mtime else 0)
+
+def origin_of(path):
+    # Last AS of a RIPEstat-style path; AS_SETs come through as lists
+    return path[-1] if path and type(path[-1]) is int else None
+
+def tag_updates(data):
+    # Adds "rpki": valid | invalid | not-found to every announcement of a
+    # RIPEstat bgp-updates response, validated against the current snapshot
+    if not validator.loaded:
+        return data
+    table = validator.table
+    for update in (data or {}).get("data", {}).get("updates") or ():
+        if update.get("type") != "A":
+            continue
+        attrs = update.get("attrs") or {}
+        status = update["rpki"] = table.validate(attrs.get("target_prefix"), origin_of(attrs.get("path")))
+        STATUS_COUNTERS[status].inc()
+    return data
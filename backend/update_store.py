@@ -0,0 +1,476 @@
+import argparse
+import asyncio
+import json
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+
+from job_store import DATA_DIR
+from prefix_trie import parse_prefix, format_prefix
+
+UPDATE_STORE_DIR = os.environ.get("UPDATE_STORE_DIR", os.path.join(DATA_DIR, "updates"))
+PARTITION_SECONDS = 3600
+TYPES = ("A", "W", "R")
+TYPE_CODES = {kind: code for code, kind in enumerate(TYPES)}
+MASK64 = (1 << 64) - 1
+MAX_OPEN_PARTITIONS = int(os.environ.get("UPDATE_STORE_MAX_OPEN", "256"))  # each holds one mapping + fd
+MAGIC = b"BGPCOLS1"
+ALIGN = 64
+
+# Layout: <dir>/<YYYYMMDDHH>/<collector>.cols, one file per hour and
+# collector holding every column, memory-mapped on read. Rows are sorted
+# by time. Partitions are immutable: new data for an existing partition
+# rewrites it. catalog.db lists partitions and the origin ASNs each one
+# holds, so scans only open the partitions they need.
+#
+# File:        magic, u8 header length, JSON {column: [dtype, offset, count]}, then
+#              the columns, each 64-byte aligned
+# Columns:     timestamp f8, type u1, peer_asn u4, origin u4 (0 = none), prefix_id u4,
+#              path_offsets u4 (rows + 1) and path_asns u4 (flattened, AS_SET hops = 0)
+# Dictionary:  prefix_version u1, prefix_length u1, prefix_hi/prefix_lo u8 (network,
+#              IPv4 left-aligned in 128 bits) — one entry per distinct prefix
+# Indexes:     origin_keys/origin_offsets/origin_rows and prefix_offsets/prefix_rows,
+#              row ids grouped by origin ASN and by prefix_id, in time order
+
+# --- Prefix Encoding ---
+
+@lru_cache(maxsize=262144)
+def split_prefix(prefix):
+    version, key, length = parse_prefix(prefix)
+    if version == 4:
+        key <<= 96
+    return version, length, key >> 64, key & MASK64
+
+def _mask(bits):
+    # Network mask for the top `bits` (0..64) bits of a 64-bit word, per element
+    safe = np.clip(bits, 1, 64).astype(np.uint64)
+    mask = ~((np.uint64(1) << (np.uint64(64) - safe)) - np.uint64(1))
+    return np.where(bits <= 0, np.uint64(0), mask)
+
+def _prefix_masks(lengths):
+    lengths = lengths.astype(np.int64)
+    return _mask(np.clip(lengths, 0, 64)), _mask(np.clip(lengths - 64, 0, 64))
+
+# --- Partition Building ---
+
+def _build_partition(records):
+    # records: mrt_ingest tuples (timestamp, type, collector, peer_asn, prefix, origin, path, communities)
+    records = sorted(records, key=lambda r: r[0])
+    n = len(records)
+    prefix_ids = {}
+    for r in records:
+        if r[4] not in prefix_ids:
+            prefix_ids[r[4]] = len(prefix_ids)
+    path_offsets = np.zeros(n + 1, np.uint32)
+    path_offsets[1:] = np.cumsum([len(r[6]) for r in records])
+    cols = {
+        "timestamp": np.fromiter((r[0] for r in records), np.float64, n),
+        "type": np.fromiter((TYPE_CODES[r[1]] for r in records), np.uint8, n),
+        "peer_asn": np.fromiter((r[3] or 0 for r in records), np.uint32, n),
+        "origin": np.fromiter((r[5] or 0 for r in records), np.uint32, n),
+        "prefix_id": np.fromiter((prefix_ids[r[4]] for r in records), np.uint32, n),
+        "path_offsets": path_offsets,
+        "path_asns": np.fromiter((hop if type(hop) is int else 0 for r in records for hop in r[6]),
+                                 np.uint32, int(path_offsets[-1]))
+    }
+
+    parts = [split_prefix(p) for p in prefix_ids]
+    cols["prefix_version"] = np.array([p[0] for p in parts], np.uint8)
+    cols["prefix_length"] = np.array([p[1] for p in parts], np.uint8)
+    cols["prefix_hi"] = np.array([p[2] for p in parts], np.uint64)
+    cols["prefix_lo"] = np.array([p[3] for p in parts], np.uint64)
+
+    order = np.argsort(cols["origin"], kind="stable").astype(np.uint32)
+    keys, starts = np.unique(cols["origin"][order], return_index=True)
+    cols["origin_keys"] = keys
+    cols["origin_offsets"] = np.append(starts, n).astype(np.uint32)
+    cols["origin_rows"] = order
+
+    order = np.argsort(cols["prefix_id"], kind="stable").astype(np.uint32)
+    cols["prefix_offsets"] = np.searchsorted(cols["prefix_id"][order], np.arange(len(prefix_ids) + 1)).astype(np.uint32)
+    cols["prefix_rows"] = order
+    return cols
+
+def write_columns(path, cols):
+    layout = {}
+    offset = 0
+    for name, values in cols.items():
+        offset = -(-offset // ALIGN) * ALIGN
+        layout[name] = [values.dtype.str, offset, len(values)]
+        offset += values.nbytes
+    header = json.dumps(layout).encode()
+    base = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, values in cols.items():
+            f.seek(base + layout[name][1])
+            f.write(values.tobytes())
+    # Readers holding the old mapping keep working until they drop it
+    os.replace(tmp, path)
+
+# --- Partition Reading ---
+
+class Partition:
+    # One read-only mapping per partition; columns are zero-copy views into
+    # it, so only the pages a query touches are read. Everything returned to
+    # callers is a copy, so dropping the Partition releases the mapping.
+
+    def __init__(self, path, hour, collector):
+        self.path = path
+        self.hour = hour
+        self.collector = collector
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = int.from_bytes(self._map[len(MAGIC):len(MAGIC) + 8], "little")
+        start = len(MAGIC) + 8
+        self._layout = json.loads(self._map[start:start + size])
+        self._base = -(-(start + size) // ALIGN) * ALIGN
+        self._cols = {}
+
+    def __getitem__(self, name):
+        col = self._cols.get(name)
+        if col is None:
+            dtype, offset, count = self._layout[name]
+            col = self._cols[name] = np.frombuffer(self._map, np.dtype(dtype), count, self._base + offset)
+        return col
+
+    def __len__(self):
+        return self._layout["timestamp"][2]
+
+    def origin_rows(self, origin):
+        keys = self["origin_keys"]
+        i = int(np.searchsorted(keys, origin))
+        if i == len(keys) or keys[i] != origin:
+            return np.empty(0, np.uint32)
+        offsets = self["origin_offsets"]
+        return self["origin_rows"][offsets[i]:offsets[i + 1]].copy()
+
+    def prefix_ids(self, prefix, match="more_specific"):
+        version, length, hi, lo = split_prefix(prefix)
+        versions, lengths = self["prefix_version"], self["prefix_length"]
+        his, los = self["prefix_hi"], self["prefix_lo"]
+        if match == "exact":
+            hit = (lengths == length) & (his == hi) & (los == lo)
+        elif match == "more_specific":
+            mask_hi, mask_lo = _prefix_masks(np.array([length]))
+            hit = (lengths >= length) & ((his & mask_hi[0]) == hi) & ((los & mask_lo[0]) == lo)
+        else:  # covering
+            mask_hi, mask_lo = _prefix_masks(lengths)
+            hit = (lengths <= length) & ((np.uint64(hi) & mask_hi) == his) & ((np.uint64(lo) & mask_lo) == los)
+        return np.flatnonzero(hit & (versions == version))
+
+    def prefix_mask(self, ids):
+        mask = np.zeros(len(self["prefix_version"]), bool)
+        mask[ids] = True
+        return mask
+
+    def prefix_rows(self, ids):
+        if len(ids) > 64:
+            # Broad prefixes: one pass over prefix_id beats gathering many small runs
+            return np.flatnonzero(self.prefix_mask(ids)[self["prefix_id"]]).astype(np.uint32)
+        offsets, rows = self["prefix_offsets"], self["prefix_rows"]
+        found = [rows[offsets[i]:offsets[i + 1]] for i in ids]
+        if not found:
+            return np.empty(0, np.uint32)
+        return np.sort(np.concatenate(found))  # always a copy
+
+    def select(self, start=None, end=None, origin=None, prefix=None, prefix_match="more_specific"):
+        # Row ids in time order; indexes are used before touching any column
+        rows = None
+        if origin is not None:
+            rows = self.origin_rows(origin)
+        if prefix is not None:
+            ids = self.prefix_ids(prefix, prefix_match)
+            if rows is None:
+                rows = self.prefix_rows(ids)
+            else:
+                rows = rows[self.prefix_mask(ids)[self["prefix_id"][rows]]]
+        first = self.hour * PARTITION_SECONDS
+        if (start is not None and start > first) or (end is not None and end < first + PARTITION_SECONDS):
+            ts = self["timestamp"]
+            lo = 0 if start is None else int(np.searchsorted(ts, start, "left"))
+            hi = len(ts) if end is None else int(np.searchsorted(ts, end, "left"))
+            if rows is None:
+                return np.arange(lo, hi, dtype=np.uint32)
+            return rows[(rows >= lo) & (rows < hi)]
+        if rows is None:
+            return np.arange(len(self), dtype=np.uint32)
+        return rows
+
+    def prefix(self, pid):
+        # Dictionary entry → "a.b.c.d/len"
+        version = int(self["prefix_version"][pid])
+        key = (int(self["prefix_hi"][pid]) << 64) | int(self["prefix_lo"][pid])
+        return format_prefix(version, key >> 96 if version == 4 else key, int(self["prefix_length"][pid]))
+
+    def records(self, rows):
+        # mrt_ingest-shaped tuples for the given rows (communities are not stored)
+        rows = np.asarray(rows, np.int64)
+        pids = self["prefix_id"][rows]
+        prefixes = {pid: self.prefix(pid) for pid in np.unique(pids).tolist()}
+        offsets, asns = self["path_offsets"], self["path_asns"]
+        collector = self.collector
+        return [
+            (ts, TYPES[kind], collector, peer, prefixes[pid], origin or None,
+             tuple(asns[offsets[row]:offsets[row + 1]].tolist()), ())
+            for row, ts, kind, peer, pid, origin in zip(
+                rows.tolist(), self["timestamp"][rows].tolist(), self["type"][rows].tolist(),
+                self["peer_asn"][rows].tolist(), pids.tolist(), self["origin"][rows].tolist())
+        ]
+
+# --- Scan Results ---
+
+class ScanResult:
+    # Matching row ids per partition; records are materialized lazily, page
+    # by page, reopening partitions through the store's bounded cache
+
+    def __init__(self, store, segments):
+        self.store = store
+        self.segments = [(hour, collector, rows) for hour, collector, rows in segments if len(rows)]
+
+    def __len__(self):
+        return sum(len(rows) for _, _, rows in self.segments)
+
+    def column(self, name):
+        # One row-level column for all matches, in (hour, collector) order
+        if not self.segments:
+            return np.empty(0)
+        return np.concatenate([self.store.partition(hour, collector)[name][rows]
+                               for hour, collector, rows in self.segments])
+
+    def records(self, offset=0, limit=None):
+        # Time-ordered: partitions of the same hour are merged by timestamp
+        hours = {}
+        for hour, collector, rows in self.segments:
+            hours.setdefault(hour, []).append((collector, rows))
+        remaining = limit
+        for hour in sorted(hours):
+            if remaining is not None and remaining <= 0:
+                return
+            group = hours[hour]
+            size = sum(len(rows) for _, rows in group)
+            if offset >= size:
+                offset -= size
+                continue
+            parts = [self.store.partition(hour, collector) for collector, _ in group]
+            ts = np.concatenate([part["timestamp"][rows] for part, (_, rows) in zip(parts, group)])
+            owner = np.concatenate([np.full(len(rows), i) for i, (_, rows) in enumerate(group)])
+            pos = np.concatenate([np.arange(len(rows)) for _, rows in group])
+            order = np.argsort(ts, kind="stable")[offset:]
+            if remaining is not None:
+                order = order[:remaining]
+                remaining -= len(order)
+            offset = 0
+            # Materialize each partition's share in one batch, then interleave
+            picked = owner[order]
+            batches = [iter(part.records(rows[np.sort(pos[order][picked == i])]))
+                       for i, (part, (_, rows)) in enumerate(zip(parts, group))]
+            for i in picked.tolist():
+                yield next(batches[i])
+
+# --- Update Store ---
+
+class UpdateStore:
+    def __init__(self, directory=UPDATE_STORE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._partitions = OrderedDict()  # LRU of open partitions
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "catalog.db"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS partitions (
+                hour INTEGER NOT NULL,
+                collector TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                PRIMARY KEY (hour, collector)
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS partition_origins (
+                origin INTEGER NOT NULL,
+                hour INTEGER NOT NULL,
+                collector TEXT NOT NULL,
+                PRIMARY KEY (origin, hour, collector)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_partition_origins ON partition_origins (hour, collector)")
+        self._conn.commit()
+
+    def _path(self, hour, collector):
+        name = datetime.fromtimestamp(hour * PARTITION_SECONDS, timezone.utc).strftime("%Y%m%d%H")
+        return os.path.join(self.directory, name, collector + ".cols")
+
+    def partition(self, hour, collector):
+        key = (hour, collector)
+        with self._lock:
+            part = self._partitions.get(key)
+            if part is not None:
+                self._partitions.move_to_end(key)
+                return part
+        part = Partition(self._path(hour, collector), hour, collector)
+        with self._lock:
+            self._partitions[key] = part
+            while len(self._partitions) > MAX_OPEN_PARTITIONS:
+                self._partitions.popitem(last=False)
+        return part
+
+    def write(self, records):
+        # Adds mrt_ingest records, merging with any partitions they land in
+        groups = {}
+        for r in records:
+            groups.setdefault((int(r[0] // PARTITION_SECONDS), r[2]), []).append(r)
+        for (hour, collector), group in sorted(groups.items()):
+            self._write_partition(hour, collector, group)
+        return sum(len(group) for group in groups.values())
+
+    def _write_partition(self, hour, collector, records):
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM partitions WHERE hour = ? AND collector = ?", (hour, collector)
+            ).fetchone()
+        if exists:
+            old = self.partition(hour, collector)
+            records = old.records(np.arange(len(old))) + records
+        cols = _build_partition(records)
+
+        path = self._path(hour, collector)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_columns(path, cols)
+        with self._lock:
+            self._partitions.pop((hour, collector), None)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO partitions (hour, collector, rows) VALUES (?, ?, ?)",
+                (hour, collector, len(records))
+            )
+            self._conn.execute("DELETE FROM partition_origins WHERE hour = ? AND collector = ?", (hour, collector))
+            self._conn.executemany(
+                "INSERT INTO partition_origins (origin, hour, collector) VALUES (?, ?, ?)",
+                [(int(origin), hour, collector) for origin in cols["origin_keys"] if origin]
+            )
+            self._conn.commit()
+
+    def partitions(self, start=None, end=None, origin=None, collectors=None):
+        # Catalog lookup: (hour, collector) pairs that can hold matching rows
+        first = int(start // PARTITION_SECONDS) if start is not None else 0
+        last = int((end - 1e-6) // PARTITION_SECONDS) if end is not None else 2**62
+        with self._lock:
+            if origin is not None:
+                rows = self._conn.execute(
+                    "SELECT hour, collector FROM partition_origins WHERE origin = ? AND hour BETWEEN ? AND ? "
+                    "ORDER BY hour, collector", (origin, first, last)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT hour, collector FROM partitions WHERE hour BETWEEN ? AND ? ORDER BY hour, collector",
+                    (first, last)
+                ).fetchall()
+        if collectors:
+            rows = [(hour, collector) for hour, collector in rows if collector in collectors]
+        return rows
+
+    def scan(self, start=None, end=None, origin=None, prefix=None, prefix_match="more_specific", collectors=None):
+        if prefix is not None:
+            parse_prefix(prefix)  # ValueError on bad input, before any partition is opened
+        segments = []
+        for hour, collector in self.partitions(start, end, origin, collectors):
+            part = self.partition(hour, collector)
+            segments.append((hour, collector, part.select(start, end, origin, prefix, prefix_match)))
+        return ScanResult(self, segments)
+
+    def scan_resource(self, resource, start=None, end=None, collectors=None):
+        # Historic-job semantics: an ASN selects its originations, a prefix itself and its more-specifics
+        resource = resource.strip().upper()
+        if resource.removeprefix("AS").isdigit():
+            return self.scan(start, end, origin=int(resource.removeprefix("AS")), collectors=collectors)
+        return self.scan(start, end, prefix=resource, collectors=collectors)
+
+    def stats(self):
+        with self._lock:
+            partitions, rows, first, last = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(rows), 0), MIN(hour), MAX(hour) FROM partitions"
+            ).fetchone()
+            collectors = [c for (c,) in self._conn.execute("SELECT DISTINCT collector FROM partitions ORDER BY collector")]
+
+        def hour_time(hour):
+            return None if hour is None else datetime.fromtimestamp(hour * PARTITION_SECONDS, timezone.utc).strftime("%Y-%m-%dT%H:00:00Z")
+
+        return {"partitions": partitions, "rows": rows, "collectors": collectors,
+                "first_hour": hour_time(first), "last_hour": hour_time(last)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# --- Loading From MRT Archives ---
+
+async def ingest_archive(store, archive_dir, start=None, end=None, collectors=None):
+    # One hour of files at a time keeps memory bounded on long ranges
+    from mrt_ingest import discover_files, ingest_files
+
+    files = discover_files(archive_dir, start, end, collectors=collectors)
+    by_hour = {}
+    for f in files:
+        by_hour.setdefault(int(f.timestamp // PARTITION_SECONDS), []).append(f)
+    total = 0
+    for hour in sorted(by_hour):
+        _, records = await ingest_files(by_hour[hour], start=start, end=end)
+        total += store.write(records)
+        print(f"INFO:update_store:{len(by_hour[hour])} files → {len(records)} updates "
+              f"({datetime.fromtimestamp(hour * PARTITION_SECONDS, timezone.utc):%Y-%m-%d %H}:00)")
+    return total
+
+# --- Command Line ---
+
+def parse_epoch(value):
+    if value is None:
+        return None
+    return datetime.fromisoformat(value.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar BGP update store")
+    parser.add_argument("--dir", default=UPDATE_STORE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ing = sub.add_parser("ingest", help="load updates from a local MRT archive")
+    ing.add_argument("--archive", required=True)
+    ing.add_argument("--start")
+    ing.add_argument("--end")
+    ing.add_argument("--collector", nargs="*")
+
+    q = sub.add_parser("query")
+    q.add_argument("resource", help="ASN or prefix")
+    q.add_argument("--start")
+    q.add_argument("--end")
+    q.add_argument("--limit", type=int, default=10)
+
+    sub.add_parser("stats")
+
+    args = parser.parse_args()
+    store = UpdateStore(args.dir)
+    if args.command == "ingest":
+        from mrt_ingest import shutdown_pool
+        t0 = time.perf_counter()
+        count = asyncio.run(ingest_archive(store, args.archive, parse_epoch(args.start), parse_epoch(args.end), args.collector))
+        shutdown_pool()
+        print(f"Stored {count} updates in {time.perf_counter() - t0:.1f}s")
+    elif args.command == "query":
+        t0 = time.perf_counter()
+        result = store.scan_resource(args.resource, parse_epoch(args.start), parse_epoch(args.end))
+        print(f"{len(result)} updates in {len(result.segments)} partitions ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+        for record in result.records(limit=args.limit):
+            print(record)
+    else:
+        print(store.stats())
+    store.close()
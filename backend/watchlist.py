@@ -0,0 +1,341 @@
+import asyncio
+import json
+import os
+import time
+
+from prefix_trie import FAMILIES, PrefixTrie, parse_prefix, format_prefix
+from ris_ingest import format_timestamp
+from rib import prefix_key
+from rpki import parse_asn
+
+WATCHLIST_FILE = os.environ.get("WATCHLIST_FILE")  # JSON entries, loaded on startup and rewritten on changes
+DEFAULT_CHANNEL = "default"
+
+PREFIX = "prefix"
+ASN = "asn"
+# Prefix entries: "exact", "more_specific" (the prefix and everything inside
+# it, the default) or "covering" (the prefix and everything that covers it).
+# ASN entries: "origin" (announced by the ASN, the default) or "path" (the
+# ASN anywhere in the AS path).
+PREFIX_MATCHES = ("exact", "more_specific", "covering")
+ASN_MATCHES = ("origin", "path")
+
+# --- Entries and Matches ---
+
+class WatchEntry:
+    __slots__ = ("id", "kind", "resource", "match", "channel", "label", "created")
+
+    def __init__(self, id, kind, resource, match, channel=DEFAULT_CHANNEL, label=None, created=None):
+        self.id = id
+        self.kind = kind
+        self.resource = resource
+        self.match = match
+        self.channel = channel
+        self.label = label
+        self.created = created if created is not None else time.time()
+
+    def key(self):
+        return (self.kind, self.resource, self.match, self.channel)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            self.kind: self.resource,
+            "match": self.match,
+            "channel": self.channel,
+            "label": self.label,
+            "created": self.created
+        }
+
+class WatchMatch:
+    # One update that hit one entry; published on the entry's channel. Has
+    # the attributes FanoutHub routes on, so channel subscribers can filter.
+
+    __slots__ = ("channel", "entry", "match", "watched", "label", "prefix", "origin", "peer_asn", "collector",
+                 "timestamp", "path", "withdrawn")
+
+    def __init__(self, channel, entry, match, watched, label, prefix, origin, peer_asn, collector, timestamp, path,
+                 withdrawn=False):
+        self.channel = channel
+        self.entry = entry
+        self.match = match
+        self.watched = watched
+        self.label = label
+        self.prefix = prefix
+        self.origin = origin
+        self.peer_asn = peer_asn
+        self.collector = collector
+        self.timestamp = timestamp
+        self.path = path
+        self.withdrawn = withdrawn
+
+    @property
+    def kind(self):
+        # ClientQueue coalescing key
+        return self.match
+
+    def to_dict(self):
+        found = {
+            "type": "watch",
+            "channel": self.channel,
+            "entry_id": self.entry,
+            "match": self.match,
+            "watched": self.watched,
+            "label": self.label,
+            "prefix": self.prefix,
+            "origin_as": self.origin,
+            "peer_asn": self.peer_asn,
+            "collector": self.collector,
+            "timestamp": format_timestamp(self.timestamp),
+            "path": self.path
+        }
+        if self.withdrawn:
+            found["withdrawn"] = True
+        return found
+
+def entry_from_dict(item, kind, channel=DEFAULT_CHANNEL, stored=False):
+    # "193.0.0.0/21", 64500, "AS64500" or {"prefix"|"asn", "match", "channel", "label"}.
+    # Ids and creation times are assigned here; only WATCHLIST_FILE entries (stored) keep theirs.
+    if not isinstance(item, dict):
+        item = {kind: item}
+    match = item.get("match") or ("more_specific" if kind == PREFIX else "origin")
+    if kind == PREFIX:
+        if match not in PREFIX_MATCHES:
+            raise ValueError(f"prefix match must be one of {PREFIX_MATCHES}")
+        version, key, length = parse_prefix(str(item[PREFIX]))
+        resource = format_prefix(version, key, length)
+    else:
+        if match not in ASN_MATCHES:
+            raise ValueError(f"asn match must be one of {ASN_MATCHES}")
+        resource = parse_asn(item[ASN])
+    entry_id = created = None
+    if stored:
+        entry_id = item.get("id")
+        if entry_id is not None and type(entry_id) is not int:
+            raise ValueError(f"id must be an integer, not {entry_id!r}")
+        created = float(item["created"]) if item.get("created") is not None else None
+    return WatchEntry(entry_id, kind, resource, match, item.get("channel") or channel, item.get("label"), created)
+
+# --- Watchlist Index ---
+
+class Watchlist:
+    # Matching an update never looks at the entries one by one:
+    #   exact / more_specific prefixes: one dict per (family, prefix length)
+    #     keyed by the network bits, probed once per length in use, as in the
+    #     RPKI VrpTable; the number of probes depends on the lengths present,
+    #     not on the number of entries
+    #   covering prefixes: a PrefixTrie walked below the update's prefix,
+    #     visiting only watched prefixes inside it
+    #   ASNs: a dict per mode; path entries are resolved once per message
+    # Index values are entry ids (an int, or a tuple of them), so adding or
+    # removing an entry touches one dict slot and a 100k list stays GC-cheap.
+
+    def __init__(self):
+        self.entries = {}
+        self._keys = {}
+        self._next_id = 1
+        self._tables = {4: {}, 6: {}}  # version → length → {network: ids}
+        self._levels = {4: (), 6: ()}
+        self._covering = PrefixTrie()  # prefix → ids
+        self._origins = {}
+        self._path_asns = {}
+        self.checked = 0
+        self.matches = 0
+        self.path = None
+        self._saving = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    # --- Index maintenance ---
+
+    @staticmethod
+    def _slot_add(ids, entry_id):
+        if ids is None:
+            return entry_id
+        return (ids if type(ids) is tuple else (ids,)) + (entry_id,)
+
+    @staticmethod
+    def _slot_remove(ids, entry_id):
+        if type(ids) is int:
+            return None if ids == entry_id else ids
+        left = tuple(i for i in ids if i != entry_id)
+        return left[0] if len(left) == 1 else left or None
+
+    def _refresh_levels(self, version):
+        width = FAMILIES[version][1]
+        tables = self._tables[version]
+        self._levels[version] = tuple((length, width - length, tables[length]) for length in sorted(tables))
+
+    def add(self, entry):
+        # → the stored entry; registering the same resource, match and channel twice returns the first
+        existing = self._keys.get(entry.key())
+        if existing is not None:
+            return self.entries[existing]
+        if entry.id is None or entry.id in self.entries:
+            entry.id = self._next_id
+        # Ids survive a reload from WATCHLIST_FILE, so they stay valid for removal
+        self._next_id = max(self._next_id, entry.id + 1)
+        self.entries[entry.id] = entry
+        self._keys[entry.key()] = entry.id
+        if entry.kind == ASN:
+            index = self._origins if entry.match == "origin" else self._path_asns
+            index[entry.resource] = self._slot_add(index.get(entry.resource), entry.id)
+        elif entry.match == "covering":
+            self._covering.insert(entry.resource, self._slot_add(self._covering.get(entry.resource), entry.id))
+        else:
+            version, length, network = prefix_key(entry.resource)
+            table = self._tables[version].get(length)
+            if table is None:
+                table = self._tables[version][length] = {}
+                self._refresh_levels(version)
+            table[network] = self._slot_add(table.get(network), entry.id)
+        return entry
+
+    def remove(self, entry_id):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return None
+        del self._keys[entry.key()]
+        if entry.kind == ASN:
+            index = self._origins if entry.match == "origin" else self._path_asns
+            left = self._slot_remove(index[entry.resource], entry_id)
+            if left is None:
+                del index[entry.resource]
+            else:
+                index[entry.resource] = left
+        elif entry.match == "covering":
+            left = self._slot_remove(self._covering.get(entry.resource), entry_id)
+            if left is None:
+                self._covering.remove(entry.resource)
+            else:
+                self._covering.insert(entry.resource, left)
+        else:
+            version, length, network = prefix_key(entry.resource)
+            table = self._tables[version][length]
+            left = self._slot_remove(table[network], entry_id)
+            if left is not None:
+                table[network] = left
+            else:
+                del table[network]
+                if not table:
+                    del self._tables[version][length]
+                    self._refresh_levels(version)
+        return entry
+
+    # --- Matching ---
+
+    def _ids_for_prefix(self, prefix):
+        # Entry ids whose prefix condition holds for `prefix`
+        try:
+            version, length, network = prefix_key(prefix)
+        except (ValueError, KeyError, AttributeError):
+            return ()
+        found = []
+        key = network << (FAMILIES[version][1] - length)
+        for level, shift, table in self._levels[version]:
+            if level > length:
+                break
+            ids = table.get(key >> shift)
+            if ids is None:
+                continue
+            for entry_id in (ids,) if type(ids) is int else ids:
+                if level == length or self.entries[entry_id].match == "more_specific":
+                    found.append(entry_id)
+        if len(self._covering):
+            for _, ids in self._covering.more_specifics(prefix):
+                found.extend((ids,) if type(ids) is int else ids)
+        return found
+
+    def _ids_for_path(self, path):
+        if not self._path_asns or not path:
+            return ()
+        found = []
+        for hop in set(hop for hop in path if type(hop) is int):
+            ids = self._path_asns.get(hop)
+            if ids is not None:
+                found.extend((ids,) if type(ids) is int else ids)
+        return found
+
+    def match(self, records):
+        # All records of one RIS message (shared path) → list of WatchMatches
+        if not self.entries or not records:
+            return None
+        found = []
+        path_ids = None
+        entries = self.entries
+        for record in records:
+            self.checked += 1
+            ids = list(self._ids_for_prefix(record.prefix))
+            if not record.withdrawn:
+                if self._origins and record.origin in self._origins:
+                    origin_ids = self._origins[record.origin]
+                    ids.extend((origin_ids,) if type(origin_ids) is int else origin_ids)
+                if path_ids is None:
+                    path_ids = self._ids_for_path(record.path)
+                ids.extend(path_ids)
+            for entry_id in ids:
+                entry = entries[entry_id]
+                found.append(WatchMatch(entry.channel, entry_id, entry.match, entry.resource, entry.label,
+                                        record.prefix, record.origin, record.peer_asn, record.collector,
+                                        record.timestamp, record.path, record.withdrawn))
+        self.matches += len(found)
+        return found
+
+    # --- Persistence ---
+
+    def dump(self):
+        return [entry.to_dict() for entry in self.entries.values()]
+
+    def load(self, path):
+        with open(path, encoding="utf-8") as f:
+            items = json.load(f)
+        loaded = 0
+        for item in items:
+            try:
+                self.add(entry_from_dict(item, ASN if ASN in item else PREFIX, stored=True))
+                loaded += 1
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"WARNING:watchlist:Skipping entry {item}: {e}")
+        self.path = path
+        print(f"INFO:watchlist:Loaded {loaded} entries from {path}")
+
+    async def save(self, path=None):
+        # Entries are copied on the loop, written off it. One write at a time:
+        # concurrent saves would share the .tmp file, and each copies the
+        # entries only once the previous write is done.
+        path = path or self.path
+        if not path:
+            return
+        async with self._saving:
+            items = self.dump()
+            try:
+                await asyncio.to_thread(_write_json, path, items)
+            except OSError as e:
+                print(f"WARNING:watchlist:Writing {path} failed: {e}")
+
+    def stats(self):
+        kinds = {}
+        for entry in self.entries.values():
+            kinds[f"{entry.kind}_{entry.match}"] = kinds.get(f"{entry.kind}_{entry.match}", 0) + 1
+        return {
+            "entries": len(self.entries),
+            "by_match": kinds,
+            "channels": sorted({entry.channel for entry in self.entries.values()}),
+            "prefix_lengths": {version: [level for level, _, _ in levels] for version, levels in self._levels.items()},
+            "checked_records": self.checked,
+            "matches": self.matches,
+            "file": self.path
+        }
+
+def _write_json(path, items):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(items, f)
+    os.replace(tmp, path)
+
+watchlist = Watchlist()
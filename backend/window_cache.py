@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from job_store import DATA_DIR
+
+WINDOW_HOURS = int(os.environ.get("WINDOW_HOURS", "2"))
+WINDOW_CACHE_PATH = os.environ.get("WINDOW_CACHE_PATH", os.path.join(DATA_DIR, "window_cache.db"))
+OPEN_WINDOW_TTL = int(os.environ.get("OPEN_WINDOW_TTL", "300"))  # seconds
+SETTLE_SECONDS = 900  # RIS data for a window can still arrive this long after it ends
+
+EPOCH = datetime(1970, 1, 1)
+
+# --- Grid Windows ---
+
+def parse_time(ts: str):
+    ts = ts.rstrip("Z")
+    dt = datetime.fromisoformat(ts)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def format_time(dt):
+    return dt.replace(microsecond=0).isoformat() + "Z"
+
+def normalize_resource(resource: str):
+    resource = resource.strip().upper()
+    return "AS" + resource if resource.isdigit() else resource
+
+def snap_windows(starttime: str, endtime: str, window_hours=WINDOW_HOURS):
+    # Grid-aligned windows covering [starttime, endtime); the first and last
+    # may extend past the requested range and get clipped after fetching.
+    start = parse_time(starttime)
+    end = parse_time(endtime)
+    step = timedelta(hours=window_hours)
+    cur = EPOCH + ((start - EPOCH) // step) * step
+    windows = []
+    while cur < end:
+        windows.append((format_time(cur), format_time(cur + step)))
+        cur += step
+    return windows
+
+def clip_updates(data, starttime: str, endtime: str):
+    start = parse_time(starttime)
+    end = parse_time(endtime)
+    updates = (data or {}).get("data", {}).get("updates")
+    if not updates:
+        return data
+    kept = [u for u in updates if u.get("timestamp") and start <= parse_time(u["timestamp"]) < end]
+    if len(kept) == len(updates):
+        return data
+    return {**data, "data": {**data["data"], "updates": kept}}
+
+def window_key(resource, start, end):
+    return hashlib.sha1(f"{normalize_resource(resource)}|{start}|{end}".encode()).hexdigest()
+
+# --- Window Cache ---
+
+class WindowCache:
+    # Closed windows are immutable history and never expire; the newest,
+    # still-filling window is cached for OPEN_WINDOW_TTL seconds only.
+
+    def __init__(self, path=WINDOW_CACHE_PATH, open_ttl=OPEN_WINDOW_TTL):
+        self.open_ttl = open_ttl
+        self.hits = 0
+        self.misses = 0
+        self._inflight = {}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS windows (
+                key TEXT PRIMARY KEY,
+                resource TEXT NOT NULL,
+                start TEXT NOT NULL,
+                end TEXT NOT NULL,
+                data TEXT NOT NULL,
+                expires_at REAL
+            )
+        """)
+        self._conn.commit()
+
+    def is_closed(self, end: str, now=None):
+        now = now or time.time()
+        return (parse_time(end) - EPOCH).total_seconds() + SETTLE_SECONDS <= now
+
+    def get(self, resource, start, end, now=None):
+        now = now or time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, expires_at FROM windows WHERE key = ?", (window_key(resource, start, end),)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return None
+        return json.loads(row[0])
+
+    def put(self, resource, start, end, data, now=None):
+        now = now or time.time()
+        expires_at = None if self.is_closed(end, now) else now + self.open_ttl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO windows (key, resource, start, end, data, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (window_key(resource, start, end), normalize_resource(resource), start, end, json.dumps(data), expires_at)
+            )
+            self._conn.commit()
+
+    def purge_expired(self, now=None):
+        with self._lock:
+            purged = self._conn.execute(
+                "DELETE FROM windows WHERE expires_at IS NOT NULL AND expires_at <= ?", (now or time.time(),)
+            ).rowcount
+            self._conn.commit()
+        return purged
+
+    async def fetch(self, resource, start, end, fetch):
+        # Returns the cached window or fetches it once, even when several
+        # overlapping jobs ask for the same missing window at the same time.
+        # SQLite and JSON work runs in a thread so large windows don't stall the loop.
+        key = window_key(resource, start, end)
+        pending = self._inflight.get(key)
+        if pending is None:
+            data = await asyncio.to_thread(self.get, resource, start, end)
+            if data is not None:
+                self.hits += 1
+                return data
+            pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        pending = asyncio.ensure_future(self._fetch_and_store(resource, start, end, fetch))
+        self._inflight[key] = pending
+        try:
+            return await asyncio.shield(pending)
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _fetch_and_store(self, resource, start, end, fetch):
+        # Stays in flight until stored, so no caller can miss both the cache and the fetch.
+        data = await fetch(normalize_resource(resource), start, end)
+        await asyncio.to_thread(self.put, resource, start, end, data)
+        return data
+
+    def stats(self):
+        total = self.hits + self.misses
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM windows").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+            "inflight": len(self._inflight)
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import functools
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+# Throwaway stores, and the stub is local: measure the plan, not the RIPEstat rate limit
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="bench-bulk-"))
+os.environ.setdefault("JOB_STORE", "memory")
+os.environ.setdefault("RIPESTAT_RATE", "0")
+
+import job_engine
+import main
+import ripestat_gateway
+from ripestat_stub import RipeStatStub
+from window_cache import WindowCache, snap_windows
+
+# A portfolio of ASNs, aggregates and their more-specifics, fetched as N
+# independent historic jobs vs one bulk job. Upstream calls are counted at
+# the RIPEstat stub.
+
+def portfolio(size, seed, aggregates=40, asns=30):
+    rng = random.Random(seed)
+    resources = [f"AS{64500 + i}" for i in range(min(asns, size))]
+    resources += [f"10.{i}.0.0/16" for i in range(aggregates)][:size - len(resources)]
+    seen = set(resources)
+    while len(resources) < size:
+        prefix = f"10.{rng.randrange(aggregates)}.{rng.randrange(256)}.0/24"
+        if prefix not in seen:
+            seen.add(prefix)
+            resources.append(prefix)
+    return resources
+
+async def independent(stub, resources, starttime, endtime):
+    cache = WindowCache(os.path.join(os.environ["DATA_DIR"], f"independent-{len(resources)}.db"))
+    fetch = functools.partial(job_engine.fetch_chunk, url=stub.url)
+    chunks = snap_windows(starttime, endtime)
+
+    async def one(resource):
+        job_id = f"{resource}-{time.perf_counter_ns()}"
+        main.job_store.create_job(job_id, resource, len(chunks))
+        await main.process_job(job_id, resource, starttime, endtime, chunks,
+                               lambda r, s, e: cache.fetch(r, s, e, fetch))
+
+    await asyncio.gather(*(one(r) for r in resources))
+
+async def bulk(stub, resources, starttime, endtime):
+    cache = WindowCache(os.path.join(os.environ["DATA_DIR"], f"bulk-{len(resources)}.db"))
+    fetch = functools.partial(job_engine.fetch_chunk, url=stub.url)
+    chunks = snap_windows(starttime, endtime)
+    covers = job_engine.plan_bulk(resources)
+    children = {resource: f"bulk-{resource}-{time.perf_counter_ns()}" for resource in resources}
+    for resource, job_id in children.items():
+        main.job_store.create_job(job_id, resource, len(chunks))
+    main.job_store.create_bulk("bench", children, {})
+    await main.process_bulk_job("bench", children, covers, starttime, endtime, chunks,
+                                lambda r, s, e: cache.fetch(r, s, e, fetch))
+    failed = [job_id for job_id in children.values() if main.job_store.get_job(job_id)["status"] != "completed"]
+    assert not failed, f"{len(failed)} child jobs did not complete"
+
+async def main_async(args):
+    stub = await RipeStatStub(latency=args.latency).start()
+    start = datetime(2025, 8, 1)
+    starttime, endtime = start.isoformat() + "Z", (start + timedelta(days=args.days)).isoformat() + "Z"
+    print(f"stub latency={args.latency * 1000:.0f}ms range={args.days}d windows={len(snap_windows(starttime, endtime))}")
+    print(f"{'resources':>9} {'mode':>11} {'upstream':>9} {'wall_s':>8}")
+    try:
+        for size in args.sizes:
+            resources = portfolio(size, args.seed)
+            for mode, run in (("independent", independent), ("bulk", bulk)):
+                if mode == "independent" and size > args.max_independent:
+                    continue
+                before = stub.requests
+                t0 = time.perf_counter()
+                await run(stub, resources, starttime, endtime)
+                print(f"{size:>9} {mode:>11} {stub.requests - before:>9} {time.perf_counter() - t0:>8.2f}")
+    finally:
+        await ripestat_gateway.close_client()
+        await stub.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 250, 500])
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-independent", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=17)
+    asyncio.run(main_async(parser.parse_args()))
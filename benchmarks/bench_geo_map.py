@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+# The stub is local: measure lookup fan-out, not the RIPEstat rate limit
+os.environ.setdefault("RIPESTAT_RATE", "0")
+
+import geo_batch
+import ripestat_gateway
+from ripestat_stub import RipeStatStub
+
+# Maps every announced prefix of an ASN against a local RIPEstat stub:
+# the old sequential one-geoloc-per-prefix loop (timed on a sample and
+# extrapolated) vs geo_batch.geo_map.
+
+async def sequential(gateway, prefixes):
+    located = {}
+    for prefix in prefixes:
+        data = await gateway.get("geoloc", {"resource": prefix})
+        located[prefix] = data["data"]["locations"]
+    return located
+
+async def main(args):
+    stub = await RipeStatStub(latency=args.latency, announced=args.prefixes,
+                              asn_geoloc_share=args.asn_share).start()
+    try:
+        baseline = ripestat_gateway.RipeStatGateway(base_url=stub.base_url)
+        announced = await baseline.get("announced-prefixes", {"resource": "AS15169"})
+        sample = [p["prefix"] for p in announced["data"]["prefixes"][:args.sample]]
+        t0 = time.perf_counter()
+        await sequential(baseline, sample)
+        per_prefix = (time.perf_counter() - t0) / len(sample)
+
+        ripestat_gateway.gateway.base_url = stub.base_url
+        before = stub.requests
+        t0 = time.perf_counter()
+        geo = await geo_batch.geo_map("AS15169", args.cell)
+        batched_s = time.perf_counter() - t0
+    finally:
+        await ripestat_gateway.close_client()
+        await stub.stop()
+
+    assert geo["located"] == args.prefixes, geo
+    print(f"prefixes={args.prefixes:,} latency={args.latency * 1000:.0f}ms asn_geoloc_share={args.asn_share} "
+          f"concurrency={geo_batch.GEO_CONCURRENCY}")
+    print(f"sequential per prefix: {per_prefix * args.prefixes:8.2f} s  (extrapolated from {len(sample)})")
+    print(f"geo_map:               {batched_s:8.2f} s  requests={stub.requests - before} "
+          f"clusters={len(geo['clusters'])} locations={geo['locations']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prefixes", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--asn-share", type=float, default=0.8)
+    parser.add_argument("--sample", type=int, default=50)
+    parser.add_argument("--cell", type=float, default=geo_batch.GEO_CELL_DEGREES)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,55 @@
+import argparse
+import asyncio
+import functools
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+# The stub is local: measure job concurrency, not the RIPEstat rate limit
+os.environ.setdefault("RIPESTAT_RATE", "0")
+
+import job_engine
+import ripestat_gateway
+from ripestat_stub import RipeStatStub
+
+# Runs a historic job against a local RIPEstat stub at increasing per-job
+# concurrency and reports wall-clock time for each setting.
+
+async def run_once(stub, days, concurrency):
+    start = datetime(2025, 8, 1)
+    end = start + timedelta(days=days)
+    chunks = job_engine.split_chunks(start.isoformat() + "Z", end.isoformat() + "Z")
+    received = []
+
+    async def on_result(idx, stt, edt, data):
+        received.append(idx)
+
+    t0 = time.perf_counter()
+    fetch = functools.partial(job_engine.fetch_chunk, url=stub.url)
+    await job_engine.run_chunks("AS15169", chunks, on_result, concurrency=concurrency, fetch=fetch)
+    elapsed = time.perf_counter() - t0
+    assert received == list(range(len(chunks))), "chunks delivered out of order"
+    return len(chunks), elapsed
+
+async def main(args):
+    stub = await RipeStatStub(latency=args.latency, error_rate=args.error_rate).start()
+    print(f"stub latency={args.latency * 1000:.0f}ms error_rate={args.error_rate} range={args.days}d")
+    print(f"{'concurrency':>11} {'chunks':>6} {'wall_s':>8} {'chunks/s':>9}")
+    try:
+        for concurrency in args.concurrency:
+            n, elapsed = await run_once(stub, args.days, concurrency)
+            print(f"{concurrency:>11} {n:>6} {elapsed:>8.2f} {n / elapsed:>9.1f}")
+    finally:
+        await ripestat_gateway.close_client()
+        await stub.stop()
+    print(f"requests={stub.requests} tcp_connections={stub.connections}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    asyncio.run(main(parser.parse_args()))
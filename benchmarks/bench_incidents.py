@@ -0,0 +1,83 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from detector import Alert
+from incidents import IncidentCorrelator
+
+# Alert volume during a large event. --hijacks (prefix, origin) pairs are
+# hijacked at once; every one of --peers peers reports each of them with
+# repeats, interleaved with a background of one-off detections, over
+# --duration seconds of stream time. Raw detections are counted against the
+# incident updates that leave the correlator with one flush per --flush-ms
+# (at most --max-batch each, resolutions included), and the cost per
+# detection is reported.
+
+def make_alerts(args, rng):
+    peers = [(f"rrc{i % 27:02d}", str(3000 + i)) for i in range(args.peers)]
+    hijacks = [(f"10.{i >> 8}.{i & 255}.0/24", 666000 + i % 10) for i in range(args.hijacks)]
+    alerts = []
+    ts = 1754344800.0
+    step = args.duration / args.detections
+    for n in range(args.detections):
+        ts += step
+        collector, peer_asn = rng.choice(peers)
+        if rng.random() < args.background:
+            prefix, origin = f"172.{rng.randrange(16, 32)}.{rng.randrange(256)}.0/24", rng.randrange(1, 64000)
+        else:
+            prefix, origin = rng.choice(hijacks)
+        alerts.append(Alert("origin_conflict", prefix, origin, [64500], peer_asn, collector, ts,
+                            [int(peer_asn), 174, origin]))
+    return alerts
+
+def main(args):
+    rng = random.Random(args.seed)
+    alerts = make_alerts(args, rng)
+    correlator = IncidentCorrelator(window=args.window, max_batch=args.max_batch)
+    flush_every = args.flush_ms / 1000
+    next_flush = alerts[0].timestamp + flush_every
+    updates = batches = largest = 0
+    spent = 0.0
+    for alert in alerts:
+        t0 = time.perf_counter()
+        correlator.add(alert)
+        spent += time.perf_counter() - t0
+        if alert.timestamp >= next_flush:
+            next_flush += flush_every
+            t0 = time.perf_counter()
+            correlator.sweep(alert.timestamp)
+            batch = correlator.flush()
+            spent += time.perf_counter() - t0
+            if batch:
+                updates += len(batch)
+                batches += 1
+                largest = max(largest, len(batch))
+    backlog = len(correlator.pending)
+    correlator.sweep(alerts[-1].timestamp + args.window + 1)
+    while correlator.pending:
+        updates += len(correlator.flush())
+    print(f"detections={len(alerts)} over {args.duration:.0f}s of stream time, peers={args.peers} hijacks={args.hijacks} "
+          f"background={args.background:.0%}")
+    print(f"correlator: {spent / len(alerts) * 1e6:.2f} µs/detection  incidents={correlator.opened} "
+          f"evicted={correlator.evicted}")
+    print(f"raw delivery:      {len(alerts):>8} messages  {len(alerts) / args.duration:>8.0f}/s")
+    print(f"incident delivery: {updates:>8} messages  {updates / args.duration:>8.0f}/s  "
+          f"({len(alerts) / max(updates, 1):.0f}x fewer) in {batches} batches, largest {largest}, "
+          f"{backlog} still coalescing at the end")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--detections", type=int, default=500000)
+    parser.add_argument("--peers", type=int, default=600)
+    parser.add_argument("--hijacks", type=int, default=2000, help="prefixes hijacked at once")
+    parser.add_argument("--background", type=float, default=0.02, help="share of one-off detections")
+    parser.add_argument("--duration", type=float, default=120.0, help="seconds of stream time")
+    parser.add_argument("--window", type=int, default=600)
+    parser.add_argument("--flush-ms", type=int, default=1000)
+    parser.add_argument("--max-batch", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
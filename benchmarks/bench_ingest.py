@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import ris_ingest
+from ris_sample import generate_messages, load_messages
+
+# Messages/sec of the RIS Live decode + normalization stage on a recorded
+# sample: the previous inline loop vs ris_ingest.parse_message.
+
+def legacy_ingest(raw):
+    # The listener's former per-message work: stdlib json, nested .get walks
+    # and a strftime per announced prefix
+    data = json.loads(raw)
+    out = []
+    if data.get("type") != "ris_message":
+        return out
+    update_msg = data.get("data", {})
+    if update_msg.get("type") != "UPDATE":
+        return out
+    path = update_msg.get("path") or []
+    origin_as = path[-1] if path else None
+    if isinstance(origin_as, list):
+        origin_as = None
+    for ann in update_msg.get("announcements", []):
+        for prefix in ann.get("prefixes", []):
+            out.append({
+                "prefix": prefix,
+                "origin_as": origin_as,
+                "peer_asn": update_msg.get("peer_asn"),
+                "collector": update_msg.get("host"),
+                "timestamp": datetime.utcfromtimestamp(update_msg["timestamp"]).strftime("%Y-%m-%dT%H:%M:%SZ")
+            })
+    return out
+
+def timed(fn, messages, repeat):
+    best = None
+    produced = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        produced = 0
+        for raw in messages:
+            produced += len(fn(raw))
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, produced
+
+def main(args):
+    messages = load_messages(args.recording, args.limit) if args.recording else generate_messages(args.messages)
+    print(f"messages={len(messages)} source={args.recording or 'synthetic'} json={ris_ingest.loads.__module__}")
+
+    def ingest_announcements(raw):
+        return [r for r in ris_ingest.parse_message(raw) if not r.withdrawn]
+
+    def ingest_and_serialize(raw):
+        return [r.to_dict() for r in ris_ingest.parse_message(raw) if not r.withdrawn]
+
+    for name, fn in (("before (inline loop)", legacy_ingest),
+                     ("after (ris_ingest)", ingest_announcements),
+                     ("after + to_dict edge", ingest_and_serialize)):
+        elapsed, produced = timed(fn, messages, args.repeat)
+        print(f"{name:<22} {len(messages) / elapsed:>10,.0f} msg/s {produced / elapsed:>11,.0f} ann/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recording", help="NDJSON file of raw RIS Live messages (.gz ok)")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
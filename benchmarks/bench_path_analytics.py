@@ -0,0 +1,89 @@
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from path_analytics import PathTable, summarize
+
+# Path aggregates over RIPEstat-shaped updates: a per-record Python pass
+# (what the frontends did row by row) vs PathTable + summarize().
+
+def generate_updates(count, seed):
+    rng = random.Random(seed)
+    origins = [64512 + rng.randrange(60000) for _ in range(5000)]
+    updates = []
+    for n in range(count):
+        if rng.random() < 0.1:
+            updates.append({"type": "W", "timestamp": "2025-08-04T22:00:00",
+                            "attrs": {"target_prefix": f"10.{n % 250}.0.0/16", "source_id": f"rrc00-{n % 50}"}})
+            continue
+        origin = rng.choice(origins)
+        path = [3000 + rng.randrange(200), rng.choice((1299, 174, 3356, 2914))]
+        path += [rng.choice((6939, 6461, 3257))] * rng.choice((1, 1, 1, 2, 3))
+        path += [origin] * rng.choice((1, 1, 1, 1, 2))
+        updates.append({
+            "type": "A",
+            "timestamp": f"2025-08-04T{22 + n // 1800000:02d}:{(n // 30000) % 60:02d}:{(n // 500) % 60:02d}",
+            "attrs": {"target_prefix": f"10.{(origin >> 8) % 250}.{origin & 255}.0/24",
+                      "source_id": f"rrc00-{n % 50}", "path": path}
+        })
+    return updates
+
+def python_summary(updates):
+    lengths, origins, first_hops, edges, prepended = [], Counter(), Counter(), Counter(), 0
+    last_origin, changes = {}, Counter()
+    for update in updates:
+        if update["type"] != "A":
+            continue
+        path = update["attrs"]["path"]
+        lengths.append(len(path))
+        origins[path[-1]] += 1
+        first_hops[path[0]] += 1
+        if any(a == b for a, b in zip(path, path[1:])):
+            prepended += 1
+        for a, b in zip(path, path[1:]):
+            if a != b:
+                edges[(a, b)] += 1
+        key = (update["attrs"]["target_prefix"], update["attrs"]["source_id"])
+        if key in last_origin and last_origin[key] != path[-1]:
+            changes[key[0]] += 1
+        last_origin[key] = path[-1]
+    return {
+        "mean_length": sum(lengths) / len(lengths),
+        "origins": origins.most_common(20),
+        "first_hops": first_hops.most_common(20),
+        "edges": edges.most_common(20),
+        "prepended": prepended,
+        "changes": sum(changes.values())
+    }
+
+def main(args):
+    updates = generate_updates(args.updates, args.seed)
+
+    t0 = time.perf_counter()
+    expected = python_summary(updates)
+    python_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    table = PathTable.from_updates(updates)
+    build_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    summary = summarize(table)
+    summarize_s = time.perf_counter() - t0
+
+    assert summary["prepending"]["paths"] == expected["prepended"]
+    assert summary["origin_changes"]["total"] == expected["changes"]
+    print(f"updates={len(updates):,} announcements={len(table):,} hops={len(table.asns):,}")
+    print(f"per-record python:  {python_s * 1000:8.0f} ms")
+    print(f"PathTable build:    {build_s * 1000:8.0f} ms")
+    print(f"summarize (numpy):  {summarize_s * 1000:8.0f} ms  ({python_s / summarize_s:.1f}x the aggregation pass)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=500000)
+    parser.add_argument("--seed", type=int, default=11)
+    main(parser.parse_args())
@@ -0,0 +1,82 @@
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from prefix_trie import PrefixTrie
+
+# Builds a routing-table-shaped trie and reports insert/lookup rates and
+# memory per million prefixes.
+
+def table(count, v6_share, seed):
+    rng = random.Random(seed)
+    prefixes = set()
+    while len(prefixes) < count:
+        if rng.random() < v6_share:
+            length = rng.choice((32, 36, 40, 44, 48, 48, 48))
+            addr = (0x2000 << 112) | (rng.getrandbits(length - 3) << (128 - length))
+            groups = [(addr >> (112 - 16 * i)) & 0xffff for i in range(8)]
+            prefixes.add(":".join(f"{g:x}" for g in groups) + f"/{length}")
+        else:
+            length = rng.choice((16, 19, 20, 22, 23, 24, 24, 24, 24))
+            addr = rng.getrandbits(length) << (32 - length)
+            prefixes.add(f"{addr >> 24}.{(addr >> 16) & 255}.{(addr >> 8) & 255}.{addr & 255}/{length}")
+    return list(prefixes)
+
+def main(args):
+    prefixes = table(args.prefixes, args.v6_share, args.seed)
+    n = len(prefixes)
+
+    trie = PrefixTrie()
+    t0 = time.perf_counter()
+    for i, prefix in enumerate(prefixes):
+        trie.insert(prefix, 64512 + i % 1000)
+    insert_s = time.perf_counter() - t0
+
+    # Separate build for memory: tracemalloc would distort the timings above
+    tracemalloc.start()
+    sized = PrefixTrie()
+    for i, prefix in enumerate(prefixes):
+        sized.insert(prefix, 64512 + i % 1000)
+    trie_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sized
+
+    sample = random.Random(args.seed + 1).sample(prefixes, min(n, 100000))
+    t0 = time.perf_counter()
+    for prefix in sample:
+        trie.covering(prefix)
+    covering_s = time.perf_counter() - t0
+
+    aggregates = [p.rsplit("/", 1)[0] + "/16" if ":" not in p else p.rsplit("/", 1)[0] + "/32" for p in sample[:10000]]
+    t0 = time.perf_counter()
+    found = 0
+    for prefix in aggregates:
+        try:
+            found += len(trie.more_specifics(prefix))
+        except ValueError:
+            pass
+    more_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for prefix in sample:
+        trie.remove(prefix)
+    remove_s = time.perf_counter() - t0
+
+    print(f"prefixes={n} (v6 share {args.v6_share:.0%})")
+    print(f"insert:         {n / insert_s:>10,.0f} ops/s")
+    print(f"covering:       {len(sample) / covering_s:>10,.0f} ops/s")
+    print(f"more-specifics: {len(aggregates) / more_s:>10,.0f} ops/s ({found} results)")
+    print(f"withdraw:       {len(sample) / remove_s:>10,.0f} ops/s")
+    print(f"memory: {trie_bytes / 2**20:.1f} MiB total, {trie_bytes / n * 1e6 / 2**20:.0f} MiB per million prefixes")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prefixes", type=int, default=1000000)
+    parser.add_argument("--v6-share", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
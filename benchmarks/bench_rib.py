@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from rib import Rib
+from ris_ingest import UpdateRecord
+
+# RIB built from synthetic RIS messages: a table of --prefixes prefixes seen
+# by --peers peers over a pool of shared AS paths, then a churn stream of
+# re-announcements (new paths) and withdrawals. Reports µs per record, RSS
+# growth next to a naive {(collector, peer, prefix): path list} dict,
+# point/covering query cost, and snapshot save (with the longest event loop
+# stall while it runs) and restore times.
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+def make_prefixes(count, v6_share, rng):
+    prefixes = []
+    for i in range(count):
+        if rng.random() < v6_share:
+            prefixes.append(f"2a{rng.randrange(16):02x}:{rng.getrandbits(16):x}:{rng.getrandbits(16):x}::/48")
+        else:
+            length = rng.choice((24, 24, 24, 23, 22, 20, 16))
+            key = rng.randrange(1 << 24, 224 << 24) & ~((1 << (32 - length)) - 1)
+            prefixes.append(f"{key >> 24}.{(key >> 16) & 255}.{(key >> 8) & 255}.{key & 255}/{length}")
+    return prefixes
+
+def make_messages(peers, prefixes, paths, count, withdraw_share, rng, per_message=4):
+    # → [[UpdateRecord]] one list per message, records share peer/path/time like parse_update
+    messages = []
+    ts = 1754344800.0
+    for _ in range(count):
+        ts += 0.001
+        collector, peer_asn = rng.choice(peers)
+        start = rng.randrange(len(prefixes) - per_message)
+        chosen = prefixes[start:start + rng.randint(1, per_message)]
+        if rng.random() < withdraw_share:
+            messages.append([UpdateRecord(p, None, peer_asn, collector, ts, [], True) for p in chosen])
+        else:
+            path = [int(peer_asn)] + rng.choice(paths)
+            messages.append([UpdateRecord(p, path[-1], peer_asn, collector, ts, path) for p in chosen])
+    return messages
+
+async def timed_save(rib, path):
+    # Largest gap between 1 ms ticks while the snapshot runs
+    worst = 0.0
+    done = False
+
+    async def tick():
+        nonlocal worst
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            worst = max(worst, now - last)
+            last = now
+
+    ticker = asyncio.create_task(tick())
+    t0 = time.perf_counter()
+    await rib.save(path)
+    elapsed = time.perf_counter() - t0
+    done = True
+    await ticker
+    return elapsed, worst
+
+def main(args):
+    rng = random.Random(args.seed)
+    prefixes = make_prefixes(args.prefixes, args.v6_share, rng)
+    peers = [(f"rrc{i % 27:02d}", str(3000 + i)) for i in range(args.peers)]
+    paths = [[rng.randrange(1, 64000) for _ in range(rng.randint(1, 5))] + [rng.randrange(64512, 65500)]
+             for _ in range(args.paths)]
+
+    # Table load: every peer announces a share of all prefixes
+    load = []
+    for collector, peer_asn in peers:
+        seen = prefixes if args.coverage >= 1 else rng.sample(prefixes, int(len(prefixes) * args.coverage))
+        for i in range(0, len(seen), 4):
+            path = [int(peer_asn)] + rng.choice(paths)
+            load.append([UpdateRecord(p, path[-1], peer_asn, collector, 1754344800.0, path) for p in seen[i:i + 4]])
+    churn = make_messages(peers, prefixes, paths, args.churn, args.withdraw_share, rng)
+    records = sum(len(m) for m in load)
+    print(f"prefixes={len(prefixes)} peers={len(peers)} path_pool={len(paths)} load_records={records} "
+          f"churn_messages={len(churn)}")
+
+    gc.collect()
+    base = rss_mb()
+    rib = Rib()
+    t0 = time.perf_counter()
+    for message in load:
+        rib.apply(message)
+    load_s = time.perf_counter() - t0
+    rib_mb = rss_mb() - base
+    print(f"load:     {load_s / records * 1e6:6.2f} µs/record  {records / load_s:>12,.0f} records/s  "
+          f"routes={rib.routes} paths={len(rib._path_ids)} rss +{rib_mb:.0f} MB")
+
+    churn_records = sum(len(m) for m in churn)
+    t0 = time.perf_counter()
+    for message in churn:
+        rib.apply(message)
+    churn_s = time.perf_counter() - t0
+    print(f"churn:    {churn_s / churn_records * 1e6:6.2f} µs/record  {churn_records / churn_s:>12,.0f} records/s  "
+          f"routes={rib.routes} (withdrawals {args.withdraw_share:.0%})")
+
+    if not args.skip_naive:
+        gc.collect()
+        base = rss_mb()
+        naive = {}
+        t0 = time.perf_counter()
+        for message in load:
+            for r in message:
+                naive[(r.collector, r.peer_asn, r.prefix)] = list(r.path)
+        naive_s = time.perf_counter() - t0
+        print(f"naive:    {naive_s / records * 1e6:6.2f} µs/record  rss +{rss_mb() - base:.0f} MB "
+              f"(dict of (collector, peer, prefix) → path list)")
+        del naive
+        gc.collect()
+
+    sample = rng.sample(prefixes, min(20000, len(prefixes)))
+    t0 = time.perf_counter()
+    for p in sample:
+        rib.lookup(p, peer_asn=peers[0][1])
+    point_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for p in sample:
+        rib.covering(p.split("/")[0], peer_asn=peers[0][1])
+    covering_s = time.perf_counter() - t0
+    print(f"query:    point {point_s / len(sample) * 1e6:.1f} µs, covering {covering_s / len(sample) * 1e6:.1f} µs "
+          f"(one peer, {len(sample)} prefixes)")
+
+    path = os.path.join(tempfile.mkdtemp(), "rib.snapshot")
+    save_s, worst = asyncio.run(timed_save(rib, path))
+    print(f"save:     {save_s:.2f}s  {os.path.getsize(path) / 1e6:.0f} MB  longest loop stall {worst * 1000:.0f} ms")
+    restored = Rib()
+    t0 = time.perf_counter()
+    restored.restore(path, max_age=0)
+    print(f"restore:  {time.perf_counter() - t0:.2f}s  routes={restored.routes} "
+          f"{'matches' if restored.lookup(sample[0]) == rib.lookup(sample[0]) else 'DIFFERS'}")
+    os.remove(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prefixes", type=int, default=200000)
+    parser.add_argument("--peers", type=int, default=20)
+    parser.add_argument("--coverage", type=float, default=0.5, help="share of prefixes each peer announces")
+    parser.add_argument("--paths", type=int, default=50000)
+    parser.add_argument("--churn", type=int, default=200000)
+    parser.add_argument("--withdraw-share", type=float, default=0.1)
+    parser.add_argument("--v6-share", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip-naive", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from prefix_trie import PrefixTrie
+from rpki import RpkiValidator, VrpTable, STATUSES, VALID
+
+# Route origin validation against a synthetic full-size VRP snapshot
+# (~500k ROAs, IPv4 and IPv6 in roughly today's proportions). Reports
+# snapshot load time, µs per update cold (every route new) and warm (the
+# firehose repeats routes), a PrefixTrie covering-walk baseline, and
+# validation throughput while a new snapshot is hot-loaded next to it.
+
+V4_LENGTHS = [(24, 60), (23, 8), (22, 10), (21, 5), (20, 6), (19, 4), (18, 2), (17, 1), (16, 3), (12, 1)]
+V6_LENGTHS = [(48, 55), (44, 5), (40, 6), (36, 4), (32, 25), (29, 5)]
+
+def pick(rng, weights):
+    return rng.choices([l for l, _ in weights], [w for _, w in weights])[0]
+
+def make_vrps(count, v6_share, seed):
+    rng = random.Random(seed)
+    vrps = []
+    for n in range(count):
+        asn = rng.randrange(1, 400000)
+        if rng.random() < v6_share:
+            length = pick(rng, V6_LENGTHS)
+            key = (0x2000 << 112) | (rng.getrandbits(length - 3) << (128 - length))
+            addr = ":".join(f"{(key >> s) & 0xffff:x}" for s in range(112, -1, -16))
+            vrps.append({"asn": f"AS{asn}", "prefix": f"{addr}/{length}", "maxLength": length + rng.choice((0, 0, 0, 8)),
+                         "ta": "synthetic"})
+        else:
+            length = pick(rng, V4_LENGTHS)
+            key = rng.randrange(1 << 24, 224 << 24) & ~((1 << (32 - length)) - 1)
+            addr = ".".join(str((key >> s) & 255) for s in (24, 16, 8, 0))
+            vrps.append({"asn": f"AS{asn}", "prefix": f"{addr}/{length}", "maxLength": min(32, length + rng.choice((0, 0, 0, 2))),
+                         "ta": "synthetic"})
+    return vrps
+
+def make_routes(vrps, count, seed):
+    # A third exact/more-specific announcements by the ROA's ASN, a third
+    # covered by a ROA with another origin, a third outside every ROA
+    rng = random.Random(seed)
+    routes = []
+    for n in range(count):
+        roa = rng.choice(vrps)
+        prefix = roa["prefix"]
+        asn = int(roa["asn"][2:])
+        kind = n % 3
+        if kind == 0:
+            routes.append((prefix, asn))
+        elif kind == 1:
+            routes.append((prefix, asn + 1))
+        elif ":" in prefix:
+            routes.append((f"3fff:{rng.getrandbits(16):x}::/48", asn))
+        else:
+            routes.append((f"{rng.randrange(224, 240)}.{rng.randrange(256)}.{rng.randrange(256)}.0/24", asn))
+    return routes
+
+def trie_validate(trie, prefix, origin):
+    covering = trie.covering(prefix)
+    if not covering:
+        return "not-found"
+    length = int(prefix.rsplit("/", 1)[1])
+    for _, entries in covering:
+        for max_length, asn in entries:
+            if asn == origin and length <= max_length:
+                return VALID
+    return "invalid"
+
+def timed(validate, routes):
+    counts = dict.fromkeys(STATUSES, 0)
+    t0 = time.perf_counter()
+    for prefix, origin in routes:
+        counts[validate(prefix, origin)] += 1
+    return time.perf_counter() - t0, counts
+
+def main(args):
+    vrps = make_vrps(args.vrps, args.v6_share, args.seed)
+    routes = make_routes(vrps, args.updates, args.seed + 1)
+    path = os.path.join(tempfile.mkdtemp(), "vrps.json")
+    with open(path, "w") as f:
+        json.dump({"roas": vrps}, f)
+    print(f"vrps={len(vrps)} ({os.path.getsize(path) / 1e6:.0f} MB JSON) updates={len(routes)}")
+
+    validator = RpkiValidator(path)
+    validator.load()
+    print(f"load (parse + index): {validator.load_seconds:.2f}s")
+
+    table = VrpTable([(v["prefix"], v["maxLength"], int(v["asn"][2:])) for v in vrps])
+    cold_s, counts = timed(table._lookup, routes)
+    print(f"cold:  {cold_s / len(routes) * 1e6:6.2f} µs/update  {len(routes) / cold_s:>12,.0f} updates/s  {counts}")
+    for _ in range(2):
+        warm_s, _ = timed(table.validate, routes)
+    print(f"warm:  {warm_s / len(routes) * 1e6:6.2f} µs/update  {len(routes) / warm_s:>12,.0f} updates/s  (cached per route)")
+
+    if not args.skip_trie:
+        trie = PrefixTrie()
+        for v in vrps:
+            found = trie.get(v["prefix"])
+            entry = (v["maxLength"], int(v["asn"][2:]))
+            trie.insert(v["prefix"], found + [entry] if found else [entry])
+        sample = routes[:min(len(routes), 200000)]
+        trie_s, trie_counts = timed(lambda p, o: trie_validate(trie, p, o), sample)
+        print(f"trie:  {trie_s / len(sample) * 1e6:6.2f} µs/update  {len(sample) / trie_s:>12,.0f} updates/s  "
+              f"(PrefixTrie covering walk baseline, {len(sample)} updates)")
+
+    # Hot reload: validate continuously while the same snapshot loads in a thread
+    reload = threading.Thread(target=validator.load)
+    done = 0
+    worst = 0.0
+    t0 = time.perf_counter()
+    reload.start()
+    while reload.is_alive():
+        for prefix, origin in routes[done % len(routes):done % len(routes) + 1000]:
+            t1 = time.perf_counter()
+            validator.table._lookup(prefix, origin)
+            worst = max(worst, time.perf_counter() - t1)
+        done += 1000
+    reload_s = time.perf_counter() - t0
+    print(f"during reload: {done / reload_s:>12,.0f} updates/s over {reload_s:.2f}s, "
+          f"slowest single validation {worst * 1000:.1f} ms (GIL hand-off)")
+    os.remove(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vrps", type=int, default=500000)
+    parser.add_argument("--v6-share", type=float, default=0.25)
+    parser.add_argument("--updates", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip-trie", action="store_true")
+    main(parser.parse_args())
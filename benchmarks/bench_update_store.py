@@ -0,0 +1,77 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from update_store import UpdateStore, PARTITION_SECONDS
+
+# Fills a store with synthetic hourly update volume, then times the queries
+# the historic API runs against it: one origin over the whole range, one
+# covering prefix, and materializing the first page of results.
+
+START = 1754352000.0  # 2025-08-05T00:00:00Z
+TARGET_ASN = 15169
+
+def hour_records(hour, collector, count, rng, origins):
+    base = START + hour * PARTITION_SECONDS
+    records = []
+    for _ in range(count):
+        block = rng.randrange(len(origins))
+        origin = TARGET_ASN if block % 500 == 0 else origins[block]
+        prefix = f"{10 + (block >> 16) % 200}.{(block >> 8) & 0xff}.{block & 0xff}.0/24"
+        kind = "W" if rng.random() < 0.1 else "A"
+        path = () if kind == "W" else (3000 + rng.randrange(200), 1299, 174, origin)[rng.randrange(2):]
+        records.append((base + rng.random() * PARTITION_SECONDS, kind, collector, 3000 + rng.randrange(200),
+                        prefix, None if kind == "W" else origin, path, ()))
+    return records
+
+def main(args):
+    rng = random.Random(args.seed)
+    origins = [64512 + rng.randrange(60000) for _ in range(args.prefixes)]
+    collectors = [f"rrc{i:02d}" for i in range(args.collectors)]
+    directory = args.dir or tempfile.mkdtemp(prefix="update-store-")
+    store = UpdateStore(directory)
+
+    hours = args.days * 24
+    written = 0
+    write_s = 0.0
+    for hour in range(hours):
+        batch = []
+        for collector in collectors:
+            batch.extend(hour_records(hour, collector, args.per_hour, rng, origins))
+        t0 = time.perf_counter()
+        written += store.write(batch)
+        write_s += time.perf_counter() - t0
+    print(f"store: {written:,} updates, {hours * len(collectors)} partitions in {directory}")
+    print(f"write: {written / write_s:,.0f} updates/s")
+
+    end = START + hours * PARTITION_SECONDS
+    for label, kwargs in (
+        (f"AS{TARGET_ASN}, {args.days} days", {"origin": TARGET_ASN}),
+        (f"10.0.0.0/16 more-specifics, {args.days} days", {"prefix": "10.0.0.0/16"}),
+        (f"AS{TARGET_ASN} within 10.0.0.0/8, {args.days} days", {"origin": TARGET_ASN, "prefix": "10.0.0.0/8"}),
+    ):
+        fresh = UpdateStore(directory)  # cold partition cache: includes opening every memory map
+        t0 = time.perf_counter()
+        result = fresh.scan(START + 1800, end, **kwargs)
+        scan_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        page = list(result.records(limit=1000))
+        page_s = time.perf_counter() - t0
+        print(f"{label}: {len(result):,} updates, scan {scan_s * 1000:.0f} ms, first {len(page)} records {page_s * 1000:.0f} ms")
+        fresh.close()
+    store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--collectors", type=int, default=2)
+    parser.add_argument("--per-hour", type=int, default=2000, help="updates per collector per hour")
+    parser.add_argument("--prefixes", type=int, default=100000)
+    parser.add_argument("--dir", help="store directory (default: a new temp dir)")
+    parser.add_argument("--seed", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,136 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from prefix_trie import parse_prefix
+from ris_ingest import UpdateRecord
+from watchlist import Watchlist, WatchEntry, PREFIX, ASN
+
+# Watchlist matching cost against watchlist size. The same update stream is
+# matched against watchlists of growing size (prefix entries of every match
+# mode plus origin and path ASNs); with the per-length hash tables, the
+# trie and the ASN dicts the cost per update should stay flat. A linear
+# scan over the entries is the baseline. Hot add/remove is timed while
+# matching continues.
+
+def random_prefix(rng, v6_share):
+    if rng.random() < v6_share:
+        length = rng.choice((32, 36, 40, 44, 48))
+        key = (0x2a00 << 112) | (rng.getrandbits(length - 16) << (128 - length))
+        return f"{':'.join(f'{(key >> s) & 0xffff:x}' for s in range(112, -1, -16))}/{length}"
+    length = rng.choice((16, 19, 20, 21, 22, 23, 24, 24, 24))
+    key = rng.randrange(1 << 24, 224 << 24) & ~((1 << (32 - length)) - 1)
+    return f"{key >> 24}.{(key >> 16) & 255}.{(key >> 8) & 255}.{key & 255}/{length}"
+
+def make_entries(count, rng, v6_share):
+    entries = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.8:
+            match = rng.choice(("more_specific", "more_specific", "exact", "covering"))
+            entries.append(WatchEntry(None, PREFIX, random_prefix(rng, v6_share), match))
+        else:
+            entries.append(WatchEntry(None, ASN, rng.randrange(1, 400000), "origin" if roll < 0.95 else "path"))
+    return entries
+
+def make_messages(count, rng, v6_share, watched_prefixes):
+    # A small share of updates fall inside watched prefixes, the rest is random
+    messages = []
+    for _ in range(count):
+        path = [rng.randrange(1, 400000) for _ in range(rng.randint(2, 6))]
+        prefixes = []
+        for _ in range(rng.choice((1, 1, 2, 4))):
+            if watched_prefixes and rng.random() < 0.01:
+                prefixes.append(rng.choice(watched_prefixes))
+            else:
+                prefixes.append(random_prefix(rng, v6_share))
+        messages.append([UpdateRecord(p, path[-1], "3333", "rrc00", 1754344800.0, path) for p in prefixes])
+    return messages
+
+def linear_match(entries, record):
+    # Baseline: every entry checked against every record
+    found = 0
+    version, key, length = parse_prefix(record.prefix)
+    for entry, parsed in entries:
+        if entry.kind == ASN:
+            found += record.origin == entry.resource if entry.match == "origin" else entry.resource in record.path
+            continue
+        e_version, e_key, e_length = parsed
+        if e_version != version:
+            continue
+        width = 32 if version == 4 else 128
+        if e_length <= length and key >> (width - e_length) == e_key >> (width - e_length):
+            found += entry.match != "covering" and (e_length == length or entry.match == "more_specific")
+        if length <= e_length and e_key >> (width - length) == key >> (width - length):
+            found += entry.match == "covering"
+    return found
+
+def timed(watchlist, messages):
+    records = sum(len(m) for m in messages)
+    t0 = time.perf_counter()
+    matches = 0
+    for message in messages:
+        matches += len(watchlist.match(message) or ())
+    elapsed = time.perf_counter() - t0
+    return elapsed / records * 1e6, matches
+
+def main(args):
+    rng = random.Random(args.seed)
+    all_entries = make_entries(max(args.sizes), rng, args.v6_share)
+    watched = [e.resource for e in all_entries if e.kind == PREFIX]
+    messages = make_messages(args.messages, rng, args.v6_share, watched[:min(args.sizes)] if min(args.sizes) else watched)
+    print(f"messages={len(messages)} records={sum(len(m) for m in messages)}")
+
+    for size in args.sizes:
+        watchlist = Watchlist()
+        t0 = time.perf_counter()
+        for entry in all_entries[:size]:
+            watchlist.add(WatchEntry(None, entry.kind, entry.resource, entry.match))
+        build_s = time.perf_counter() - t0
+        for _ in range(2):  # warm the prefix parse cache
+            us, matches = timed(watchlist, messages)
+        print(f"entries={size:>7}  {us:6.2f} µs/record  matches={matches:>6}  build {build_s * 1000:.0f} ms")
+
+    size = min(args.linear, max(args.sizes))
+    parsed = [(e, parse_prefix(e.resource) if e.kind == PREFIX else None) for e in all_entries[:size]]
+    sample = [r for m in messages[:2000] for r in m]
+    t0 = time.perf_counter()
+    for record in sample:
+        linear_match(parsed, record)
+    print(f"linear scan, entries={size}: {(time.perf_counter() - t0) / len(sample) * 1e6:.0f} µs/record")
+
+    # Hot add/remove: replace a tenth of the largest watchlist in place, in slices,
+    # matching a slice of the stream between slices
+    watchlist = Watchlist()
+    for entry in all_entries:
+        watchlist.add(WatchEntry(None, entry.kind, entry.resource, entry.match))
+    churn = make_entries(len(all_entries) // 10, rng, args.v6_share)
+    ids = list(watchlist.entries)
+    rng.shuffle(ids)
+    t0 = time.perf_counter()
+    worst = 0.0
+    step = 1000
+    for i in range(0, len(churn), step):
+        t1 = time.perf_counter()
+        for entry_id in ids[i:i + step]:
+            watchlist.remove(entry_id)
+        for entry in churn[i:i + step]:
+            watchlist.add(entry)
+        worst = max(worst, time.perf_counter() - t1)
+        watchlist.match(messages[i % len(messages)])
+    churn_s = time.perf_counter() - t0
+    print(f"hot swap of {len(churn)} entries: {churn_s * 1e6 / len(churn) / 2:.1f} µs per add/remove, "
+          f"slowest {step}+{step} batch {worst * 1000:.1f} ms, entries={len(watchlist)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 100, 1000, 10000, 100000])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--linear", type=int, default=1000, help="entries in the linear-scan baseline")
+    parser.add_argument("--v6-share", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
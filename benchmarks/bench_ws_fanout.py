@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+import msgpack
+import uvicorn
+import websockets
+
+from ris_live_stub import RisLiveStub, latency_messages
+
+# Throughput/latency of /ws/ris-live per delivery mode, driven by a local
+# RIS Live replay source. Clients follow the test_ws_client.py pattern.
+
+MODES = {
+    "per-update": "",
+    "batch-json": "?batch_ms=50&batch_size=500&encoding=json",
+    "batch-columnar": "?batch_ms=50&batch_size=500&encoding=columnar",
+    "batch-msgpack": "?batch_ms=50&batch_size=500&encoding=msgpack",
+}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def prefixes_in(frame):
+    if isinstance(frame, bytes):
+        frame = msgpack.unpackb(frame)
+    elif frame == "ping":
+        return []
+    else:
+        frame = json.loads(frame)
+    if isinstance(frame, list):
+        return [item["prefix"] for item in frame if "type" not in item]
+    if frame.get("type") == "batch":
+        return frame["columns"]["prefix"]
+    return [frame["prefix"]] if "type" not in frame else []
+
+async def client(uri, expected, stub, result, compression):
+    latencies = []
+    received = 0
+    payload_bytes = 0
+    frames = 0
+    async with websockets.connect(uri, compression=compression, max_size=None) as websocket:
+        result["ready"].set()
+        while received < expected:
+            response = await websocket.recv()
+            now = time.perf_counter()
+            frames += 1
+            payload_bytes += len(response)
+            for prefix in prefixes_in(response):
+                latencies.append(now - stub.sent_at[prefix])
+                received += 1
+    result.update(latencies=latencies, received=received, frames=frames, payload_bytes=payload_bytes,
+                  finished=time.perf_counter())
+
+async def run_mode(name, query, port, stub, args):
+    compression = None if args.no_deflate else "deflate"
+    results = []
+    tasks = []
+    for _ in range(args.clients):
+        result = {"ready": asyncio.Event()}
+        results.append(result)
+        tasks.append(asyncio.create_task(
+            client(f"ws://127.0.0.1:{port}/ws/ris-live{query}", args.messages, stub, result, compression)))
+    for result in results:
+        await result["ready"].wait()
+    await asyncio.sleep(0.2)
+
+    stub.sent_at.clear()
+    start = time.perf_counter()
+    await stub.replay(args.rate)
+    await asyncio.wait_for(asyncio.gather(*tasks), timeout=args.timeout)
+
+    latencies = sorted(l for r in results for l in r["latencies"])
+    elapsed = max(r["finished"] for r in results) - start
+    delivered = sum(r["received"] for r in results)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    frames = sum(r["frames"] for r in results)
+    payload = sum(r["payload_bytes"] for r in results)
+    print(f"{name:>15} {delivered / elapsed:>12,.0f} {p50:>8.1f} {p99:>8.1f} {frames:>8} {payload / delivered:>9.1f}")
+
+async def main(args):
+    stub = await RisLiveStub(latency_messages(args.messages)).start()
+    os.environ["RIS_LIVE_URI"] = stub.uri
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+    import rislive_ws
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(rislive_ws.app, host="127.0.0.1", port=port, log_level="warning",
+                                           ws="websockets", ws_per_message_deflate=not args.no_deflate))
+    serve_task = asyncio.create_task(server.serve())
+    await stub.wait_subscribed()
+
+    print(f"messages={args.messages} clients={args.clients} rate={args.rate or 'max'} "
+          f"deflate={'off' if args.no_deflate else 'on'}")
+    print(f"{'mode':>15} {'updates/s':>12} {'p50_ms':>8} {'p99_ms':>8} {'frames':>8} {'bytes/upd':>9}")
+    try:
+        for name in args.modes:
+            await run_mode(name, MODES[name], port, stub, args)
+    finally:
+        server.should_exit = True
+        await serve_task
+        await stub.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--rate", type=float, help="upstream messages/sec (default: max)")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--no-deflate", action="store_true")
+    parser.add_argument("--timeout", type=float, default=300)
+    asyncio.run(main(parser.parse_args()))
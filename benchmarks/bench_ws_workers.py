@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import websockets
+
+from bench_ws_fanout import free_port, prefixes_in
+from ris_live_stub import RisLiveStub, latency_messages
+
+# One ingest process (RIS_ROLE=ingest) holding the upstream subscription and
+# a pool of `uvicorn --workers N` fan-out workers (RIS_ROLE=worker) fed over
+# the local bus. Reports delivered updates/s and latency per pool size;
+# --kill-worker SIGKILLs one worker halfway through the replay to check that
+# clients on the other workers are unaffected and the replacement resubscribes.
+#
+#   python bench_ws_workers.py --workers 1 2 4 --clients 200 --rate 2000
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+STARTUP_TIMEOUT = 30
+
+def spawn(env, port, workers=None):
+    command = [sys.executable, "-m", "uvicorn", "rislive_ws:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", "--ws", "websockets"]
+    if workers:
+        command += ["--workers", str(workers)]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env})
+
+def worker_pids(master):
+    # Children of the uvicorn supervisor, minus multiprocessing's resource tracker
+    pids = []
+    try:
+        with open(f"/proc/{master.pid}/task/{master.pid}/children") as f:
+            children = f.read().split()
+        for pid in children:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if b"spawn_main" in f.read():
+                    pids.append(int(pid))
+    except OSError:
+        pass
+    return pids
+
+async def wait_subscribers(ingest_port, count):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            try:
+                stats = (await http.get(f"http://127.0.0.1:{ingest_port}/api/bus/stats")).json()
+                if stats["subscribers"] >= count:
+                    return stats
+            except (httpx.TransportError, KeyError, ValueError):
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{count} bus subscriber(s) did not show up")
+
+async def client(uri, expected, stub, result):
+    latencies = []
+    try:
+        async with websockets.connect(uri, compression=None, max_size=None, open_timeout=30) as websocket:
+            result["ready"].set()
+            while len(latencies) < expected:
+                response = await websocket.recv()
+                now = time.perf_counter()
+                for prefix in prefixes_in(response):
+                    latencies.append(now - stub.sent_at[prefix])
+    except websockets.ConnectionClosed:
+        result["closed"] = True
+    result["ready"].set()
+    result.update(latencies=latencies, finished=time.perf_counter())
+
+async def run_pool(workers, stub, ingest_port, args):
+    port = free_port()
+    pool = spawn({"RIS_ROLE": "worker", "RIS_BUS_PATH": args.bus_path}, port, workers)
+    try:
+        await wait_subscribers(ingest_port, workers)
+        results = []
+        tasks = []
+        for _ in range(args.clients):
+            result = {"ready": asyncio.Event(), "closed": False}
+            results.append(result)
+            tasks.append(asyncio.create_task(
+                client(f"ws://127.0.0.1:{port}/ws/ris-live{args.query}", args.messages, stub, result)))
+        for result in results:
+            await result["ready"].wait()
+        await asyncio.sleep(0.5)
+
+        stub.sent_at.clear()
+        start = time.perf_counter()
+        replay = asyncio.create_task(stub.replay(args.rate))
+        killed = None
+        if args.kill_worker:
+            await asyncio.sleep(args.messages / (args.rate or 20000) / 2)
+            killed = worker_pids(pool)[0]
+            os.kill(killed, signal.SIGKILL)
+        await replay
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=args.timeout)
+
+        complete = [r for r in results if not r["closed"]]
+        latencies = sorted(l for r in complete for l in r["latencies"])
+        delivered = sum(len(r["latencies"]) for r in results)
+        elapsed = max(r["finished"] for r in complete) - start
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        line = (f"{workers:>7} {delivered / elapsed:>12,.0f} {p50:>8.1f} {p99:>8.1f} "
+                f"{len(complete):>6}/{args.clients}")
+        if killed is not None:
+            # uvicorn's supervisor replaces the worker, which resubscribes to the bus
+            deadline = time.monotonic() + STARTUP_TIMEOUT
+            while killed in worker_pids(pool) or len(worker_pids(pool)) < workers:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("killed worker was not replaced")
+                await asyncio.sleep(0.1)
+            stats = await wait_subscribers(ingest_port, workers)
+            line += (f"  killed pid {killed} ({args.clients - len(complete)} clients cut off), "
+                     f"bus subscribers back to {stats['subscribers']}")
+        print(line)
+    finally:
+        pool.terminate()
+        try:
+            pool.wait(10)
+        except subprocess.TimeoutExpired:
+            pool.kill()
+
+async def main(args):
+    stub = await RisLiveStub(latency_messages(args.messages)).start()
+    ingest_port = free_port()
+    ingest = spawn({"RIS_ROLE": "ingest", "RIS_BUS_PATH": args.bus_path, "RIS_LIVE_URI": stub.uri}, ingest_port)
+    try:
+        await asyncio.wait_for(stub.wait_subscribed(), STARTUP_TIMEOUT)
+        print(f"messages={args.messages} clients={args.clients} rate={args.rate or 'max'} cpus={os.cpu_count()}")
+        print(f"{'workers':>7} {'updates/s':>12} {'p50_ms':>8} {'p99_ms':>8} {'clients':>13}")
+        for workers in args.workers:
+            await run_pool(workers, stub, ingest_port, args)
+    finally:
+        ingest.terminate()
+        ingest.wait(10)
+        await stub.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rate", type=float, help="upstream messages/sec (default: max)")
+    parser.add_argument("--query", default="?batch_ms=50&batch_size=500&encoding=msgpack")
+    parser.add_argument("--kill-worker", action="store_true")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--bus-path", default=os.path.join(tempfile.gettempdir(), f"ris-bus-{os.getpid()}.sock"))
+    asyncio.run(main(parser.parse_args()))
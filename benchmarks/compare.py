@@ -0,0 +1,75 @@
+import argparse
+import json
+import sys
+
+# Diffs two suite.py result files row by row. Metrics ending in _per_s are
+# better when higher, _ms and _s when lower; anything else is informational.
+#
+#   python compare.py results/base.json results/head.json [--threshold 10] [--fail-on-regression]
+
+def direction(metric):
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith(("_ms", "_s")):
+        return -1
+    return 0
+
+def show(value):
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+def row_key(row):
+    return row["scenario"], tuple(sorted(row["params"].items()))
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report["meta"], {row_key(row): row["metrics"] for row in report["results"]}
+
+def compare(base, head, threshold):
+    # → [(scenario, params, metric, old, new, change %, verdict)]
+    rows = []
+    for key in sorted(set(base) | set(head), key=str):
+        scenario, params = key
+        old, new = base.get(key, {}), head.get(key, {})
+        for metric in sorted(set(old) | set(new)):
+            a, b = old.get(metric), new.get(metric)
+            change = None
+            verdict = ""
+            if isinstance(a, (int, float)) and isinstance(b, (int, float)) and a:
+                change = (b - a) / abs(a) * 100
+                sign = direction(metric)
+                if sign and abs(change) >= threshold:
+                    verdict = "better" if change * sign > 0 else "REGRESSION"
+            elif a is None or b is None:
+                verdict = "added" if a is None else "removed"
+            rows.append((scenario, dict(params), metric, a, b, change, verdict))
+    return rows
+
+def main(args):
+    base_meta, base = load(args.base)
+    head_meta, head = load(args.head)
+    print(f"base {base_meta['commit']} ({base_meta['started_at']})  →  head {head_meta['commit']} ({head_meta['started_at']})")
+    if (base_meta.get("cpu_count"), base_meta.get("platform")) != (head_meta.get("cpu_count"), head_meta.get("platform")):
+        print("warning: results come from different machines")
+
+    rows = compare(base, head, args.threshold)
+    regressions = 0
+    for scenario, params, metric, a, b, change, verdict in rows:
+        if args.only_changes and not verdict:
+            continue
+        label = ",".join(f"{k}={v}" for k, v in params.items())
+        pct = f"{change:+7.1f}%" if change is not None else "        "
+        print(f"{scenario:<13} {label:<40} {metric:<18} {show(a):>12} {show(b):>12} {pct} {verdict}")
+        regressions += verdict == "REGRESSION"
+    print(f"{regressions} regression(s) beyond {args.threshold}%")
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10, help="percent change that counts")
+    parser.add_argument("--only-changes", action="store_true")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import random
+from urllib.parse import urlsplit, parse_qs
+
+# Minimal keep-alive HTTP/1.1 server that mimics the RIPEstat bgp-updates,
+# announced-prefixes and geoloc data calls closely enough for the backend.
+
+class RipeStatStub:
+    def __init__(self, latency=0.05, updates_per_chunk=50, error_rate=0.0, host="127.0.0.1",
+                 announced=1000, asn_geoloc_share=0.8):
+        self.latency = latency
+        self.updates_per_chunk = updates_per_chunk
+        self.announced = announced                  # prefixes announced by every ASN
+        self.asn_geoloc_share = asn_geoloc_share    # share of them an ASN-wide geoloc call places
+        self.error_rate = error_rate
+        self.host = host
+        self.port = None
+        self.requests = 0
+        self.connections = 0
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/data"
+
+    @property
+    def url(self):
+        return f"{self.base_url}/bgp-updates/data.json"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _prefixes(self):
+        return [f"{10 + i // 65536}.{(i // 256) % 256}.{i % 256}.0/24" for i in range(self.announced)]
+
+    def _site(self, i):
+        # 40 cities; a prefix always lands in the same one
+        city = i % 40
+        return {"country": f"C{city % 12}", "city": f"City{city}",
+                "latitude": -40 + city * 2.1, "longitude": -150 + city * 7.3}
+
+    def _geoloc(self, resource):
+        if resource.upper().lstrip("AS").isdigit():
+            placed = self._prefixes()[:int(self.announced * self.asn_geoloc_share)]
+            sites = {}
+            for i, prefix in enumerate(placed):
+                sites.setdefault(i % 40, {**self._site(i), "prefixes": []})["prefixes"].append(prefix)
+            locations = list(sites.values())
+        else:
+            octets = resource.split("/")[0].split(".")
+            i = (int(octets[0]) - 10) * 65536 + int(octets[1]) * 256 + int(octets[2])
+            locations = [{**self._site(i), "prefixes": [resource]}]
+        return {"status": "ok", "data": {"resource": resource, "locations": locations}}
+
+    def _body(self, path, params):
+        resource = params.get("resource", [""])[0]
+        if path.endswith("/announced-prefixes/data.json"):
+            prefixes = [{"prefix": p} for p in self._prefixes()]
+            return json.dumps({"status": "ok", "data": {"resource": resource, "prefixes": prefixes}}).encode()
+        if path.endswith("/geoloc/data.json"):
+            return json.dumps(self._geoloc(resource)).encode()
+        return self._updates(params)
+
+    def _updates(self, params):
+        resource = params.get("resource", [""])[0]
+        starttime = params.get("starttime", [""])[0]
+        updates = []
+        for i in range(self.updates_per_chunk):
+            origin = 15169 if resource.upper().lstrip("AS").isdigit() else 64500
+            updates.append({
+                "type": "A",
+                "timestamp": starttime,
+                "attrs": {
+                    "target_prefix": f"10.{i % 256}.0.0/16",
+                    "path": [3333, 1299, origin],
+                    "community": ["3333:100"],
+                    "source_id": f"rrc00-{i % 16}",
+                },
+            })
+        return json.dumps({"status": "ok", "data": {"resource": resource, "updates": updates}}).encode()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                self.requests += 1
+                target = urlsplit(request_line.split()[1].decode())
+                params = parse_qs(target.query)
+                await asyncio.sleep(self.latency)
+                if self.error_rate and random.random() < self.error_rate:
+                    status, body = "429 Too Many Requests", b"{}"
+                else:
+                    status, body = "200 OK", self._body(target.path, params)
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import time
+
+import websockets
+
+# Local stand-in for wss://ris-live.ripe.net: accepts ris_sub and pushes a
+# fixed set of UPDATE messages to every subscriber whenever replay() is
+# called, recording when each prefix left so clients can measure latency.
+
+def latency_messages(count, prefixes_per_msg=1):
+    # One unique prefix per announcement so deliveries can be matched up
+    messages = []
+    for n in range(count):
+        ids = range(n * prefixes_per_msg, (n + 1) * prefixes_per_msg)
+        prefixes = [f"{100 + (i >> 16) % 100}.{(i >> 8) & 255}.{i & 255}.0/24" for i in ids]
+        messages.append({
+            "type": "ris_message",
+            "data": {
+                "timestamp": 1754344800.0 + n / 1000,
+                "peer": "192.0.2.1",
+                "peer_asn": "3333",
+                "id": f"{n:x}",
+                "host": "rrc00",
+                "type": "UPDATE",
+                "path": [3333, 1299, 64500 + n % 100],
+                "origin": "IGP",
+                "announcements": [{"next_hop": "192.0.2.1", "prefixes": prefixes}],
+                "withdrawals": []
+            }
+        })
+    return messages
+
+class RisLiveStub:
+    def __init__(self, messages, host="127.0.0.1"):
+        self.messages = messages
+        self.frames = [json.dumps(m) for m in messages]
+        self.host = host
+        self.port = None
+        self.sent_at = {}
+        self._subscribers = set()
+        self._subscribed = asyncio.Event()
+        self._server = None
+
+    @property
+    def uri(self):
+        return f"ws://{self.host}:{self.port}/v1/ws/"
+
+    async def start(self):
+        self._server = await websockets.serve(self._handle, self.host, 0, compression=None)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def wait_subscribed(self):
+        await self._subscribed.wait()
+
+    async def _handle(self, websocket):
+        try:
+            async for message in websocket:
+                if json.loads(message).get("type") == "ris_sub":
+                    self._subscribers.add(websocket)
+                    self._subscribed.set()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._subscribers.discard(websocket)
+
+    async def replay(self, rate=None):
+        # rate: messages/sec, None for as fast as possible
+        interval = 1 / rate if rate else 0
+        start = time.perf_counter()
+        for n, (msg, frame) in enumerate(zip(self.messages, self.frames)):
+            now = time.perf_counter()
+            for ann in msg["data"]["announcements"]:
+                for prefix in ann["prefixes"]:
+                    self.sent_at[prefix] = now
+            for ws in list(self._subscribers):
+                await ws.send(frame)
+            if interval:
+                delay = start + (n + 1) * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif n % 100 == 0:
+                await asyncio.sleep(0)
@@ -0,0 +1,78 @@
+import gzip
+import json
+import os
+import random
+
+# Synthetic RIS Live traffic in the exact wire format of ris-live.ripe.net,
+# used when no recorded capture is supplied to a benchmark.
+
+COLLECTORS = [f"rrc{i:02d}" for i in range(27)]
+
+def _prefix(i):
+    if i % 5 == 0:
+        return f"2001:db8:{i >> 16:x}:{i & 0xffff:x}::/48"
+    return f"{10 + (i >> 16) % 200}.{(i >> 8) & 0xff}.{i & 0xff}.0/24"
+
+def generate_messages(count=100000, prefixes=200000, hijack_rate=0.0005, seed=1):
+    # Prefixes come in blocks of four sharing an origin; each message
+    # announces part of one block, occasionally from a foreign origin.
+    rng = random.Random(seed)
+    blocks = prefixes // 4
+    origins = [64512 + rng.randrange(60000) for _ in range(blocks)]
+    peers = [(f"192.0.2.{i}", 3000 + i) for i in range(1, 200)]
+    ts = 1754344800.0
+    messages = []
+    for n in range(count):
+        ts += 0.00002
+        peer_ip, peer_asn = rng.choice(peers)
+        block = rng.randrange(blocks)
+        first = block * 4
+        announcements = [{
+            "next_hop": peer_ip,
+            "prefixes": [_prefix(first + i) for i in range(rng.choice((1, 1, 2, 4)))]
+        }]
+        origin = origins[block]
+        if rng.random() < hijack_rate:
+            origin = 65000 + rng.randrange(500)
+        msg = {
+            "type": "ris_message",
+            "data": {
+                "timestamp": round(ts, 2),
+                "peer": peer_ip,
+                "peer_asn": str(peer_asn),
+                "id": f"{n:x}",
+                "host": rng.choice(COLLECTORS),
+                "type": "UPDATE",
+                "path": [peer_asn, 1299, 174, origin][rng.randrange(2):],
+                "community": [[1299, 20000]],
+                "origin": "IGP",
+                "announcements": announcements,
+                "withdrawals": [_prefix(rng.randrange(prefixes))] if rng.random() < 0.1 else []
+            }
+        }
+        messages.append(json.dumps(msg))
+    return messages
+
+def load_messages(path, limit=None):
+    # Accepts a ris_replay segment directory, or a single NDJSON file of raw
+    # frames (optionally with the recorder's "<epoch> " line prefix)
+    if os.path.isdir(path):
+        from ris_replay import iter_frames
+        messages = []
+        for _, raw in iter_frames(path):
+            messages.append(raw)
+            if limit and len(messages) >= limit:
+                break
+        return messages
+    opener = gzip.open if path.endswith(".gz") else open
+    messages = []
+    with opener(path, "rt") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("{"):
+                line = line.partition(" ")[2]
+            if line:
+                messages.append(line)
+                if limit and len(messages) >= limit:
+                    break
+    return messages
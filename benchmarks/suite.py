@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import websockets
+
+from bench_ws_fanout import prefixes_in
+from ripestat_stub import RipeStatStub
+from ris_live_stub import RisLiveStub, latency_messages
+
+# Reproducible, network-free benchmark suite. The backend and the RIS Live
+# service run as real uvicorn processes against local RIPEstat / RIS Live
+# stubs; every scenario appends rows of {scenario, params, metrics} to one
+# JSON file tagged with the git commit, for compare.py to diff.
+#
+#   python suite.py                   # full run → results/<commit>-<time>.json
+#   python suite.py --quick           # smaller matrix, for a pre-push check
+#   python compare.py results/a.json results/b.json
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(ROOT, "..", "backend")
+RESULTS_DIR = os.path.join(ROOT, "results")
+POLL_INTERVAL = 0.02   # seconds between job status polls
+POLL_SAMPLES = 50      # requests per poll-latency measurement
+STARTUP_TIMEOUT = 30
+
+PROFILES = {
+    "full": {
+        "job_days": [1, 7, 30],
+        "job_concurrency": [1, 8, 32],
+        "poll_days": [1, 7, 30],
+        "ws_clients": [1, 100, 1000],
+        "ws_deliveries": 200000,
+    },
+    "quick": {
+        "job_days": [1, 7],
+        "job_concurrency": [1, 8],
+        "poll_days": [1, 7],
+        "ws_clients": [1, 100],
+        "ws_deliveries": 50000,
+    },
+}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+# --- Service Processes ---
+
+class Service:
+    # `uvicorn module:app` in a subprocess, ready once /health answers
+
+    def __init__(self, app, env):
+        self.app = app
+        self.port = free_port()
+        self.env = {**os.environ, **env}
+        self.process = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.app, "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning", "--ws", "websockets"],
+            cwd=BACKEND_DIR, env=self.env
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                try:
+                    if (await client.get(f"{self.url}/health")).status_code == 200:
+                        return self
+                except httpx.TransportError:
+                    pass
+                if self.process.poll() is not None:
+                    break
+                await asyncio.sleep(0.1)
+        self.stop()
+        raise RuntimeError(f"{self.app} did not start")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+def backend_env(stub, data_dir, concurrency=8):
+    return {
+        "DATA_DIR": data_dir,
+        "RIPE_UPDATES_URL": stub.url,
+        "RIPESTAT_RATE": "0",   # the stub is local; measure the backend, not RIPE's rate limit
+        "JOB_CONCURRENCY": str(concurrency),
+        "PROFILER_ENABLED": "0",
+    }
+
+async def run_job(client, url, resource, days):
+    start = datetime(2025, 7, 1)
+    end = start + timedelta(days=days)
+    params = {"resource": resource, "starttime": start.isoformat() + "Z", "endtime": end.isoformat() + "Z"}
+    t0 = time.perf_counter()
+    job_id = (await client.post(f"{url}/api/bgp-historic-job", params=params)).json()["job_id"]
+    while True:
+        job = (await client.get(f"{url}/api/bgp-historic-job/{job_id}")).json()
+        if job["status"] in ("completed", "failed"):
+            break
+        await asyncio.sleep(POLL_INTERVAL)
+    if job["status"] != "completed":
+        raise RuntimeError(f"job {job_id} failed: {job['error']}")
+    return job_id, job, time.perf_counter() - t0
+
+# --- Scenarios ---
+
+async def historic_jobs(profile, args):
+    # Job completion time (POST → completed status) vs range and per-job concurrency
+    rows = []
+    stub = await RipeStatStub(latency=args.stub_latency).start()
+    try:
+        for concurrency in profile["job_concurrency"]:
+            with tempfile.TemporaryDirectory(prefix="suite-jobs-") as data_dir:
+                service = await Service("main:app", backend_env(stub, data_dir, concurrency)).start()
+                try:
+                    async with httpx.AsyncClient(timeout=60) as client:
+                        for days in profile["job_days"]:
+                            before = stub.requests
+                            # A fresh resource per run, so nothing comes from the window cache
+                            _, job, elapsed = await run_job(client, service.url, f"AS{64500 + days * 100 + concurrency}", days)
+                            rows.append({
+                                "scenario": "historic_job",
+                                "params": {"days": days, "concurrency": concurrency},
+                                "metrics": {
+                                    "wall_s": round(elapsed, 3),
+                                    "chunks_per_s": round(job["total_chunks"] / elapsed, 2),
+                                    "upstream_requests": stub.requests - before
+                                }
+                            })
+                            print(f"  historic_job days={days:<3} concurrency={concurrency:<3} "
+                                  f"wall={elapsed:7.2f}s chunks={job['total_chunks']}")
+                finally:
+                    service.stop()
+    finally:
+        await stub.stop()
+    return rows
+
+async def timed_gets(client, url, samples=POLL_SAMPLES):
+    latencies, size = [], 0
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        resp = await client.get(url)
+        latencies.append(time.perf_counter() - t0)
+        size = len(resp.content)
+    return {
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "bytes": size
+    }
+
+async def status_polls(profile, args):
+    # Poll latency once a job holds more and more results: the status call,
+    # the first results page and the incremental (tail) poll a client repeats
+    rows = []
+    stub = await RipeStatStub(latency=0.001, updates_per_chunk=args.poll_updates_per_chunk).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="suite-poll-") as data_dir:
+            service = await Service("main:app", backend_env(stub, data_dir, 32)).start()
+            try:
+                async with httpx.AsyncClient(timeout=120) as client:
+                    for days in profile["poll_days"]:
+                        job_id, job, _ = await run_job(client, service.url, f"AS{65000 + days}", days)
+                        base = f"{service.url}/api/bgp-historic-job/{job_id}"
+                        stored = job["completed_chunks"] * args.poll_updates_per_chunk
+                        for name, url in (("status", base), ("results_first_page", f"{base}/results?cursor=0"),
+                                          ("results_tail", f"{base}/results?cursor={job['completed_chunks']}")):
+                            metrics = await timed_gets(client, url)
+                            rows.append({
+                                "scenario": "status_poll",
+                                "params": {"endpoint": name, "stored_updates": stored},
+                                "metrics": metrics
+                            })
+                            print(f"  status_poll {name:<18} stored={stored:<8} p50={metrics['p50_ms']:8.2f}ms "
+                                  f"p99={metrics['p99_ms']:8.2f}ms bytes={metrics['bytes']}")
+            finally:
+                service.stop()
+    finally:
+        await stub.stop()
+    return rows
+
+def ws_client_worker(uri, count, expected, idle_timeout, ready, results):
+    # Runs in its own process: `count` connections, each reporting
+    # (prefix, receive time) for every update it gets. perf_counter is the
+    # system-wide monotonic clock on Linux/macOS, so the parent can subtract
+    # the stub's send times directly.
+    async def one(received):
+        async with websockets.connect(uri, compression=None, max_size=None) as ws:
+            ready.put(1)
+            got = 0
+            while got < expected:
+                try:
+                    frame = await asyncio.wait_for(ws.recv(), idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                now = time.perf_counter()
+                for prefix in prefixes_in(frame):
+                    received.append((prefix, now))
+                    got += 1
+
+    async def run():
+        received = []
+        await asyncio.gather(*(one(received) for _ in range(count)))
+        return received
+
+    results.put(asyncio.run(run()))
+
+async def ws_fanout(profile, args):
+    # /ws/ris-live delivery throughput and latency per number of connected clients
+    rows = []
+    context = multiprocessing.get_context("spawn")
+    for clients in profile["ws_clients"]:
+        messages = max(100, min(args.ws_max_messages, profile["ws_deliveries"] // clients))
+        stub = await RisLiveStub(latency_messages(messages)).start()
+        service = await Service("rislive_ws:app", {"RIS_LIVE_URI": stub.uri, "PROFILER_ENABLED": "0"}).start()
+        workers = []
+        try:
+            await asyncio.wait_for(stub.wait_subscribed(), STARTUP_TIMEOUT)
+            ready, results = context.Queue(), context.Queue()
+            per_worker = [clients // args.ws_workers + (i < clients % args.ws_workers) for i in range(args.ws_workers)]
+            uri = f"ws://127.0.0.1:{service.port}/ws/ris-live?queue_size=100000"
+            for count in per_worker:
+                if count:
+                    worker = context.Process(target=ws_client_worker,
+                                             args=(uri, count, messages, args.ws_idle_timeout, ready, results))
+                    worker.start()
+                    workers.append(worker)
+            for _ in range(clients):
+                await asyncio.to_thread(ready.get, True, STARTUP_TIMEOUT)
+            await asyncio.sleep(0.5)
+
+            stub.sent_at.clear()
+            t0 = time.perf_counter()
+            await stub.replay(args.ws_rate)
+            received = []
+            for _ in workers:
+                received.extend(await asyncio.to_thread(results.get))
+            finished = max((t for _, t in received), default=time.perf_counter())
+            stats = httpx.get(f"{service.url}/api/fanout/stats").json()
+        finally:
+            for worker in workers:
+                worker.join(5)
+                if worker.is_alive():
+                    worker.terminate()
+            service.stop()
+            await stub.stop()
+
+        latencies = [t - stub.sent_at[p] for p, t in received if p in stub.sent_at]
+        elapsed = finished - t0
+        metrics = {
+            "messages": messages,
+            "delivered": len(received),
+            "expected": messages * clients,
+            "dropped": stats.get("dropped_total", stats.get("dropped", 0)),
+            "deliveries_per_s": round(len(received) / elapsed, 1) if elapsed > 0 else None,
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 3) if latencies else None,
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3) if latencies else None
+        }
+        rows.append({"scenario": "ws_fanout", "params": {"clients": clients, "rate": args.ws_rate or "max"}, "metrics": metrics})
+        print(f"  ws_fanout clients={clients:<5} delivered={len(received)}/{messages * clients} "
+              f"rate={metrics['deliveries_per_s']}/s p50={metrics['p50_ms']}ms p99={metrics['p99_ms']}ms")
+    return rows
+
+SCENARIOS = {"historic": historic_jobs, "poll": status_polls, "ws": ws_fanout}
+
+# --- Runner ---
+
+async def main(args):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    profile = PROFILES["quick" if args.quick else "full"]
+    commit, dirty = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "profile": "quick" if args.quick else "full",
+            "started_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args)
+        },
+        "results": []
+    }
+    for name in args.scenarios:
+        print(f"[{name}]")
+        t0 = time.perf_counter()
+        report["results"].extend(await SCENARIOS[name](profile, args))
+        report["meta"][f"{name}_seconds"] = round(time.perf_counter() - t0, 1)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}-"
+                                         f"{report['meta']['started_at'].replace(':', '')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--output", help="result file (default: results/<commit>-<time>.json)")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="RIPEstat stub latency per request (s)")
+    parser.add_argument("--poll-updates-per-chunk", type=int, default=1000)
+    parser.add_argument("--ws-workers", type=int, default=max(1, min(4, (os.cpu_count() or 2) - 1)),
+                        help="client processes for the fan-out scenario")
+    parser.add_argument("--ws-max-messages", type=int, default=20000)
+    parser.add_argument("--ws-rate", type=float, help="upstream messages/sec for the fan-out scenario (default: max)")
+    parser.add_argument("--ws-idle-timeout", type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
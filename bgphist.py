@@ -1,12 +1,14 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import networkx as nx
 import requests
 import io
 import folium
 from streamlit_folium import st_folium
-import random
+import os
+
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://backend:8000")
+GRAPH_TOP_K = 300
 
 st.set_page_config(layout="wide")
 st.title("📡 RIPE Stat ASN & Prefix Data Explorer")
@@ -31,35 +33,44 @@ def is_asn(val):
 def is_prefix(val): 
     return "/" in val
 
+@st.cache_data(show_spinner=False, ttl=300)
+def fetch_json_cached(endpoint, params):
+    # RIPEstat data calls go through the backend gateway (shared cache, rate limit, retries)
+    r = requests.get(f"{BACKEND_URL}/api/ripestat/{endpoint}", params=params, timeout=30)
+    r.raise_for_status()
+    return r.json()
+
 @st.cache_data(show_spinner=False)
-def fetch_json_cached(url, params):
-    r = requests.get(url, params=params, timeout=15)
+def fetch_as_graph(as_paths, top_k=GRAPH_TOP_K):
+    # Weighted, pruned and laid out by the backend; cached per path set
+    r = requests.post(f"{BACKEND_URL}/api/as-graph",
+                      json={"paths": as_paths, "top_k": top_k, "layout": True}, timeout=60)
     r.raise_for_status()
     return r.json()
 
 def draw_as_path_graph(as_paths):
-    G = nx.DiGraph()
-    edge_freq = {}
-    for path in as_paths:
-        if not isinstance(path, list) or len(path) < 2:
-            continue
-        for i in range(len(path)-1):
-            edge = (path[i], path[i+1])
-            edge_freq[edge] = edge_freq.get(edge, 0) + 1
-    for edge, freq in edge_freq.items():
-        G.add_edge(edge[0], edge[1], weight=freq)
-    if len(G.nodes) == 0:
+    try:
+        graph = fetch_as_graph([p for p in as_paths if isinstance(p, list) and len(p) >= 2])
+    except Exception as e:
+        st.error(f"Failed to build AS path graph: {e}")
+        return
+    if not graph.get("edges"):
         st.warning("Not enough AS path data to build hops graph.")
         return
+    if "layout_skipped" in graph:
+        st.warning(graph["layout_skipped"])
+        return
 
+    pos = {node["asn"]: (node["x"], node["y"]) for node in graph["nodes"]}
     fig, ax = plt.subplots(figsize=(10, 7))
-    pos = nx.spring_layout(G, k=0.5, seed=42)
-    edges, weights = zip(*nx.get_edge_attributes(G, 'weight').items())
-    nx.draw_networkx_nodes(G, pos, node_size=300, node_color='lightgreen', ax=ax)
-    nx.draw_networkx_edges(G, pos, edgelist=edges, width=[w * 0.1 for w in weights],
-                           arrowstyle='->', arrowsize=10, edge_color='gray', ax=ax)
-    nx.draw_networkx_labels(G, pos, font_size=8, ax=ax)
-    ax.set_title("AS Path Hops Network Graph")
+    for src, dst, weight in graph["edges"]:
+        ax.annotate("", xy=pos[dst], xytext=pos[src],
+                    arrowprops=dict(arrowstyle='->', color='gray', lw=max(0.5, weight * 0.1), shrinkA=8, shrinkB=8))
+    xs, ys = zip(*pos.values())
+    ax.scatter(xs, ys, s=300, c='lightgreen', zorder=2)
+    for asn, (x, y) in pos.items():
+        ax.text(x, y, str(asn), fontsize=8, ha='center', va='center', zorder=3)
+    ax.set_title(f"AS Path Hops Network Graph ({len(graph['edges'])} of {graph['total_edges']} edges)")
     ax.axis('off')
     st.pyplot(fig)
 
@@ -73,62 +84,43 @@ def filter_dataframe(df, column_name, label="Filter by"):
         return df[df[column_name].astype(str).str.contains(user_input, case=False, na=False)]
     return df
 
-def generate_color():
-    return "#{:06x}".format(random.randint(0, 0xFFFFFF))
+@st.cache_data(show_spinner=False, ttl=3600)
+def fetch_geo_map(resource, cell=2.0):
+    # Every announced prefix, geolocated concurrently and clustered by the backend
+    r = requests.get(f"{BACKEND_URL}/api/geo-map", params={"resource": resource, "cell": cell}, timeout=300)
+    r.raise_for_status()
+    return r.json()
 
 def show_geo_map(resource):
     try:
-        m = None
-        if resource.upper().startswith("AS"):
-            prefixes_data = fetch_json_cached("https://stat.ripe.net/data/announced-prefixes/data.json", {"resource": resource})
-            prefixes = prefixes_data.get("data", {}).get("prefixes", [])
-            if not prefixes:
-                st.warning("No prefixes found for this ASN.")
-                return
-
-            prefixes = prefixes[:10]  # Limit to top 10 prefixes to speed up map loading
-
-            m = folium.Map(location=[20,0], zoom_start=2)
-            progress = st.progress(0)
-            total = len(prefixes)
-            for idx, prefix_entry in enumerate(prefixes):
-                prefix = prefix_entry.get("prefix")
-                if not prefix:
-                    continue
-                try:
-                    geo_data = fetch_json_cached("https://stat.ripe.net/data/geoloc/data.json", {"resource": prefix})
-                    locations = geo_data.get("data", {}).get("locations", [])
-                    color = generate_color()
-                    for loc in locations:
-                        folium.CircleMarker(
-                            location=[loc['latitude'], loc['longitude']],
-                            radius=5,
-                            popup=f"{prefix} ({loc.get('city','')}, {loc.get('country','')})",
-                            color=color,
-                            fill=True,
-                            fill_color=color
-                        ).add_to(m)
-                except:
-                    pass
-                progress.progress(int((idx+1)/total * 100))
-            progress.empty()
-
-            st.subheader(f"🌍 Geolocation Map of Announced Prefixes for {resource} (top 10 shown)")
-            st_folium(m, width=900, height=600)
-        else:
-            geo_data = fetch_json_cached("https://stat.ripe.net/data/geoloc/data.json", {"resource": resource})
-            locations = geo_data.get("data", {}).get("locations", [])
-            if not locations:
-                st.warning("No geolocation data found.")
-                return
-            m = folium.Map(location=[locations[0]['latitude'], locations[0]['longitude']], zoom_start=3)
-            for loc in locations:
-                folium.Marker(
-                    [loc['latitude'], loc['longitude']],
-                    popup=f"{resource} ({loc.get('city', '')}, {loc.get('country', '')})"
-                ).add_to(m)
-            st.subheader(f"🌍 Geolocation Map for {resource}")
-            st_folium(m, width=900, height=600)
+        with st.spinner("Geolocating prefixes..."):
+            geo = fetch_geo_map(resource)
+        clusters = geo.get("clusters", [])
+        if not clusters:
+            st.warning("No prefixes found for this ASN." if not geo.get("prefixes") else "No geolocation data found.")
+            return
+
+        m = folium.Map(location=[clusters[0]["lat"], clusters[0]["lon"]] if len(clusters) == 1 else [20, 0],
+                       zoom_start=3 if len(clusters) == 1 else 2)
+        largest = clusters[0]["prefixes"]
+        for cluster in clusters:
+            popup = f"<b>{cluster['prefixes']} prefixes</b><br>{'; '.join(cluster['places'])}<br>" + \
+                "<br>".join(cluster["sample"]) + ("<br>..." if cluster["prefixes"] > len(cluster["sample"]) else "")
+            folium.CircleMarker(
+                location=[cluster["lat"], cluster["lon"]],
+                radius=4 + 16 * (cluster["prefixes"] / largest) ** 0.5,
+                popup=folium.Popup(popup, max_width=300),
+                tooltip=f"{cluster['prefixes']} prefixes",
+                color="#d62728",
+                fill=True,
+                fill_color="#d62728",
+                fill_opacity=0.6
+            ).add_to(m)
+
+        st.subheader(f"🌍 Geolocation Map for {resource}")
+        st.caption(f"{geo['located']} of {geo['prefixes']} prefixes located at {geo['locations']} locations, "
+                   f"{len(clusters)} clusters" + (f", {geo['failed']} lookups failed" if geo.get("failed") else ""))
+        st_folium(m, width=900, height=600)
     except Exception as e:
         st.error(f"Geolocation fetch failed: {e}")
 
@@ -151,7 +143,7 @@ if input_val:
 
         # AS Overview
         try:
-            data = fetch_json_cached("https://stat.ripe.net/data/as-overview/data.json", {"resource": f"AS{asn}"})
+            data = fetch_json_cached("as-overview", {"resource": f"AS{asn}"})
             overview = data.get("data", {}).get("overview", {})
         except Exception as e:
             st.error(f"Failed to fetch AS Overview: {e}")
@@ -166,7 +158,7 @@ if input_val:
 
         # Announced Prefixes
         try:
-            data = fetch_json_cached("https://stat.ripe.net/data/announced-prefixes/data.json", {"resource": f"AS{asn}"})
+            data = fetch_json_cached("announced-prefixes", {"resource": f"AS{asn}"})
             prefixes = data.get("data", {}).get("prefixes", [])
         except Exception as e:
             st.error(f"Failed to fetch announced prefixes: {e}")
@@ -178,7 +170,7 @@ if input_val:
 
             if 'path' in df_prefixes.columns:
                 df_prefixes['as_path_str'] = df_prefixes['path'].apply(lambda p: ' '.join(map(str, p)) if isinstance(p, list) else "")
-                df_prefixes['as_path_length'] = df_prefixes['path'].apply(lambda p: len(p) if isinstance(p, list) else 0)
+                df_prefixes['as_path_length'] = df_prefixes['path'].str.len().fillna(0).astype(int)
 
             columns_to_show = [c for c in ['prefix', 'origin', 'next_hop', 'as_path_str', 'as_path_length'] if c in df_prefixes.columns]
 
@@ -206,7 +198,7 @@ if input_val:
         st.header(f"📨 Routing Status for {prefix}")
 
         try:
-            data = fetch_json_cached("https://stat.ripe.net/data/routing-status/data.json", {"resource": prefix})
+            data = fetch_json_cached("routing-status", {"resource": prefix})
             announcements = data.get("data", {}).get("announcements", [])
         except Exception as e:
             st.error(f"Failed to fetch routing status: {e}")
@@ -219,7 +211,7 @@ if input_val:
             df = pd.DataFrame(announcements)
             if 'path' in df.columns:
                 df['as_path_str'] = df['path'].apply(lambda p: ' '.join(map(str, p)) if isinstance(p, list) else "")
-                df['as_path_length'] = df['path'].apply(lambda p: len(p) if isinstance(p, list) else 0)
+                df['as_path_length'] = df['path'].str.len().fillna(0).astype(int)
 
             columns_to_show = [c for c in ['prefix', 'origin', 'next_hop', 'as_path_str', 'as_path_length'] if c in df.columns]
 
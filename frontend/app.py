@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import json
+import ipaddress
 import pandas as pd
 from datetime import datetime, timedelta
 from pyvis.network import Network
@@ -16,6 +17,7 @@ with st.sidebar:
 
     asn_filter = st.text_input("Filter by Origin ASN (e.g. 15169)", value="")
     prefix_filter = st.text_input("Filter by Prefix (e.g. 8.8.8.0/24)", value="")
+    graph_edges = st.slider("Max AS graph edges", 50, 2000, 300, step=50)
 
     col1, col2 = st.columns(2)
     with col1:
@@ -63,6 +65,15 @@ if "status_text" not in st.session_state:
     st.session_state.status_text = "Idle. Submit a query and click Start."
 if "result_data" not in st.session_state:
     st.session_state.result_data = pd.DataFrame()
+if "cursor" not in st.session_state:
+    st.session_state.cursor = 0
+if "records" not in st.session_state:
+    st.session_state.records = []
+if "path_stats" not in st.session_state:
+    st.session_state.path_stats = None
+if "graph" not in st.session_state:
+    st.session_state.graph = None
+    st.session_state.graph_key = None
 
 progress_bar = st.progress(st.session_state.progress)
 status_text = st.empty()
@@ -79,7 +90,7 @@ def submit_job(q, start_ts, end_ts):
         debug_area.text(f"DEBUG: Submitting job with payload: {json.dumps(payload)}")
         resp = requests.post(
             f"{BACKEND_URL}/api/bgp-historic-job",
-            json=payload,
+            params=payload,
             timeout=10
         )
         resp.raise_for_status()
@@ -108,38 +119,123 @@ def poll_job(job_id):
         debug_area.text(f"DEBUG: Poll job error: {e}")
         return None
 
-def create_as_path_graph(data):
-    if not data:
+def fetch_new_results(job_id, cursor):
+    # Only downloads chunks the backend has finished since our last cursor
+    try:
+        resp = requests.get(f"{BACKEND_URL}/api/bgp-historic-job/{job_id}/results",
+                            params={"cursor": cursor}, timeout=30)
+        resp.raise_for_status()
+        return resp.json()
+    except Exception as e:
+        st.error(f"Failed to fetch job results: {e}")
+        debug_area.text(f"DEBUG: Fetch results error: {e}")
+        return None
+
+def fetch_path_stats(job_id):
+    # Path length, prepending, top edges and origin changes, aggregated by the backend
+    try:
+        resp = requests.get(f"{BACKEND_URL}/api/bgp-historic-job/{job_id}/path-stats", timeout=60)
+        resp.raise_for_status()
+        return resp.json()
+    except Exception as e:
+        debug_area.text(f"DEBUG: Fetch path stats error: {e}")
+        return None
+
+def show_path_stats(stats):
+    paths = stats.get("paths") or {}
+    if not paths:
+        return
+    st.subheader("📊 AS Path Statistics")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Announcements", stats.get("announcements", 0))
+    col2.metric("Avg AS Path Length", f"{paths.get('mean_length', 0):.2f}")
+    col3.metric("Prepended Paths", f"{stats.get('prepending', {}).get('share', 0):.1%}")
+    col4.metric("Origin Changes", stats.get("origin_changes", {}).get("total", 0))
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Top Origins**")
+        st.dataframe(pd.DataFrame(stats.get("origins", [])))
+    with col2:
+        st.markdown("**Top AS Edges**")
+        st.dataframe(pd.DataFrame(stats.get("edges", {}).get("top", [])))
+    changes = stats.get("origin_changes", {}).get("top", [])
+    if changes:
+        st.markdown("**Prefixes With Origin Changes**")
+        st.dataframe(pd.DataFrame(changes))
+
+def filter_by_prefix(records, prefix_filter):
+    # Keeps updates for the filter prefix, its more-specifics and its covering prefixes
+    try:
+        wanted = ipaddress.ip_network(prefix_filter.strip(), strict=False)
+    except ValueError:
+        st.warning(f"Invalid prefix filter: {prefix_filter}")
+        return records
+    kept = []
+    for r in records:
+        try:
+            target = ipaddress.ip_network(r.get("attrs", {}).get("target_prefix", ""), strict=False)
+        except ValueError:
+            continue
+        if target.version == wanted.version and target.overlaps(wanted):
+            kept.append(r)
+    return kept
+
+def fetch_as_graph(job_id, top_k, origin, prefix):
+    # Pruned, laid-out AS graph built (and cached) by the backend
+    params = {"top_k": top_k, "layout": "true"}
+    if origin.strip().isdigit():
+        params["origin"] = origin.strip()
+    if prefix.strip():
+        params["prefix"] = prefix.strip()
+    try:
+        resp = requests.get(f"{BACKEND_URL}/api/bgp-historic-job/{job_id}/as-graph", params=params, timeout=60)
+        resp.raise_for_status()
+        return resp.json()
+    except Exception as e:
+        debug_area.text(f"DEBUG: Fetch AS graph error: {e}")
+        return None
+
+def create_as_path_graph(graph):
+    if not graph or not graph.get("edges"):
         return None
     net = Network(height="400px", width="100%", directed=True)
     try:
-        for record in data:
-            attrs = record if isinstance(record, dict) else {}
-            path = attrs.get("attrs", {}).get("path", [])
-            for i in range(len(path)):
-                net.add_node(path[i], label=str(path[i]))
-                if i > 0:
-                    net.add_edge(path[i - 1], path[i])
+        positioned = all("x" in node for node in graph["nodes"])
+        for node in graph["nodes"]:
+            options = {"x": node["x"] * 400, "y": node["y"] * 400} if positioned else {}
+            net.add_node(node["asn"], label=str(node["asn"]), value=node["weight"],
+                         color="#e4572e" if node["origin"] else "#76b041", **options)
+        for src, dst, weight in graph["edges"]:
+            net.add_edge(src, dst, value=weight, title=f"{weight} paths")
+        if positioned:
+            net.toggle_physics(False)
         return net
     except Exception as e:
         st.warning(f"Graph error: {e}")
         return None
 
+def reset_results():
+    st.session_state.progress = 0
+    st.session_state.cursor = 0
+    st.session_state.records = []
+    st.session_state.path_stats = None
+    st.session_state.graph = None
+    st.session_state.graph_key = None
+    st.session_state.result_data = pd.DataFrame()
+
 if start_button and query.strip():
     job_id = submit_job(query.strip(), start_ts, end_ts)
     if job_id:
         st.session_state.job_id = job_id
         st.session_state.polling = True
-        st.session_state.progress = 0
         st.session_state.status_text = "Job submitted. Polling for results..."
-        st.session_state.result_data = pd.DataFrame()
+        reset_results()
 
 if stop_button:
     st.session_state.polling = False
     st.session_state.job_id = None
-    st.session_state.progress = 0
     st.session_state.status_text = "Lookup stopped."
-    st.session_state.result_data = pd.DataFrame()
+    reset_results()
     result_area.empty()
     debug_area.empty()
 
@@ -151,65 +247,80 @@ if st.session_state.polling and st.session_state.job_id:
         st.session_state.polling = False
     else:
         status = job_status.get("status")
-        data = job_status.get("result")
+        total = job_status.get("total_chunks") or 0
+        completed = job_status.get("completed_chunks") or 0
 
-        if data and data.get("data", {}).get("updates"):
-            st.session_state.status_text = "Data received! Stopping lookup."
-            st.session_state.polling = False
+        if completed > st.session_state.cursor:
+            results = fetch_new_results(st.session_state.job_id, st.session_state.cursor)
+            if results:
+                for chunk in results.get("chunks", []):
+                    st.session_state.records.extend(chunk.get("data", {}).get("data", {}).get("updates", []))
+                st.session_state.cursor = results.get("cursor", st.session_state.cursor)
 
-            records = data.get("data", {}).get("updates", [])
-
-            if asn_filter:
-                records = [r for r in records if str(r.get("attrs", {}).get("path", [])[-1]) == asn_filter]
-            if prefix_filter:
-                records = [r for r in records if prefix_filter in r.get("attrs", {}).get("target_prefix", "")]
-
-            if records:
-                rows = []
-                for record in records:
-                    attrs = record.get("attrs", {})
-                    rows.append({
-                        "Timestamp": record.get("timestamp"),
-                        "Source ID": attrs.get("source_id"),
-                        "Target Prefix": attrs.get("target_prefix"),
-                        "Path": " → ".join(str(x) for x in attrs.get("path", [])),
-                        "Community": ", ".join(attrs.get("community", [])),
-                        "Type": record.get("type"),
-                    })
-                df = pd.DataFrame(rows)
-                st.session_state.result_data = df
-
-                graph = create_as_path_graph(records)
-                if graph:
-                    graph.save_graph("as_path.html")
-                    with open("as_path.html", 'r', encoding='utf-8') as f:
-                        components.html(f.read(), height=450)
-                else:
-                    st.warning("No graph generated.")
-            else:
-                st.warning("No records after filtering.")
-
-            json_str = json.dumps(data, indent=2)
-            st.download_button(
-                label="📥 Download JSON",
-                data=json_str,
-                file_name=f"bgp_updates_{query.replace('/', '_')}.json",
-                mime="application/json"
-            )
-
-        elif status == "completed":
+        if total:
+            st.session_state.progress = int(100 * completed / total)
+
+        if status == "completed" and st.session_state.cursor >= completed:
             st.session_state.progress = 100
-            st.session_state.status_text = "Job completed!"
+            st.session_state.status_text = f"Job completed! {len(st.session_state.records)} updates received."
+            st.session_state.path_stats = fetch_path_stats(st.session_state.job_id)
             st.session_state.polling = False
 
         elif status == "failed":
-            st.session_state.progress = 0
             st.session_state.status_text = f"Job failed: {job_status.get('error')}"
             st.session_state.polling = False
 
         else:
-            st.session_state.progress = min(st.session_state.progress + 10, 90)
-            st.session_state.status_text = f"Job status: {status}. Polling..."
+            st.session_state.status_text = f"Job status: {status} ({completed}/{total} chunks). Polling..."
+
+records = st.session_state.records
+if records:
+    if asn_filter:
+        records = [r for r in records if str((r.get("attrs", {}).get("path") or [None])[-1]) == asn_filter]
+    if prefix_filter:
+        records = filter_by_prefix(records, prefix_filter)
+
+    if records:
+        rows = []
+        for record in records:
+            attrs = record.get("attrs", {})
+            rows.append({
+                "Timestamp": record.get("timestamp"),
+                "Source ID": attrs.get("source_id"),
+                "Target Prefix": attrs.get("target_prefix"),
+                "Path": " → ".join(str(x) for x in attrs.get("path", [])),
+                "Community": ", ".join(attrs.get("community", [])),
+                "Type": record.get("type"),
+            })
+        df = pd.DataFrame(rows)
+        st.session_state.result_data = df
+
+        # Refetched only when new results arrive or the graph settings change
+        graph_key = (st.session_state.job_id, st.session_state.cursor, graph_edges, asn_filter, prefix_filter)
+        if st.session_state.graph_key != graph_key:
+            st.session_state.graph = fetch_as_graph(st.session_state.job_id, graph_edges, asn_filter, prefix_filter)
+            st.session_state.graph_key = graph_key
+        graph = create_as_path_graph(st.session_state.graph)
+        if graph:
+            graph.save_graph("as_path.html")
+            with open("as_path.html", 'r', encoding='utf-8') as f:
+                components.html(f.read(), height=450)
+        else:
+            st.warning("No graph generated.")
+    else:
+        st.session_state.result_data = pd.DataFrame()
+        st.warning("No records after filtering.")
+
+    json_str = json.dumps(st.session_state.records, indent=2)
+    st.download_button(
+        label="📥 Download JSON",
+        data=json_str,
+        file_name=f"bgp_updates_{query.replace('/', '_')}.json",
+        mime="application/json"
+    )
+
+if st.session_state.path_stats:
+    show_path_stats(st.session_state.path_stats)
 
 progress_bar.progress(st.session_state.progress)
 status_text.text(st.session_state.status_text)
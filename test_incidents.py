@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "backend"))
+
+from detector import Alert
+from incidents import IncidentCorrelator, OPENED, ESCALATED, DEESCALATED
+
+def hijack(peer_asn, ts):
+    return Alert("origin_change", "193.0.0.0/21", 64666, (3333,), peer_asn, "rrc00", ts, [peer_asn, 64666])
+
+def test_trickling_peers_stay_low():
+    # One new peer every 900s with a 600s window: never more than one peer
+    # in the window, so the incident must neither escalate nor deescalate.
+    correlator = IncidentCorrelator(window=600, thresholds=(5, 20))
+    events = []
+    for i in range(8):
+        ts = 1754344800.0 + 900 * i
+        correlator.add(hijack(100 + i, ts))
+        correlator.sweep(now=ts)
+        events += [(update.event, update.level, update.visibility) for update in correlator.flush()]
+    assert events == [(OPENED, "low", 1)]
+    assert not correlator.escalated
+
+def test_peers_within_the_window_escalate_and_expire():
+    correlator = IncidentCorrelator(window=600, thresholds=(5, 20))
+    for i in range(5):
+        correlator.add(hijack(100 + i, 1754344800.0 + 60 * i))
+    [update] = correlator.flush()
+    assert (update.event, update.level, update.visibility) == (OPENED, "medium", 5)
+
+    # Every peer leaves the window, then the fifth reports again
+    correlator.add(hijack(104, 1754344800.0 + 900))
+    [update] = correlator.flush()
+    assert (update.event, update.level, update.visibility) == (DEESCALATED, "low", 1)
+
+    for i in range(5):
+        correlator.add(hijack(200 + i, 1754344800.0 + 950))
+    [update] = correlator.flush()
+    assert (update.event, update.level) == (ESCALATED, "medium")
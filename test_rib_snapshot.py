@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "backend"))
+
+from rib import Rib, SNAPSHOT_CHUNK
+from ris_ingest import UpdateRecord
+
+def announce(prefix, path, peer_asn="3333", ts=1754344800.0):
+    return [UpdateRecord(prefix, path[-1], peer_asn, "rrc00", ts, path)]
+
+def withdraw(prefix, peer_asn="3333", ts=1754344800.0):
+    return [UpdateRecord(prefix, None, peer_asn, "rrc00", ts, [], True)]
+
+def test_snapshot_round_trip_with_churn():
+    # Routes change between the chunks of a save: a withdrawal frees a path
+    # id and the next new path reuses it. Every route must restore with the
+    # path it had when its chunk was copied.
+    prefixes = [f"10.{i >> 8}.{i & 255}.0/24" for i in range(3 * SNAPSHOT_CHUNK)]
+    rib = Rib()
+    rib.apply(announce(prefixes[0], [100, 1]))
+    for prefix in prefixes[1:]:
+        rib.apply(announce(prefix, [100, 2]))
+
+    async def save_with_churn(path):
+        saving = asyncio.create_task(rib.save(path))
+        await asyncio.sleep(0)  # the first chunk is copied
+        rib.apply(withdraw(prefixes[0]))
+        rib.apply(announce(prefixes[-1], [100, 3]))
+        await saving
+
+    path = os.path.join(tempfile.mkdtemp(), "rib.snapshot")
+    asyncio.run(save_with_churn(path))
+    restored = Rib()
+    restored.restore(path, max_age=0)
+    os.remove(path)
+
+    assert restored.routes == rib.routes + 1  # the withdrawal landed after its chunk was copied
+    assert [r["path"] for r in restored.lookup(prefixes[0])] == [[100, 1]]
+    assert [r["path"] for r in restored.lookup(prefixes[-1])] == [[100, 3]]
+    assert [r["path"] for r in restored.lookup(prefixes[SNAPSHOT_CHUNK])] == [[100, 2]]
+    print(f"Restored {restored.routes} routes from a snapshot taken under churn")
+
+if __name__ == "__main__":
+    test_snapshot_round_trip_with_churn()